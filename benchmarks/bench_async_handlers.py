@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Compare update throughput of blocking vs awaited database access.
+
+Each simulated update does its database work (a /balance read or an
+/addepense write) and then waits on a fake Telegram reply. With the
+blocking session the database work stalls every other update on the event
+loop; with the async session the loop keeps serving other updates while
+the driver waits on SQLite.
+
+On SQLite the async path is slower, not faster: on a typical run reads
+go from about 550 to about 280 updates/s, and writes are within noise of
+each other (20-70 updates/s either way, dominated by commit syncs). A
+local SQLite query takes well under a millisecond, so there is little
+wait to overlap, while every awaited statement pays a hop to aiosqlite's
+worker thread and back. Most of that cost is the driver, not
+repositories.aio running the sync repository code through run_sync: the
+same /balance read written as native ``await session.execute(...)``
+calls measured about 290 updates/s against 280.
+
+The async engine is kept anyway because it bounds how long one update
+can hold up the others: a statement waiting on SQLite's write lock (up
+to busy_timeout) or a server database's network round trip
+(ASYNC_DRIVERS in db/connection.py) stalls every update on the loop
+with the blocking session, and only its own with the async one. The
+write-behind ExpenseWriter (services/expense_writer.py) wins back the
+write side by group-committing concurrent writes.
+
+Usage: python -m benchmarks.bench_async_handlers [--updates N] [--users N]
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import stopwatch
+from tests.helpers import temporary_database
+from db.connection import get_session, get_async_session, async_db_disconnect
+from repositories.users import create_user
+from repositories.groups import create_group, add_member_to_group
+from services.expense_service import create_expense_with_split
+from services.balance_service import get_balance_with_names
+from services import aio
+
+REPLY_LATENCY = 0.005  # simulated round trip to the Telegram API
+SPLIT_SIZE = 5
+
+
+def seed(users, expenses_per_user):
+    session = get_session()
+    try:
+        user_ids = list(range(1, users + 1))
+        for user_id in user_ids:
+            create_user(session, user_id=user_id, first_name=f"User {user_id}")
+
+        group = create_group(session, name="Bench", created_by=user_ids[0])
+        for user_id in user_ids:
+            add_member_to_group(session, group_id=group[0], user_id=user_id)
+
+        for user_id in user_ids:
+            for n in range(expenses_per_user):
+                create_expense_with_split(
+                    session, desc=f"Expense {n}", amount_cents=3000, paid_by=user_id,
+                    group_id=group[0], IDs=user_ids[:SPLIT_SIZE]
+                )
+        return group[0], user_ids
+    finally:
+        session.close()
+
+
+# -----------------------
+# Simulated updates
+# -----------------------
+
+async def blocking_read(group_id, user_id, user_ids):
+    session = get_session()
+    try:
+        get_balance_with_names(session, user_id)
+    finally:
+        session.close()
+    await asyncio.sleep(REPLY_LATENCY)
+
+
+async def async_read(group_id, user_id, user_ids):
+    session = get_async_session()
+    try:
+        await aio.get_balance_with_names(session, user_id)
+    finally:
+        await session.close()
+    await asyncio.sleep(REPLY_LATENCY)
+
+
+async def blocking_write(group_id, user_id, user_ids):
+    session = get_session()
+    try:
+        create_expense_with_split(
+            session, desc="Bench", amount_cents=1000, paid_by=user_id,
+            group_id=group_id, IDs=user_ids[:SPLIT_SIZE]
+        )
+    finally:
+        session.close()
+    await asyncio.sleep(REPLY_LATENCY)
+
+
+async def async_write(group_id, user_id, user_ids):
+    session = get_async_session()
+    try:
+        await aio.create_expense_with_split(
+            session, desc="Bench", amount_cents=1000, paid_by=user_id,
+            group_id=group_id, IDs=user_ids[:SPLIT_SIZE]
+        )
+    finally:
+        await session.close()
+    await asyncio.sleep(REPLY_LATENCY)
+
+
+SCENARIOS = {
+    "read/blocking": blocking_read,
+    "read/async": async_read,
+    "write/blocking": blocking_write,
+    "write/async": async_write,
+}
+
+
+async def run(update, group_id, user_ids, updates):
+    await asyncio.gather(*(
+        update(group_id, user_ids[i % len(user_ids)], user_ids) for i in range(updates)
+    ))
+
+
+async def main_async(args, group_id, user_ids):
+    results = {}
+    # Warm both engines so connection setup is not measured.
+    await run(blocking_read, group_id, user_ids, len(user_ids))
+    await run(async_read, group_id, user_ids, len(user_ids))
+
+    for name, update in SCENARIOS.items():
+        with stopwatch(results, name):
+            await run(update, group_id, user_ids, args.updates)
+
+    await async_db_disconnect()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--expenses-per-user", type=int, default=10)
+    args = parser.parse_args()
+
+    with temporary_database():
+        group_id, user_ids = seed(args.users, args.expenses_per_user)
+        results = asyncio.run(main_async(args, group_id, user_ids))
+
+    print(f"{args.updates} concurrent updates per scenario, {args.users} users")
+    for name, seconds in results.items():
+        print(f"  {name:<15} {seconds:8.3f}s  {args.updates / seconds:9.1f} updates/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark get_user_balance against the original per-expense implementation.
+
+For each dataset size the heaviest user's balance is computed with both
+versions; the results must be identical and the timings are printed.
+
+Usage: python -m benchmarks.bench_balance [--sizes 100 1000 5000] [--repeat N]
+"""
+import argparse
+import time
+
+from sqlalchemy import select, and_
+
+from tests.helpers import temporary_database
+from db.connection import get_session
+from db.schema import expenses, expense_participants
+from tests.dataset import generate_dataset, HEAVY_USER_ID
+from services.balance_service import get_user_balance
+
+
+def legacy_get_user_balance(session, user_id, group_id=None):
+    """The N+1 implementation get_user_balance replaced, kept as a reference."""
+    balances = {}
+
+    query = select(
+        expenses.c.id.label('expense_id'),
+        expenses.c.paid_by,
+        expense_participants.c.amount_owed_cents
+    ).select_from(
+        expense_participants
+    ).join(
+        expenses, expense_participants.c.expense_id == expenses.c.id
+    ).where(
+        expense_participants.c.user_id == user_id
+    )
+    if group_id is not None:
+        query = query.where(expenses.c.group_id == group_id)
+
+    for expense in session.execute(query).fetchall():
+        if expense.paid_by == user_id:
+            others = session.execute(
+                select(
+                    expense_participants.c.user_id,
+                    expense_participants.c.amount_owed_cents
+                ).where(
+                    and_(
+                        expense_participants.c.expense_id == expense.expense_id,
+                        expense_participants.c.user_id != user_id
+                    )
+                )
+            ).fetchall()
+            for participant in others:
+                balances.setdefault(participant.user_id, 0)
+                balances[participant.user_id] += participant.amount_owed_cents
+        else:
+            balances.setdefault(expense.paid_by, 0)
+            balances[expense.paid_by] -= expense.amount_owed_cents
+
+    return {k: v for k, v in balances.items() if v != 0}
+
+
+def best_of(repeat, fn, *args):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--groups", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'expenses':>9} {'legacy':>10} {'current':>10} {'speedup':>8}")
+    for size in args.sizes:
+        with temporary_database():
+            session = get_session()
+            try:
+                generate_dataset(session, users=30, groups=args.groups,
+                                 expenses_per_group=size // args.groups)
+                legacy_time, legacy = best_of(args.repeat, legacy_get_user_balance, session, HEAVY_USER_ID)
+                current_time, current = best_of(args.repeat, get_user_balance, session, HEAVY_USER_ID)
+            finally:
+                session.close()
+
+        assert current == legacy, f"balances differ at {size} expenses"
+        print(f"{size:>9} {legacy_time * 1000:>8.1f}ms {current_time * 1000:>8.1f}ms {legacy_time / current_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
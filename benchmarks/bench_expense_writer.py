@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Compare expense write throughput with and without the group-commit writer.
+
+A burst of concurrent /addepense-style writes is issued against a fresh
+SQLite database, first with every write opening its own session and
+committing, then through ExpenseWriter. Both runs must leave the same
+ledger behind.
+
+Usage: python -m benchmarks.bench_expense_writer [--writes N] [--batch N] [--latency-ms N]
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import stopwatch
+from tests.helpers import temporary_database
+from db.connection import get_session, get_async_session, async_db_disconnect
+from repositories.users import create_user
+from repositories.groups import create_group, add_member_to_group
+from services import aio
+from services.balance_service import get_user_balance
+from services.expense_writer import ExpenseWriter
+
+MEMBERS = 5
+
+
+def seed():
+    session = get_session()
+    try:
+        user_ids = list(range(1, MEMBERS + 1))
+        for user_id in user_ids:
+            create_user(session, user_id=user_id, first_name=f"User {user_id}")
+        group = create_group(session, name="Dinner", created_by=user_ids[0])
+        for user_id in user_ids:
+            add_member_to_group(session, group_id=group[0], user_id=user_id)
+        return group[0], user_ids
+    finally:
+        session.close()
+
+
+def request(n, group_id, user_ids):
+    return {
+        "desc": f"Receipt {n}", "amount_cents": 1000 + n % 7, "paid_by": user_ids[n % len(user_ids)],
+        "group_id": group_id, "IDs": user_ids,
+    }
+
+
+async def direct_write(req):
+    session = get_async_session()
+    try:
+        return await aio.create_expense_with_split(session, **req)
+    finally:
+        await session.close()
+
+
+async def burst(writes, submit, group_id, user_ids):
+    try:
+        await asyncio.gather(*(submit(request(n, group_id, user_ids)) for n in range(writes)))
+    finally:
+        await async_db_disconnect()
+
+
+async def burst_through_writer(writes, writer, group_id, user_ids):
+    writer.start()
+    try:
+        await burst(writes, lambda req: writer.submit(**req), group_id, user_ids)
+    finally:
+        await writer.stop()
+        await async_db_disconnect()
+
+
+def final_balance(user_ids):
+    session = get_session()
+    try:
+        return get_user_balance(session, user_ids[0])
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    timings = {}
+
+    with temporary_database():
+        group_id, user_ids = seed()
+        with stopwatch(timings, "direct"):
+            asyncio.run(burst(args.writes, direct_write, group_id, user_ids))
+        direct_balance = final_balance(user_ids)
+
+    with temporary_database():
+        group_id, user_ids = seed()
+        writer = ExpenseWriter(max_batch=args.batch, max_latency=args.latency_ms / 1000)
+        with stopwatch(timings, "writer"):
+            asyncio.run(burst_through_writer(args.writes, writer, group_id, user_ids))
+        writer_balance = final_balance(user_ids)
+
+    assert direct_balance == writer_balance, "ledgers differ"
+    stats = writer.stats()
+    print(f"{'path':<8} {'seconds':>8} {'writes/s':>9} {'commits':>8}")
+    print(f"{'direct':<8} {timings['direct']:>8.2f} {args.writes / timings['direct']:>9.0f} {args.writes:>8}")
+    print(f"{'writer':<8} {timings['writer']:>8.2f} {args.writes / timings['writer']:>9.0f} {stats['batches']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming ledger export: time and peak memory by history size.
+
+For each size a group with that many expenses (each split between
+``--participants`` members) is bulk-inserted, then exported to a
+temporary file in both formats. Peak Python memory during the export is
+measured with tracemalloc and should stay flat as the history grows; a
+fetchall() of the same rows is measured alongside for comparison.
+
+Usage: python -m benchmarks.bench_export [--sizes 10000 100000] [--participants 4]
+"""
+import argparse
+import io
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+from tests.helpers import temporary_database
+from db.connection import get_session
+from db.schema import users, groups, expenses, expense_participants
+from repositories.expenses import iter_group_ledger
+from services.export_service import export_group_ledger
+from utils import split_cents
+
+GROUP_ID = 1
+BATCH = 10000
+
+
+def seed_history(session, size, participants):
+    """Insert ``size`` expenses of one group with equal splits, in bulk."""
+    member_ids = list(range(1, participants + 1))
+    session.execute(insert(users), [{"id": user_id, "first_name": f"Member {user_id}"} for user_id in member_ids])
+    session.execute(insert(groups), [{"id": GROUP_ID, "name": "Export", "created_by": member_ids[0]}])
+
+    for start in range(1, size + 1, BATCH):
+        ids = range(start, min(start + BATCH, size + 1))
+        session.execute(insert(expenses), [
+            {"id": expense_id, "description": f"Expense {expense_id}", "amount_cents": 1000 + expense_id % 9000,
+             "paid_by": member_ids[expense_id % participants], "group_id": GROUP_ID}
+            for expense_id in ids
+        ])
+        session.execute(insert(expense_participants), [
+            {"expense_id": expense_id, "user_id": user_id, "share_type": "equal", "amount_owed_cents": share}
+            for expense_id in ids
+            for user_id, share in zip(member_ids, split_cents(1000 + expense_id % 9000, participants))
+        ])
+    session.commit()
+
+
+def measure(fn):
+    """Return (seconds, peak bytes allocated) for one call of fn."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        fn()
+        return time.perf_counter() - started, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def export_to_tempfile(session, fmt):
+    with tempfile.TemporaryFile() as document:
+        text = io.TextIOWrapper(document, encoding="utf-8", newline="")
+        export_group_ledger(session, GROUP_ID, text, fmt)
+        text.flush()
+        return document.tell()
+
+
+def fetch_all(session):
+    return [row for chunk in iter_group_ledger(session, GROUP_ID, chunk_size=10 ** 9) for row in chunk]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--participants", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'expenses':>9} {'case':<10} {'seconds':>8} {'peak':>10} {'output':>10}")
+    for size in args.sizes:
+        with temporary_database():
+            session = get_session()
+            try:
+                seed_history(session, size, args.participants)
+                for fmt in ("csv", "ndjson"):
+                    sizes = []
+                    seconds, peak = measure(lambda: sizes.append(export_to_tempfile(session, fmt)))
+                    print(f"{size:>9} {fmt:<10} {seconds:>8.2f} {peak / 1024:>8.0f}KB {sizes[0] / 2 ** 20:>8.1f}MB")
+                seconds, peak = measure(lambda: fetch_all(session))
+                print(f"{size:>9} {'fetchall':<10} {seconds:>8.2f} {peak / 1024:>8.0f}KB {'-':>10}")
+            finally:
+                session.close()
+
+
+if __name__ == "__main__":
+    main()
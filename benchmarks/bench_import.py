@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Compare importing past expenses in chunks with writing them one at a time.
+
+A CSV of ``--rows`` expenses (equal splits between ``--members``
+members, with every fifth row a custom split) is written into a fresh
+SQLite group once with a create_expense_with_split call (and commit)
+per row, then through import_service.import_expenses at each of
+``--chunk-sizes``. Every run must leave the same ledger behind.
+
+Usage: python -m benchmarks.bench_import [--rows N] [--members N] [--chunk-sizes 100 500 2000]
+"""
+import argparse
+import io
+
+from benchmarks.common import stopwatch
+from tests.helpers import temporary_database
+from db.connection import get_session
+from db.migrations import run_migrations
+from repositories.balances import get_group_ledger
+from repositories.groups import create_group, add_member_to_group
+from repositories.users import create_user
+from services.expense_service import create_expense_with_split
+from services.import_service import import_expenses, pending_chunks, prepare_import
+from utils.query_profiler import profile_queries
+
+GROUP_ID = 1
+
+
+def build_csv(rows, members):
+    lines = ["date,description,amount,paid_by,participants,shares"]
+    for n in range(rows):
+        payer = 1 + n % members
+        if n % 5 == 0:
+            lines.append(f"2024-01-{1 + n % 28:02d},Item {n},30.00,{payer},1;2,20;10")
+        else:
+            lines.append(f"2024-01-{1 + n % 28:02d},Item {n},{10 + n % 90}.{n % 100:02d},{payer},,")
+    return "\n".join(lines).encode()
+
+
+def seed(session, members):
+    for user_id in range(1, members + 1):
+        create_user(session, user_id=user_id, first_name=f"Member {user_id}")
+    create_group(session, name="Import", created_by=1)
+    for user_id in range(1, members + 1):
+        add_member_to_group(session, group_id=GROUP_ID, user_id=user_id)
+
+
+def one_at_a_time(session, data):
+    document = io.BytesIO(data)
+    job = prepare_import(session, GROUP_ID, document)
+    for rows in pending_chunks(job, document):
+        for row in rows:
+            create_expense_with_split(
+                session, desc=row["description"], amount_cents=row["amount_cents"], paid_by=row["paid_by"],
+                group_id=GROUP_ID, IDs=row["IDs"], split_type=row["split_type"],
+                custom_amounts=row["custom_amounts"]
+            )
+
+
+def chunked(session, data, chunk_size):
+    import_expenses(session, GROUP_ID, io.BytesIO(data), chunk_size=chunk_size)
+
+
+def run(case, fn, members):
+    results = {}
+    with temporary_database() as engine:
+        run_migrations(engine)
+        session = get_session()
+        try:
+            seed(session, members)
+            with profile_queries(case) as profile, stopwatch(results, case):
+                fn(session)
+            ledger = sorted(get_group_ledger(session, GROUP_ID))
+        finally:
+            session.close()
+    return results[case], profile.count, ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--members", type=int, default=6)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[100, 500, 2000])
+    args = parser.parse_args()
+
+    data = build_csv(args.rows, args.members)
+    cases = [("one at a time", lambda session: one_at_a_time(session, data))]
+    cases += [
+        (f"chunks of {size}", lambda session, size=size: chunked(session, data, size))
+        for size in args.chunk_sizes
+    ]
+
+    print(f"{args.rows} expenses, {args.members} members")
+    print(f"{'case':<16} {'seconds':>8} {'rows/s':>9} {'statements':>11}")
+    ledgers = []
+    for case, fn in cases:
+        seconds, statements, ledger = run(case, fn, args.members)
+        ledgers.append(ledger)
+        print(f"{case:<16} {seconds:>8.2f} {args.rows / seconds:>9.0f} {statements:>11}")
+
+    assert all(ledger == ledgers[0] for ledger in ledgers), "runs left different ledgers"
+    print("ledgers match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Show query plans and latency of the hot lookups before and after the
+hot-path index migration.
+
+The dataset is built with the migration's indexes dropped and the schema
+stamped one version behind, then run_migrations() brings it up to date.
+
+Usage: python -m benchmarks.bench_indexes [--expenses N] [--repeat N]
+"""
+import argparse
+import time
+
+from sqlalchemy import select
+
+from tests.dataset import generate_dataset, HEAVY_USER_ID
+from tests.helpers import temporary_database
+from db.connection import get_session
+from db.migrations import run_migrations, set_schema_version
+from db.schema import expenses, expense_participants, group_members, groups
+
+HOT_TABLES = (expenses, expense_participants, group_members)
+
+
+def hot_queries(user_id, group_id, expense_id):
+    return {
+        "participations of user": select(
+            expense_participants.c.expense_id, expense_participants.c.amount_owed_cents
+        ).where(expense_participants.c.user_id == user_id),
+        "participants of expense": select(expense_participants).where(
+            expense_participants.c.expense_id == expense_id
+        ),
+        "expenses of group": select(expenses).where(expenses.c.group_id == group_id),
+        "expenses paid by user": select(expenses.c.id).where(expenses.c.paid_by == user_id),
+        "groups of user": select(groups).select_from(group_members).join(
+            groups, group_members.c.group_id == groups.c.id
+        ).where(group_members.c.user_id == user_id),
+    }
+
+
+def measure(engine, queries, repeat):
+    """Return {name: (plan, best seconds)} for each query."""
+    results = {}
+    with engine.connect() as conn:
+        for name, stmt in queries.items():
+            sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = " / ".join(row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql))
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                conn.execute(stmt).fetchall()
+                timings.append(time.perf_counter() - started)
+            results[name] = (plan, min(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--expenses", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with temporary_database() as engine:
+        run_migrations(engine)
+        for table in HOT_TABLES:
+            for index in table.indexes:
+                index.drop(engine)
+        with engine.begin() as conn:
+            set_schema_version(conn, 2)
+
+        session = get_session()
+        try:
+            generate_dataset(session, users=30, groups=5, expenses_per_group=args.expenses // 5)
+        finally:
+            session.close()
+
+        queries = hot_queries(user_id=HEAVY_USER_ID, group_id=1, expense_id=args.expenses // 2)
+        before = measure(engine, queries, args.repeat)
+        applied = run_migrations(engine)
+        after = measure(engine, queries, args.repeat)
+
+    print(f"{args.expenses} expenses; migrations applied: {applied}\n")
+    for name in queries:
+        plan_before, time_before = before[name]
+        plan_after, time_after = after[name]
+        print(name)
+        print(f"  before {time_before * 1000:8.3f}ms  {plan_before}")
+        print(f"  after  {time_after * 1000:8.3f}ms  {plan_after}")
+
+
+if __name__ == "__main__":
+    main()
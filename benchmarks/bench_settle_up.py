@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark the settle-up planner against settling the ledger pair by pair.
+
+For each group size a ledger is seeded as if the group had a long expense
+history (every member owing a handful of others), then both plans are
+computed. Both must settle every member; the transfer counts and the time
+taken are printed.
+
+Usage: python -m benchmarks.bench_settle_up [--sizes 20 200 2000] [--debts-per-member 10]
+"""
+import argparse
+import random
+
+from benchmarks.bench_balance import best_of
+from tests.helpers import temporary_database
+from db.connection import get_session
+from repositories.balances import apply_balance_deltas
+from services.settlement_service import get_net_positions, get_settle_up_plan, pairwise_transfers
+
+GROUP_ID = 1
+
+
+def seed_ledger(session, members, debts_per_member, seed=42):
+    """Write ledger rows for one group: each member owes a few random others.
+
+    Returns the number of rows written.
+    """
+    rng = random.Random(seed)
+    deltas = {}
+    for debtor in range(1, members + 1):
+        for creditor in rng.sample(range(1, members + 1), k=min(debts_per_member, members - 1) + 1):
+            if creditor != debtor:
+                deltas[(GROUP_ID, debtor, creditor)] = rng.randint(1, 100000)
+    apply_balance_deltas(session, deltas)
+    return len(deltas)
+
+
+def settles(positions, transfers):
+    remaining = dict(positions)
+    for debtor, creditor, amount in transfers:
+        remaining[debtor] = remaining.get(debtor, 0) + amount
+        remaining[creditor] = remaining.get(creditor, 0) - amount
+    return not any(remaining.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--debts-per-member", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'members':>8} {'ledger':>8} {'pairwise':>9} {'planned':>8} {'pairwise':>10} {'planner':>10}")
+    for size in args.sizes:
+        with temporary_database():
+            session = get_session()
+            try:
+                ledger_rows = seed_ledger(session, size, args.debts_per_member)
+                positions = get_net_positions(session, GROUP_ID)
+                pairwise_time, pairwise = best_of(args.repeat, pairwise_transfers, session, GROUP_ID)
+                planner_time, planned = best_of(args.repeat, get_settle_up_plan, session, GROUP_ID)
+            finally:
+                session.close()
+
+        assert settles(positions, pairwise), f"pairwise plan does not settle {size} members"
+        assert settles(positions, planned), f"planner does not settle {size} members"
+        print(f"{size:>8} {ledger_rows:>8} {len(pairwise):>9} {len(planned):>8} "
+              f"{pairwise_time * 1000:>8.1f}ms {planner_time * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
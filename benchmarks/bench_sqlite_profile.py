@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Concurrent read/write throughput with and without the SQLite profile.
+
+Writer threads keep adding expenses while reader threads keep computing
+balances, for a fixed duration per profile. Reported are operations per
+second and how many operations failed with "database is locked".
+
+Usage: python -m benchmarks.bench_sqlite_profile [--seconds N] [--readers N] [--writers N]
+"""
+import argparse
+import os
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from tests.dataset import generate_dataset
+from tests.helpers import temporary_database
+from db.connection import get_session
+from services.expense_service import create_expense_with_split
+from services.balance_service import get_user_balance
+
+PROFILES = ("off", "performance")
+counter_lock = threading.Lock()
+
+
+def bump(counters, key):
+    with counter_lock:
+        counters[key] += 1
+
+
+def reader(stop, counters, user_ids):
+    session = get_session()
+    n = 0
+    try:
+        while not stop.is_set():
+            try:
+                get_user_balance(session, user_ids[n % len(user_ids)])
+                session.commit()  # end the read transaction so WAL can checkpoint
+                bump(counters, "reads")
+            except OperationalError:
+                session.rollback()
+                bump(counters, "locked")
+            n += 1
+    finally:
+        session.close()
+
+
+def writer(stop, counters, group_id, members):
+    session = get_session()
+    n = 0
+    try:
+        while not stop.is_set():
+            payer = members[n % len(members)]
+            try:
+                create_expense_with_split(
+                    session, desc="Bench", amount_cents=1200, paid_by=payer, group_id=group_id,
+                    IDs=members
+                )
+                bump(counters, "writes")
+            except OperationalError:
+                bump(counters, "locked")
+            n += 1
+    finally:
+        session.close()
+
+
+def run_profile(profile, args):
+    os.environ["DB_SQLITE_PROFILE"] = "" if profile == "off" else profile
+    counters = {"reads": 0, "writes": 0, "locked": 0}
+
+    with temporary_database():
+        session = get_session()
+        try:
+            dataset = generate_dataset(session, users=30, groups=5, expenses_per_group=args.expenses // 5)
+        finally:
+            session.close()
+
+        stop = threading.Event()
+        group_id, members = next(iter(dataset["groups"].items()))
+        threads = [threading.Thread(target=reader, args=(stop, counters, dataset["user_ids"])) for _ in range(args.readers)]
+        threads += [threading.Thread(target=writer, args=(stop, counters, group_id, members)) for _ in range(args.writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--expenses", type=int, default=1000)
+    args = parser.parse_args()
+
+    previous = os.environ.get("DB_SQLITE_PROFILE")
+    try:
+        results = {profile: run_profile(profile, args) for profile in PROFILES}
+    finally:
+        if previous is None:
+            os.environ.pop("DB_SQLITE_PROFILE", None)
+        else:
+            os.environ["DB_SQLITE_PROFILE"] = previous
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g}s per profile")
+    print(f"{'profile':<12} {'reads/s':>9} {'writes/s':>9} {'locked':>7}")
+    for profile, counters in results.items():
+        print(f"{profile:<12} {counters['reads'] / args.seconds:>9.1f} "
+              f"{counters['writes'] / args.seconds:>9.1f} {counters['locked']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""Shared helpers for the benchmark scripts."""
+import contextlib
+import time
+
+
+@contextlib.contextmanager
+def stopwatch(results, key):
+    """Store the elapsed wall-clock seconds of the block in ``results[key]``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        results[key] = time.perf_counter() - started
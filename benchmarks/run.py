@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Run the benchmark suite and write machine-readable results.
+
+A synthetic dataset is generated into a temporary SQLite database, then
+every case is timed ``--repeat`` times. Handler cases run a second time
+with metrics enabled (``[metrics]``) to measure the instrumentation
+overhead. Results (min/median/p95/mean in
+milliseconds, plus the dataset spec and environment) are written as JSON
+so two runs can be compared with ``--compare``.
+
+Usage:
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from tests.dataset import generate_dataset, group_name, HEAVY_USER_ID
+from tests.helpers import temporary_database, fake_update, fake_context
+from db.connection import get_session, async_db_disconnect
+from db.migrations import run_migrations
+from services.balance_service import get_user_balance, get_balance_with_names
+from services.expense_service import create_expense_with_split
+from services.user_service import display_names
+from repositories.groups import get_groups_with_member_counts
+from bot import handlers
+from utils import metrics
+
+
+# -----------------------
+# Cases
+# -----------------------
+
+def service_cases(session, dataset):
+    """Return {name: zero-argument callable} for the service-level paths."""
+    group_id, members = max(dataset["groups"].items(), key=lambda item: len(item[1]))
+
+    def names_cold():
+        display_names.clear()
+        get_balance_with_names(session, HEAVY_USER_ID)
+
+    return {
+        "service.get_user_balance": lambda: get_user_balance(session, HEAVY_USER_ID),
+        "service.get_balance_with_names": lambda: get_balance_with_names(session, HEAVY_USER_ID),
+        "service.get_balance_with_names[cold]": names_cold,
+        "service.create_expense_with_split": lambda: create_expense_with_split(
+            session, desc="Bench", amount_cents=4200, paid_by=HEAVY_USER_ID, group_id=group_id, IDs=members
+        ),
+        "repository.get_groups_with_member_counts": lambda: get_groups_with_member_counts(
+            session, HEAVY_USER_ID, with_balance=True
+        ),
+    }
+
+
+def handler_cases(dataset):
+    """Return {name: coroutine function} for the bot handler paths."""
+    name = group_name(0)
+
+    return {
+        "handler./balance": lambda: handlers.balance(fake_update(HEAVY_USER_ID, "/balance"), fake_context()),
+        "handler./mygroups": lambda: handlers.my_groups(fake_update(HEAVY_USER_ID, "/mygroups"), fake_context()),
+        "handler./addepense": lambda: handlers.addepense(
+            fake_update(HEAVY_USER_ID, f"/addepense {name} 12.34 bench"), fake_context()
+        ),
+    }
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0] * 1000,
+        "median_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+
+def time_sync(fn, repeat):
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+
+async def time_async(fn, repeat):
+    await fn()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings)
+
+
+async def run_handler_cases(cases, repeat):
+    results = {}
+    try:
+        for name, fn in cases.items():
+            results[name] = await time_async(fn, repeat)
+    finally:
+        await async_db_disconnect()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(spec, repeat, only=None):
+    results = {}
+    with temporary_database() as engine:
+        run_migrations(engine)
+        session = get_session()
+        try:
+            generated = time.perf_counter()
+            dataset = generate_dataset(session, **spec)
+            generated = time.perf_counter() - generated
+
+            for name, fn in service_cases(session, dataset).items():
+                if only is None or only in name:
+                    results[name] = time_sync(fn, repeat)
+        finally:
+            session.close()
+
+        cases = {name: fn for name, fn in handler_cases(dataset).items() if only is None or only in name}
+        results.update(asyncio.run(run_handler_cases(cases, repeat)))
+
+        metrics.enable()
+        try:
+            instrumented = {f"{name}[metrics]": fn for name, fn in cases.items()}
+            results.update(asyncio.run(run_handler_cases(instrumented, repeat)))
+        finally:
+            metrics.disable()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "dataset": spec,
+            "dataset_seconds": generated,
+        },
+        "results": results,
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"{'case':<45} {'median':>10} {'p95':>10}" + (f" {'vs base':>9}" if baseline else ""))
+    for name, stats in report["results"].items():
+        line = f"{name:<45} {stats['median_ms']:>8.3f}ms {stats['p95_ms']:>8.3f}ms"
+        if baseline:
+            base = baseline["results"].get(name)
+            line += f" {stats['median_ms'] / base['median_ms']:>8.2f}x" if base else f" {'new':>9}"
+        print(line)
+
+    for name, stats in report["results"].items():
+        plain = report["results"].get(name.removesuffix("[metrics]"))
+        if name.endswith("[metrics]") and plain:
+            overhead = stats["median_ms"] - plain["median_ms"]
+            print(f"metrics overhead {name.removesuffix('[metrics]'):<28} {overhead:+.3f}ms median "
+                  f"({overhead / plain['median_ms']:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--group-size", type=int, default=8)
+    parser.add_argument("--expenses-per-group", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--only", help="run only cases whose name contains this text")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    spec = {
+        "users": args.users,
+        "groups": args.groups,
+        "group_size": args.group_size,
+        "expenses_per_group": args.expenses_per_group,
+        "seed": args.seed,
+    }
+    report = run_suite(spec, args.repeat, args.only)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        if baseline["meta"]["dataset"] != spec:
+            print("warning: baseline was run on a different dataset spec")
+
+    print_report(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Concurrent update processing that keeps each user's updates in order.
+
+PTB's default processor either handles updates one at a time or, with
+``concurrent_updates(n)``, runs any n of them at once. The second mode
+lets two updates of the same user race, so a ConversationHandler can
+see its state change under it and ``context.user_data`` can be written
+from two handlers at the same time.
+
+``OrderedUpdateProcessor`` runs updates of different users in parallel,
+up to ``max_concurrent_updates`` at once. Updates that share a key (the
+sending user by default, or the chat) run one at a time, in the order
+they arrived. Updates without a user or chat are not serialized.
+
+A user waiting behind their own earlier update does not use one of the
+running slots. Admitted updates, both waiting and running, are bounded
+separately by ``max_pending_updates``, so a burst still applies
+backpressure to the update fetcher. That is the bound PTB's own
+semaphore enforces, so the processor's ``max_concurrent_updates``
+property reports it; ``max_running_updates`` is the running cap.
+"""
+import asyncio
+
+from telegram.ext import BaseUpdateProcessor
+
+from bot.config import ORDERINGS
+
+
+def update_key(update, ordering="user"):
+    """The key whose updates must not overlap, or None for no ordering."""
+    user = getattr(update, "effective_user", None)
+    chat = getattr(update, "effective_chat", None)
+    if ordering == "chat" and chat is not None:
+        return ("chat", chat.id)
+    if user is not None:
+        return ("user", user.id)
+    if chat is not None:
+        return ("chat", chat.id)
+    return None
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    __slots__ = ("_ordering", "_running", "_max_running", "_locks", "processed", "waited")
+
+    def __init__(self, max_concurrent_updates, max_pending_updates=None, ordering="user"):
+        if ordering not in ORDERINGS:
+            raise ValueError(f"Unknown ordering {ordering!r}; expected one of {list(ORDERINGS)}")
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates must be a positive integer")
+        if max_pending_updates is None:
+            max_pending_updates = max_concurrent_updates * 8
+        if max_pending_updates < max_concurrent_updates:
+            raise ValueError("max_pending_updates must be at least max_concurrent_updates")
+
+        # The base class admits up to max_pending_updates at once; of those,
+        # _running lets max_concurrent_updates run.
+        super().__init__(max_pending_updates)
+        self._max_running = max_concurrent_updates
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._ordering = ordering
+        # key -> [lock, number of updates holding or waiting for it]
+        self._locks = {}
+        self.processed = 0
+        self.waited = 0
+
+    @property
+    def max_running_updates(self):
+        """The running cap, the constructor's ``max_concurrent_updates``."""
+        return self._max_running
+
+    @property
+    def max_pending_updates(self):
+        """The admission cap; PTB reports it as ``max_concurrent_updates``."""
+        return self.max_concurrent_updates
+
+    async def do_process_update(self, update, coroutine):
+        key = update_key(update, self._ordering)
+        if key is None:
+            async with self._running:
+                await coroutine
+            self.processed += 1
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        lock = entry[0]
+        if lock.locked():
+            self.waited += 1
+        try:
+            async with lock:
+                async with self._running:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+        self.processed += 1
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self):
+        return {
+            "max_running_updates": self.max_running_updates,
+            "max_pending_updates": self.max_pending_updates,
+            "active_keys": len(self._locks),
+            "processed": self.processed,
+            "waited": self.waited,
+        }
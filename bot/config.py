@@ -0,0 +1,97 @@
+"""
+Serving configuration for the bot, read from environment variables.
+
+BOT_MODE selects how updates arrive:
+    polling  (default) - long polling via getUpdates
+    webhook            - an embedded HTTP server receives updates pushed by
+                         Telegram (or by a reverse proxy in front of several
+                         workers)
+
+Webhook mode reads:
+    WEBHOOK_URL              public https URL Telegram posts to (required)
+    WEBHOOK_SECRET_TOKEN     checked against X-Telegram-Bot-Api-Secret-Token
+                             on every request (required)
+    WEBHOOK_LISTEN           address to bind (default 127.0.0.1, behind a proxy)
+    WEBHOOK_PORT             port to bind (default 8080)
+    WEBHOOK_PATH             URL path served locally (default: last path
+                             segment of WEBHOOK_URL)
+    WEBHOOK_MAX_CONNECTIONS  simultaneous HTTPS connections Telegram may open
+                             to deliver updates, 1-100 (default 40)
+
+Update processing (both modes) reads:
+    BOT_CONCURRENT_UPDATES   updates handled at the same time (default 8)
+    BOT_MAX_PENDING_UPDATES  updates admitted, waiting or running, before the
+                             fetcher is held back (default 8x the above)
+    BOT_UPDATE_ORDERING      user (default) or chat: updates with the same key
+                             are handled one at a time, in arrival order
+
+Metrics (both modes) read:
+    METRICS_PORT             serve Prometheus metrics on this port at
+                             /metrics; unset disables metrics entirely
+    METRICS_LISTEN           address to bind (default 127.0.0.1)
+"""
+import os
+import re
+from urllib.parse import urlparse
+
+BOT_MODES = ("polling", "webhook")
+ORDERINGS = ("user", "chat")
+
+# Telegram accepts 1-256 characters from this set as a secret token.
+SECRET_TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,256}$")
+
+
+def bot_mode():
+    mode = os.getenv("BOT_MODE", "polling").strip().lower()
+    if mode not in BOT_MODES:
+        raise ValueError(f"Unknown BOT_MODE {mode!r}; expected one of {list(BOT_MODES)}")
+    return mode
+
+
+def webhook_options():
+    """Keyword arguments for Application.run_webhook, from WEBHOOK_* variables."""
+    url = os.getenv("WEBHOOK_URL")
+    if not url:
+        raise ValueError("BOT_MODE=webhook needs WEBHOOK_URL")
+
+    secret_token = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+    if not SECRET_TOKEN_PATTERN.match(secret_token):
+        raise ValueError("BOT_MODE=webhook needs WEBHOOK_SECRET_TOKEN: 1-256 characters of A-Z, a-z, 0-9, _ and -")
+
+    max_connections = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    if not 1 <= max_connections <= 100:
+        raise ValueError("WEBHOOK_MAX_CONNECTIONS must be between 1 and 100")
+
+    return {
+        "listen": os.getenv("WEBHOOK_LISTEN", "127.0.0.1"),
+        "port": int(os.getenv("WEBHOOK_PORT", "8080")),
+        "url_path": os.getenv("WEBHOOK_PATH", urlparse(url).path.strip("/")),
+        "webhook_url": url,
+        "secret_token": secret_token,
+        "max_connections": max_connections,
+    }
+
+
+def update_processor_options():
+    """Keyword arguments for OrderedUpdateProcessor, from BOT_* variables."""
+    max_concurrent = int(os.getenv("BOT_CONCURRENT_UPDATES", "8"))
+    if max_concurrent < 1:
+        raise ValueError("BOT_CONCURRENT_UPDATES must be at least 1")
+
+    max_pending = int(os.getenv("BOT_MAX_PENDING_UPDATES", str(max_concurrent * 8)))
+    if max_pending < max_concurrent:
+        raise ValueError("BOT_MAX_PENDING_UPDATES must be at least BOT_CONCURRENT_UPDATES")
+
+    ordering = os.getenv("BOT_UPDATE_ORDERING", "user").strip().lower()
+    if ordering not in ORDERINGS:
+        raise ValueError(f"Unknown BOT_UPDATE_ORDERING {ordering!r}; expected one of {list(ORDERINGS)}")
+
+    return {"max_concurrent_updates": max_concurrent, "max_pending_updates": max_pending, "ordering": ordering}
+
+
+def metrics_options():
+    """Keyword arguments for MetricsServer, or None when METRICS_PORT is unset."""
+    port = os.getenv("METRICS_PORT", "").strip()
+    if not port:
+        return None
+    return {"listen": os.getenv("METRICS_LISTEN", "127.0.0.1"), "port": int(port)}
@@ -1,18 +1,48 @@
-from telegram import Update
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes, ConversationHandler
-from db.connection import get_session
-from repositories.users import (
-    create_user, get_user_by_id, get_user_by_identifier, set_custom_id, normalize_custom_id
+from db.connection import get_async_session
+from repositories.users import normalize_custom_id
+from repositories.aio import (
+    create_user, get_user_by_id, get_user_by_identifier, set_custom_id
 )
-from repositories.groups import (
-    create_group, add_member_to_group, get_groups_for_user, 
-    get_members_of_group, get_member_count, get_group_by_id
+from repositories.groups import normalize_group_name
+from repositories.aio import get_groups_with_member_counts, find_groups_by_names, find_group_by_name, suggest_groups_by_prefix
+from services.aio import get_balance_with_names, get_group_balance_with_names, ensure_user_exists, get_history_page
+from services.aio import export_group_ledger, get_import_members, find_import, start_import, import_chunk
+from services.import_service import file_fingerprint, check_rows, pending_chunks, InvalidImport, ImportConflict
+from services.aio import (
+    create_group, add_member_to_group, get_groups_for_user,
+    get_members_of_group, get_member_count, get_group_by_id, is_group_creator
 )
-from services.expense_service import create_expense_with_split
-from services.balance_service import get_balance_with_names
+from services.expense_writer import create_expense_with_split
 from decimal import Decimal
+import asyncio
+import io
+import re
+import tempfile
+import time
+from utils import to_cents, format_cents, split_cents, track_update, exceeds_max_amount, MAX_AMOUNT_CENTS
 import shlex
 
+# Telegram rejects documents larger than this from bots.
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
+# Bots can only download files up to this size.
+MAX_IMPORT_BYTES = 20 * 1024 * 1024
+
+# Least seconds between edits of an import's progress message.
+IMPORT_PROGRESS_INTERVAL = 2.0
+
+IMPORT_USAGE = (
+    "Send a CSV file with the caption `/import <group name>`, or reply to one with it.\n\n"
+    "One row per expense, with the columns\n"
+    "`date,description,amount,paid_by,participants,shares,currency`\n\n"
+    "Only description, amount and paid\\_by are required. Members are named by Telegram or "
+    "custom ID; participants (separated by `;`) default to the whole group, split equally "
+    "unless shares are given."
+)
+
 # Conversation states
 WAITING_FOR_GROUP_NAME, WAITING_FOR_MEMBER_SELECTION, WAITING_FOR_GROUP_SELECTION = range(3)
 
@@ -45,35 +75,53 @@ def _parse_addepense_payload(payload: str):
     if amount_idx == 0:
         return None, None, None, "Missing group name before amount."
 
-    if amount <= 0:
+    # Checked in cents, as stored: 0.004 rounds to nothing.
+    try:
+        if exceeds_max_amount(amount):
+            return None, None, None, f"Expense amount must be at most {format_cents(MAX_AMOUNT_CENTS)}."
+        amount_cents = to_cents(amount)
+    except (ArithmeticError, ValueError):
+        return None, None, None, "Expense amount is not a valid number."
+    if amount_cents <= 0:
         return None, None, None, "Expense amount must be greater than zero."
 
     group_name = " ".join(tokens[:amount_idx]).strip()
     description = " ".join(tokens[amount_idx + 1:]).strip() or "Shared expense"
     return group_name, amount, description, None
 
-def user_exists(session, user_id):
+async def user_exists(session, user_id):
     """Check if user exists in database"""
-    user = get_user_by_id(session, user_id)
+    user = await get_user_by_id(session, user_id)
     return user is not None
 
-def ensure_user_exists(session, user_id, username, first_name):
-    """Create user if they don't exist"""
-    if not user_exists(session, user_id):
-        create_user(session, user_id=user_id, username=username, first_name=first_name)
 
+async def resolve_group(session, user_id, name, owned_only=False):
+    """Find the user's group by name (case-insensitive).
+
+    Returns (group, suggestions); on a miss, suggestions holds the names of
+    up to five of the user's groups starting with the first word of ``name``.
+    """
+    group = await find_group_by_name(session, user_id, name, owned_only=owned_only)
+    if group:
+        return group, []
+
+    words = name.split()
+    suggestions = await suggest_groups_by_prefix(session, user_id, words[0] if words else "", owned_only=owned_only)
+    return None, [g.name for g in suggestions]
 
-def is_group_creator(session, group_id, user_id):
-    """Check whether the user created the group."""
-    group = get_group_by_id(session, group_id)
-    return bool(group and group[2] == user_id)
 
+def did_you_mean(suggestions):
+    if not suggestions:
+        return "Use /mygroups to see your groups."
+    return "Did you mean:\n" + "\n".join(f"• {name}" for name in suggestions)
+
+@track_update
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    session = get_session()
+    session = get_async_session()
     
     try:
-        ensure_user_exists(session, user.id, user.username, user.first_name)
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
         
         welcome_message = (
             f"👋 *Welcome, {user.first_name}!*\n\n"
@@ -83,6 +131,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"💸 `/addexpense` - Record an expense (guided)\n"
             f"⚡ `/addepense <group> <amount> [description]` - Quick add\n"
             f"📊 `/balance` - Check who owes what\n"
+            f"🧮 `/groupbalance <group>` - Balances and settle-up for a group\n"
+            f"📜 `/history <group>` - Browse a group's expenses\n"
+            f"📤 `/export <group> [csv|json]` - Download a group's ledger\n"
+            f"📥 `/import <group>` - Import past expenses from a CSV file\n"
             f"📋 `/mygroups` - View your groups\n"
             f"🆔 `/setid <custom_id>` - Set your own shareable ID\n"
             f"👥 `/addmember <group> <id...>` - Add members quickly\n\n"
@@ -94,22 +146,23 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode='Markdown'
         )
     finally:
-        session.close()
+        await session.close()
 
 
+@track_update
 async def create_group_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start the group creation process"""
     user = update.effective_user
-    session = get_session()
+    session = get_async_session()
 
     try:
-        ensure_user_exists(session, user.id, user.username, user.first_name)
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
 
         if update.message and context.args:
             group_name = " ".join(context.args).strip()
-            group = create_group(session, name=group_name, created_by=user.id)
+            group = await create_group(session, name=group_name, created_by=user.id)
             group_id = group[0]
-            add_member_to_group(session, group_id=group_id, user_id=user.id)
+            await add_member_to_group(session, group_id=group_id, user_id=user.id)
 
             context.user_data['current_group_id'] = group_id
             context.user_data['group_name'] = group_name
@@ -133,19 +186,20 @@ async def create_group_start(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return WAITING_FOR_GROUP_NAME
 
     finally:
-        session.close()
+        await session.close()
 
 
+@track_update
 async def receive_group_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Receive group name and create the group"""
     group_name = update.message.text.strip()
     user = update.effective_user
-    session = get_session()
+    session = get_async_session()
 
     try:
-        group = create_group(session, name=group_name, created_by=user.id)
+        group = await create_group(session, name=group_name, created_by=user.id)
         group_id = group[0]
-        add_member_to_group(session, group_id=group_id, user_id=user.id)
+        await add_member_to_group(session, group_id=group_id, user_id=user.id)
         
         # Store group_id in context for next steps
         context.user_data['current_group_id'] = group_id
@@ -165,25 +219,26 @@ async def receive_group_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return WAITING_FOR_MEMBER_SELECTION
 
     finally:
-        session.close()
+        await session.close()
 
 
+@track_update
 async def add_group_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add members to the group - handles text messages and forwarded messages"""
 
     group_id = context.user_data.get('current_group_id')
     acting_user_id = update.effective_user.id
 
-    session = get_session()
+    session = get_async_session()
     try:
-        if group_id and not is_group_creator(session, group_id, acting_user_id):
+        if group_id and not await is_group_creator(session, group_id, acting_user_id):
             await update.message.reply_text(
                 "⚠️ Only the group creator can add members. You can still use /addexpense for this group."
             )
             return WAITING_FOR_MEMBER_SELECTION
 
     finally:
-        session.close()
+        await session.close()
     
     if not update.message:
         return WAITING_FOR_MEMBER_SELECTION
@@ -195,17 +250,17 @@ async def add_group_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
         member_name = forwarded_user.first_name or forwarded_user.username or "Unknown"
         
         group_id = context.user_data.get('current_group_id')
-        session = get_session()
+        session = get_async_session()
         
         try:
             # Check if user exists, if not create them
-            if not user_exists(session, member_id):
-                create_user(session, user_id=member_id, 
+            if not await user_exists(session, member_id):
+                await create_user(session, user_id=member_id, 
                            username=forwarded_user.username, 
                            first_name=forwarded_user.first_name)
             
             # Check if already in group
-            members = get_members_of_group(session, group_id)
+            members = await get_members_of_group(session, group_id)
             if any(m[1] == member_id for m in members):
                 await update.message.reply_text(
                     f"⚠️ {member_name} is already in this group!"
@@ -213,8 +268,8 @@ async def add_group_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 return WAITING_FOR_MEMBER_SELECTION
             
             # Add member
-            add_member_to_group(session, group_id=group_id, user_id=member_id)
-            member_count = get_member_count(session, group_id)
+            await add_member_to_group(session, group_id=group_id, user_id=member_id)
+            member_count = await get_member_count(session, group_id)
             
             await update.message.reply_text(
                 f"✅ *{member_name}* added to group!\n\n"
@@ -226,7 +281,7 @@ async def add_group_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return WAITING_FOR_MEMBER_SELECTION
             
         finally:
-            session.close()
+            await session.close()
     
     # Handle text input
     raw_text = update.message.text.strip()
@@ -234,10 +289,10 @@ async def add_group_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if text == 'done':
         group_id = context.user_data.get('current_group_id')
-        session = get_session()
+        session = get_async_session()
         
         try:
-            member_count = get_member_count(session, group_id)
+            member_count = await get_member_count(session, group_id)
             
             if member_count < 2:
                 await update.message.reply_text(
@@ -247,7 +302,7 @@ async def add_group_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 return WAITING_FOR_MEMBER_SELECTION
             
-            group = get_group_by_id(session, group_id)
+            group = await get_group_by_id(session, group_id)
             group_name = group[1]
             
             await update.message.reply_text(
@@ -261,7 +316,7 @@ async def add_group_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return ConversationHandler.END
             
         finally:
-            session.close()
+            await session.close()
     
     elif text == 'cancel':
         await update.message.reply_text("❌ Group creation cancelled.")
@@ -270,10 +325,10 @@ async def add_group_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     else:
         group_id = context.user_data.get('current_group_id')
-        session = get_session()
+        session = get_async_session()
 
         try:
-            member = get_user_by_identifier(session, raw_text)
+            member = await get_user_by_identifier(session, raw_text)
             if not member:
                 await update.message.reply_text(
                     f"❌ I couldn't find `{raw_text}`.\n"
@@ -285,14 +340,14 @@ async def add_group_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
             member_id = member[0]
 
             # Check if already in group
-            members = get_members_of_group(session, group_id)
+            members = await get_members_of_group(session, group_id)
             if any(m[1] == member_id for m in members):
                 await update.message.reply_text("⚠️ This user is already in the group!")
                 return WAITING_FOR_MEMBER_SELECTION
 
             # Add member
-            add_member_to_group(session, group_id=group_id, user_id=member_id)
-            member_count = get_member_count(session, group_id)
+            await add_member_to_group(session, group_id=group_id, user_id=member_id)
+            member_count = await get_member_count(session, group_id)
 
             custom_id = member[1]
             id_hint = f" (custom ID: {custom_id})" if custom_id else ""
@@ -307,18 +362,19 @@ async def add_group_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return WAITING_FOR_MEMBER_SELECTION
 
         finally:
-            session.close()
+            await session.close()
 
 
+@track_update
 async def my_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show all groups the user is part of with beautiful formatting"""
     user = update.effective_user
-    session = get_session()
+    session = get_async_session()
     
     try:
-        ensure_user_exists(session, user.id, user.username, user.first_name)
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
         
-        groups = get_groups_for_user(session, user.id)
+        groups = await get_groups_with_member_counts(session, user.id, with_balance=True)
         
         if not groups:
             await update.message.reply_text(
@@ -332,9 +388,9 @@ async def my_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
         message = "📋 *Your Groups*\n\n"
         
         for i, group in enumerate(groups, 1):
-            group_id = group[0]
-            group_name = group[1]
-            member_count = get_member_count(session, group_id)
+            group_id = group.id
+            group_name = group.name
+            member_count = group.member_count
             
             # Add emoji based on group size
             if member_count == 2:
@@ -344,8 +400,15 @@ async def my_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
             else:
                 emoji = "👨‍👩‍👧‍👦"
             
+            if group.balance_cents > 0:
+                balance_note = f" • owed €{format_cents(group.balance_cents)}"
+            elif group.balance_cents < 0:
+                balance_note = f" • you owe €{format_cents(-group.balance_cents)}"
+            else:
+                balance_note = " • settled"
+            
             message += f"{i}. {emoji} *{group_name}*\n"
-            message += f"   └ {member_count} members • ID: `{group_id}`\n\n"
+            message += f"   └ {member_count} members • ID: `{group_id}`{balance_note}\n\n"
         
         await update.message.reply_text(
             message,
@@ -353,18 +416,19 @@ async def my_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         
     finally:
-        session.close()
+        await session.close()
 
 
+@track_update
 async def add_expense_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start adding an expense - first select group"""
     user = update.effective_user
-    session = get_session()
+    session = get_async_session()
     
     try:
-        ensure_user_exists(session, user.id, user.username, user.first_name)
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
 
-        groups = get_groups_for_user(session, user.id)
+        groups = await get_groups_with_member_counts(session, user.id)
 
         if not groups:
             await update.message.reply_text(
@@ -376,9 +440,9 @@ async def add_expense_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         selectable_groups = []
         message = "Select a group for this expense by sending the group ID or exact name:\n\n"
         for group in groups:
-            group_id = group[0]
-            group_name = group[1]
-            member_count = get_member_count(session, group_id)
+            group_id = group.id
+            group_name = group.name
+            member_count = group.member_count
 
             if member_count >= 2:
                 selectable_groups.append(group)
@@ -397,9 +461,10 @@ async def add_expense_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return WAITING_FOR_GROUP_SELECTION
         
     finally:
-        session.close()
+        await session.close()
 
 
+@track_update
 async def receive_group_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle group selection for expense from text (ID/name) or callback data."""
     selectable_groups = context.user_data.get('expense_selectable_groups', {})
@@ -480,9 +545,9 @@ async def receive_group_selection(update: Update, context: ContextTypes.DEFAULT_
     context.user_data['expense_group_id'] = group_id
     context.user_data.pop('expense_selectable_groups', None)
 
-    session = get_session()
+    session = get_async_session()
     try:
-        group = get_group_by_id(session, group_id)
+        group = await get_group_by_id(session, group_id)
         group_name = group[1]
 
         await target_message.reply_text(
@@ -496,14 +561,16 @@ async def receive_group_selection(update: Update, context: ContextTypes.DEFAULT_
         return ConversationHandler.END  # Next text message will be handled by handle_expense_details
 
     finally:
-        session.close()
+        await session.close()
 
 
+@track_update
 async def add_expense(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /addexpense command - wrapper to start conversation"""
     return await add_expense_start(update, context)
 
 
+@track_update
 async def addepense(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Create an expense directly from one command.
 
@@ -529,33 +596,29 @@ async def addepense(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    session = get_session()
+    session = get_async_session()
     try:
-        ensure_user_exists(session, user.id, user.username, user.first_name)
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
 
-        groups = get_groups_for_user(session, user.id)
-        if not groups:
-            await update.message.reply_text(
-                "❌ You are not in any groups yet.\n"
-                "Create one with /creategroup first."
-            )
-            return
-
-        group = next((g for g in groups if g[1].strip().lower() == group_name.lower()), None)
+        group, suggestions = await resolve_group(session, user.id, group_name)
         if not group:
-            available_names = "\n".join(f"• {g[1]}" for g in groups)
+            if not suggestions and not await get_groups_for_user(session, user.id):
+                await update.message.reply_text(
+                    "❌ You are not in any groups yet.\n"
+                    "Create one with /creategroup first."
+                )
+                return
+
             await update.message.reply_text(
                 "❌ Group not found.\n"
                 f"I parsed group name as: *{group_name}*\n\n"
-                "Make sure the name matches exactly.\n"
-                "Your groups:\n"
-                f"{available_names}",
+                f"{did_you_mean(suggestions)}",
                 parse_mode='Markdown'
             )
             return
 
         group_id = group[0]
-        members = get_members_of_group(session, group_id)
+        members = await get_members_of_group(session, group_id)
         member_ids = [member[1] for member in members]
 
         if len(member_ids) < 2:
@@ -566,31 +629,32 @@ async def addepense(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
-        create_expense_with_split(
+        amount_cents = to_cents(amount)
+        await create_expense_with_split(
             session=session,
             desc=description,
-            amount=amount,
+            amount_cents=amount_cents,
             paid_by=user.id,
             group_id=group_id,
             IDs=member_ids,
             split_type="equal"
         )
 
-        split_amount = amount / len(member_ids)
         await update.message.reply_text(
             "✅ *Expense added successfully!*\n\n"
             f"📁 Group: *{group[1]}*\n"
-            f"💰 Amount: €{amount:.2f}\n"
+            f"💰 Amount: €{format_cents(amount_cents)}\n"
             f"📝 Description: {description}\n"
-            f"👥 Members: {len(member_ids)} (€{split_amount:.2f} each)",
+            f"👥 Members: {len(member_ids)} (€{format_cents(split_cents(amount_cents, len(member_ids))[-1])} each)",
             parse_mode='Markdown'
         )
     except Exception as e:
         await update.message.reply_text(f"❌ Failed to add expense: {e}")
     finally:
-        session.close()
+        await session.close()
 
 
+@track_update
 async def addmember(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add one or more members to a group owned by the caller.
 
@@ -622,66 +686,36 @@ async def addmember(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    session = get_session()
+    session = get_async_session()
     try:
-        ensure_user_exists(session, user.id, user.username, user.first_name)
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
 
-        owned_groups = [g for g in get_groups_for_user(session, user.id) if g[2] == user.id]
-
-        group = None
-        member_identifiers = []
-        longest_match = -1
-
-        for candidate in owned_groups:
-            name_tokens = candidate[1].strip().split()
-            if not name_tokens or len(name_tokens) >= len(tokens):
-                continue
-
-            if [t.lower() for t in tokens[:len(name_tokens)]] == [t.lower() for t in name_tokens]:
-                if len(name_tokens) > longest_match:
-                    longest_match = len(name_tokens)
-                    group = candidate
-                    member_identifiers = tokens[len(name_tokens):]
+        # The group name is the longest run of leading tokens naming one of
+        # the caller's groups; every split is looked up in one query.
+        splits = {normalize_group_name(" ".join(tokens[:n])): n for n in range(1, len(tokens))}
+        matches = await find_groups_by_names(session, user.id, list(splits), owned_only=True)
 
+        group = max(matches, key=lambda g: splits[g.name_normalized], default=None)
         if not group:
-            # Fallback: explicit quoted name support from /addmember "My Group" user1 user2
-            quoted_name = tokens[0]
-            direct_group = next((g for g in owned_groups if g[1].lower() == quoted_name.lower()), None)
-            if direct_group:
-                group = direct_group
-                member_identifiers = tokens[1:]
-
-        if group and not member_identifiers:
+            suggestions = await suggest_groups_by_prefix(session, user.id, tokens[0], owned_only=True)
             await update.message.reply_text(
-                "Please provide at least one member identifier after the group name."
-            )
-            return
-
-        if not group:
-            # Fallback: explicit quoted name support from /addmember "My Group" user1 user2
-            quoted_name = tokens[0]
-            direct_group = next((g for g in owned_groups if g[1].lower() == quoted_name.lower()), None)
-            if direct_group:
-                group = direct_group
-                member_identifiers = tokens[1:]
-
-        if group and not member_identifiers:
-            await update.message.reply_text(
-                "❌ Could not match a group name from your command.\n"
+                "❌ Could not match a group you created from your command.\n"
                 "Tip: use quotes for clarity, e.g. `/addmember \"Trip to Rome\" alice-01`\n"
-                "Use /mygroups to see your groups.",
+                f"{did_you_mean([g.name for g in suggestions])}",
                 parse_mode='Markdown'
             )
             return
 
+        member_identifiers = tokens[splits[group.name_normalized]:]
+
         group_id = group[0]
-        members = get_members_of_group(session, group_id)
+        members = await get_members_of_group(session, group_id)
         member_ids = {m[1] for m in members}
         added = []
         skipped = []
 
         for identifier in member_identifiers:
-            member = get_user_by_identifier(session, identifier)
+            member = await get_user_by_identifier(session, identifier)
             if not member:
                 skipped.append(f"{identifier} (user not found)")
                 continue
@@ -691,7 +725,7 @@ async def addmember(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 skipped.append(f"{identifier} (already in group)")
                 continue
 
-            add_member_to_group(session, group_id=group_id, user_id=member_id)
+            await add_member_to_group(session, group_id=group_id, user_id=member_id)
             member_ids.add(member_id)
             added.append(identifier)
 
@@ -705,19 +739,20 @@ async def addmember(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
     finally:
-        session.close()
+        await session.close()
 
 
+@track_update
 async def setid(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set or view the caller custom ID for easy group invites."""
     user = update.effective_user
-    session = get_session()
+    session = get_async_session()
 
     try:
-        ensure_user_exists(session, user.id, user.username, user.first_name)
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
 
         if not context.args:
-            current_user = get_user_by_id(session, user.id)
+            current_user = await get_user_by_id(session, user.id)
             current_custom_id = current_user[1]
 
             if current_custom_id:
@@ -744,21 +779,22 @@ async def setid(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
-        existing = get_user_by_identifier(session, candidate)
+        existing = await get_user_by_identifier(session, candidate)
         if existing and existing[0] != user.id:
             await update.message.reply_text("❌ That custom ID is already taken. Try another one.")
             return
 
-        set_custom_id(session, user.id, candidate)
+        await set_custom_id(session, user.id, candidate)
         await update.message.reply_text(
             f"✅ Custom ID saved: `{candidate}`\n"
             f"Others can now add you to groups using this ID.",
             parse_mode='Markdown'
         )
     finally:
-        session.close()
+        await session.close()
 
 
+@track_update
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel current conversation"""
     await update.message.reply_text("Operation cancelled.")
@@ -766,16 +802,17 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+@track_update
 async def balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show user's balance - who owes them and who they owe"""
-    session = get_session()
+    session = get_async_session()
     user_id = update.effective_user.id
     
     try:
-        ensure_user_exists(session, user_id, update.effective_user.username, update.effective_user.first_name)
+        await ensure_user_exists(session, user_id, update.effective_user.username, update.effective_user.first_name)
         
         # Get balances
-        balances = get_balance_with_names(session, user_id)
+        balances = await get_balance_with_names(session, user_id)
         
         if not balances:
             await update.message.reply_text("💰 You have no expenses yet!")
@@ -783,19 +820,331 @@ async def balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         message = "💰 Your Balance:\n\n"
         
-        for name, amount in balances:
-            if amount > 0:
-                message += f"✅ {name} owes you €{amount:.2f}\n"
+        for name, cents in balances:
+            if cents > 0:
+                message += f"✅ {name} owes you €{format_cents(cents)}\n"
             else:
-                message += f"❌ You owe {name} €{abs(amount):.2f}\n"
+                message += f"❌ You owe {name} €{format_cents(-cents)}\n"
         
         await update.message.reply_text(message)
         
     finally:
-        session.close()
+        await session.close()
+
+
+@track_update
+async def group_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show every member's position in one group and how to settle up.
+
+    Usage: /groupbalance <group name>
+    """
+    user = update.effective_user
+    group_name = " ".join(context.args or []).strip()
+
+    if not group_name:
+        await update.message.reply_text(
+            "Usage: `/groupbalance <group name>`",
+            parse_mode='Markdown'
+        )
+        return
+
+    session = get_async_session()
+    try:
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
+
+        group, suggestions = await resolve_group(session, user.id, group_name)
+        if not group:
+            await update.message.reply_text(
+                f"❌ You are not in a group named *{group_name}*.\n"
+                f"{did_you_mean(suggestions)}",
+                parse_mode='Markdown'
+            )
+            return
+
+        positions, transfers = await get_group_balance_with_names(session, group[0])
+
+        message = f"📊 Balances in {group[1]}:\n\n"
+        for name, cents in positions:
+            if cents > 0:
+                message += f"✅ {name} is owed €{format_cents(cents)}\n"
+            elif cents < 0:
+                message += f"❌ {name} owes €{format_cents(-cents)}\n"
+            else:
+                message += f"➖ {name} is settled\n"
+
+        if transfers:
+            message += "\n💸 To settle up:\n"
+            for debtor, creditor, cents in transfers:
+                message += f"• {debtor} → {creditor}: €{format_cents(cents)}\n"
+        else:
+            message += "\n🎉 Everyone is settled up!"
+
+        await update.message.reply_text(message)
+
+    finally:
+        await session.close()
+
+
+def history_page_message(group_id, group_name, entries, has_older, has_newer):
+    """Text and older/newer buttons for one /history page.
+
+    The buttons carry the id of the page's edge expense, which is the
+    keyset cursor for the next page.
+    """
+    if not entries:
+        return f"📜 No expenses in {group_name} yet.", None
+
+    message = f"📜 Expenses in {group_name}:\n\n"
+    for expense_id, date, description, cents, payer in entries:
+        message += f"• {date:%Y-%m-%d} {description}: €{format_cents(cents)} (paid by {payer})\n"
+
+    buttons = []
+    if has_newer:
+        buttons.append(InlineKeyboardButton("⬅️ Newer", callback_data=f"history:{group_id}:newer:{entries[0][0]}"))
+    if has_older:
+        buttons.append(InlineKeyboardButton("Older ➡️", callback_data=f"history:{group_id}:older:{entries[-1][0]}"))
+    return message, InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+@track_update
+async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show a group's expenses, newest first, a page at a time.
+
+    Usage: /history <group name>
+    """
+    user = update.effective_user
+    group_name = " ".join(context.args or []).strip()
+
+    if not group_name:
+        await update.message.reply_text(
+            "Usage: `/history <group name>`",
+            parse_mode='Markdown'
+        )
+        return
+
+    session = get_async_session()
+    try:
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
+
+        group, suggestions = await resolve_group(session, user.id, group_name)
+        if not group:
+            await update.message.reply_text(
+                f"❌ You are not in a group named *{group_name}*.\n"
+                f"{did_you_mean(suggestions)}",
+                parse_mode='Markdown'
+            )
+            return
+
+        entries, has_older, has_newer = await get_history_page(session, group[0])
+        message, reply_markup = history_page_message(group[0], group[1], entries, has_older, has_newer)
+        await update.message.reply_text(message, reply_markup=reply_markup)
+
+    finally:
+        await session.close()
+
+
+@track_update
+async def history_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Turn a /history message to the older or newer page, editing it in place."""
+    query = update.callback_query
+    await query.answer()
+
+    _, group_id, direction, cursor = query.data.split(":")
+    group_id, cursor = int(group_id), int(cursor)
+
+    session = get_async_session()
+    try:
+        members = await get_members_of_group(session, group_id)
+        group = await get_group_by_id(session, group_id)
+        if group is None or query.from_user.id not in {member.user_id for member in members}:
+            await query.edit_message_text("❌ You are no longer in this group.")
+            return
+
+        if direction == "older":
+            page = await get_history_page(session, group_id, before_id=cursor)
+        else:
+            page = await get_history_page(session, group_id, after_id=cursor)
+
+        message, reply_markup = history_page_message(group_id, group.name, *page)
+        try:
+            await query.edit_message_text(message, reply_markup=reply_markup)
+        except BadRequest as e:
+            # A repeated tap on the same button leaves the message as it is.
+            if "not modified" not in str(e).lower():
+                raise
+
+    finally:
+        await session.close()
+
+
+@track_update
+async def export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send a group's full ledger as a CSV or NDJSON document.
+
+    Usage: /export <group name> [csv|json]
+
+    The ledger is streamed from the database into a temporary file, so
+    the bot's memory does not grow with the group's history.
+    """
+    user = update.effective_user
+    args = list(context.args or [])
+    fmt = "csv"
+    if args and args[-1].lower() in ("csv", "json", "ndjson"):
+        fmt = "csv" if args.pop().lower() == "csv" else "ndjson"
+    group_name = " ".join(args).strip()
+
+    if not group_name:
+        await update.message.reply_text(
+            "Usage: `/export <group name> [csv|json]`",
+            parse_mode='Markdown'
+        )
+        return
+
+    session = get_async_session()
+    try:
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
+
+        group, suggestions = await resolve_group(session, user.id, group_name)
+        if not group:
+            await update.message.reply_text(
+                f"❌ You are not in a group named *{group_name}*.\n"
+                f"{did_you_mean(suggestions)}",
+                parse_mode='Markdown'
+            )
+            return
+
+        with tempfile.TemporaryFile() as document:
+            text = io.TextIOWrapper(document, encoding="utf-8", newline="")
+            count = await export_group_ledger(session, group[0], text, fmt)
+            text.flush()
+            text.detach()
+            # Release the connection before the upload, which may take a while.
+            await session.close()
+
+            if count == 0:
+                await update.message.reply_text(f"📜 No expenses in {group[1]} yet.")
+                return
+            if document.tell() > MAX_DOCUMENT_BYTES:
+                await update.message.reply_text(
+                    f"❌ The {group[1]} ledger is larger than Telegram's 50 MB limit for bots."
+                )
+                return
+
+            document.seek(0)
+            slug = re.sub(r"[^a-z0-9]+", "-", group[1].lower()).strip("-") or "group"
+            await update.message.reply_document(
+                document=document,
+                filename=f"{slug}-ledger.{'csv' if fmt == 'csv' else 'ndjson'}",
+                caption=f"📤 {count} expenses from {group[1]}"
+            )
+
+    finally:
+        await session.close()
+
+
+def import_progress_text(job, group_name):
+    percent = 100 * job.rows_done // job.rows_total
+    return f"⏳ Importing into {group_name}: {job.rows_done} of {job.rows_total} expenses ({percent}%)"
+
+
+@track_update
+async def import_expenses(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Import past expenses into a group from a CSV document.
+
+    Usage: a CSV document captioned /import <group name>, or
+    /import <group name> in reply to one. Only the group creator can import.
+
+    The whole file is checked before anything is written, then written in
+    chunks while one message shows the progress. An interrupted import
+    resumes when the same file is sent again.
+    """
+    user = update.effective_user
+    message = update.message
+    replied = message.reply_to_message
+    document = message.document or (replied.document if replied else None)
+    command = (message.caption if message.document else message.text) or ""
+    parts = command.split(maxsplit=1)
+    group_name = parts[1].strip() if len(parts) > 1 else ""
+
+    if not group_name or document is None:
+        await message.reply_text(IMPORT_USAGE, parse_mode='Markdown')
+        return
+    if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+        await message.reply_text("❌ Bots can only download files up to 20 MB. Split the file and import the parts.")
+        return
+
+    session = get_async_session()
+    try:
+        await ensure_user_exists(session, user.id, user.username, user.first_name)
+
+        group, suggestions = await resolve_group(session, user.id, group_name)
+        if not group:
+            await message.reply_text(
+                f"❌ You are not in a group named *{group_name}*.\n"
+                f"{did_you_mean(suggestions)}",
+                parse_mode='Markdown'
+            )
+            return
+        if not await is_group_creator(session, group[0], user.id):
+            await message.reply_text("⚠️ Only the group creator can import expenses.")
+            return
+
+        with tempfile.TemporaryFile() as upload:
+            telegram_file = await document.get_file()
+            await telegram_file.download_to_memory(out=upload)
+
+            # Reading and checking the whole file happens in worker threads;
+            # only the lookups and writes run on the session.
+            try:
+                members = await get_import_members(session, group[0])
+                fingerprint = await asyncio.to_thread(file_fingerprint, upload)
+                job = await find_import(session, group[0], fingerprint, members)
+                if job is None or not job.finished:
+                    rows_total = await asyncio.to_thread(check_rows, upload, members)
+                if job is None:
+                    job = await start_import(session, group[0], fingerprint, rows_total, members, imported_by=user.id)
+            except InvalidImport as e:
+                await message.reply_text(f"❌ Nothing was imported. Fix the file and send it again:\n\n{e}")
+                return
+            except ImportConflict:
+                await message.reply_text(f"⏳ This file is already being imported into {group[1]}.")
+                return
+            if job.finished:
+                await message.reply_text(f"ℹ️ This file was already imported into {group[1]}.")
+                return
+
+            status = await message.reply_text(import_progress_text(job, group[1]))
+            last_edit = time.monotonic()
+            try:
+                chunks = pending_chunks(job, upload)
+                while (rows := await asyncio.to_thread(next, chunks, None)) is not None:
+                    await import_chunk(session, job, rows)
+                    if not job.finished and time.monotonic() - last_edit >= IMPORT_PROGRESS_INTERVAL:
+                        await status.edit_text(import_progress_text(job, group[1]))
+                        last_edit = time.monotonic()
+            except (InvalidImport, ImportConflict) as e:
+                await status.edit_text(
+                    f"❌ Import stopped after {job.rows_done} of {job.rows_total} expenses: {e}"
+                )
+                return
+            except Exception:
+                await status.edit_text(
+                    f"❌ Import stopped after {job.rows_done} of {job.rows_total} expenses. "
+                    f"Send the same file again to resume."
+                )
+                raise
+
+        resumed = f" (resumed after {job.resumed_from})" if job.resumed_from else ""
+        await status.edit_text(
+            f"✅ Imported {job.rows_total - job.resumed_from} expenses into {group[1]}{resumed}."
+        )
+
+    finally:
+        await session.close()
 
 
 # This would be called from a message handler after group selection
+@track_update
 async def handle_expense_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle expense amount and description after group is selected"""
     
@@ -809,47 +1158,57 @@ async def handle_expense_details(update: Update, context: ContextTypes.DEFAULT_T
     try:
         # Parse message: "50 Pizza dinner"
         parts = update.message.text.strip().split(maxsplit=1)
+        usage = "Please use format: `<amount> <description>`\nExample: `50 Pizza dinner`"
         
         if len(parts) < 2:
-            await update.message.reply_text(
-                "Please use format: `<amount> <description>`\n"
-                "Example: `50 Pizza dinner`",
-                parse_mode='Markdown'
-            )
+            await update.message.reply_text(usage, parse_mode='Markdown')
             return
         
-        amount = Decimal(parts[0])
+        try:
+            amount = Decimal(parts[0].replace(',', '.'))
+            if exceeds_max_amount(amount):
+                await update.message.reply_text(
+                    f"❌ Error: Expense amount must be at most {format_cents(MAX_AMOUNT_CENTS)}."
+                )
+                return
+            amount_cents = to_cents(amount)
+        except (ArithmeticError, ValueError):
+            # InvalidOperation for text that is not a number, Overflow for 1e999999.
+            await update.message.reply_text(usage, parse_mode='Markdown')
+            return
+        if amount_cents <= 0:
+            await update.message.reply_text("❌ Error: Expense amount must be greater than zero.")
+            return
         description = parts[1]
         user_id = update.effective_user.id
         group_id = context.user_data['expense_group_id']
         
-        session = get_session()
+        session = get_async_session()
         try:
             # Get all members of the group
-            members = get_members_of_group(session, group_id)
+            members = await get_members_of_group(session, group_id)
             member_ids = [member[1] for member in members]  # user_id is second column
             
             # Create expense split equally among all members
-            expense_id = create_expense_with_split(
+            expense_id = await create_expense_with_split(
                 session=session,
                 desc=description,
-                amount=amount,
+                amount_cents=amount_cents,
                 paid_by=user_id,
                 group_id=group_id,
                 IDs=member_ids,
                 split_type="equal"
             )
             
-            group = get_group_by_id(session, group_id)
+            group = await get_group_by_id(session, group_id)
             group_name = group[1]
-            split_amount = amount / len(member_ids)
             
             await update.message.reply_text(
                 f"✅ *Expense Added!*\n\n"
                 f"📁 Group: {group_name}\n"
-                f"💰 Total: €{amount}\n"
+                f"💰 Total: €{format_cents(amount_cents)}\n"
                 f"📝 Description: {description}\n"
-                f"👥 Split {len(member_ids)} ways: €{split_amount:.2f} each\n\n"
+                f"👥 Split {len(member_ids)} ways: €{format_cents(split_cents(amount_cents, len(member_ids))[-1])} each\n\n"
                 "Use /addexpense to add another, or /balance to review balances.",
                 parse_mode='Markdown'
             )
@@ -858,7 +1217,7 @@ async def handle_expense_details(update: Update, context: ContextTypes.DEFAULT_T
             context.user_data.pop('expense_group_id', None)
             
         finally:
-            session.close()
+            await session.close()
             
     except ValueError as e:
         await update.message.reply_text(f"❌ Error: Invalid amount. Please use a number.")
@@ -866,6 +1225,7 @@ async def handle_expense_details(update: Update, context: ContextTypes.DEFAULT_T
         await update.message.reply_text(f"❌ Error: {e}")
 
 
+@track_update
 async def handle_button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle all inline button callbacks"""
     query = update.callback_query
@@ -874,10 +1234,10 @@ async def handle_button_callback(update: Update, context: ContextTypes.DEFAULT_T
     if query.data == "check_balance":
         # Show balance
         user_id = query.from_user.id
-        session = get_session()
+        session = get_async_session()
         
         try:
-            balances = get_balance_with_names(session, user_id)
+            balances = await get_balance_with_names(session, user_id)
             
             if not balances:
                 keyboard = [[InlineKeyboardButton("➕ Add First Expense", callback_data="add_expense_quick")]]
@@ -894,11 +1254,11 @@ async def handle_button_callback(update: Update, context: ContextTypes.DEFAULT_T
             
             message = "💰 *Your Balance*\n\n"
             
-            for name, amount in balances:
-                if amount > 0:
-                    message += f"✅ *{name}* owes you €{amount:.2f}\n"
+            for name, cents in balances:
+                if cents > 0:
+                    message += f"✅ *{name}* owes you €{format_cents(cents)}\n"
                 else:
-                    message += f"❌ You owe *{name}* €{abs(amount):.2f}\n"
+                    message += f"❌ You owe *{name}* €{format_cents(-cents)}\n"
             
             keyboard = [[InlineKeyboardButton("➕ Add Expense", callback_data="add_expense_quick")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -910,15 +1270,15 @@ async def handle_button_callback(update: Update, context: ContextTypes.DEFAULT_T
             )
             
         finally:
-            session.close()
+            await session.close()
             
     elif query.data == "view_groups":
         # Show groups
         user_id = query.from_user.id
-        session = get_session()
+        session = get_async_session()
         
         try:
-            groups = get_groups_for_user(session, user_id)
+            groups = await get_groups_with_member_counts(session, user_id)
             
             if not groups:
                 keyboard = [[InlineKeyboardButton("➕ Create Group", callback_data="create_new_group")]]
@@ -936,9 +1296,8 @@ async def handle_button_callback(update: Update, context: ContextTypes.DEFAULT_T
             message = "📋 *Your Groups*\n\n"
             
             for i, group in enumerate(groups, 1):
-                group_id = group[0]
-                group_name = group[1]
-                member_count = get_member_count(session, group_id)
+                group_name = group.name
+                member_count = group.member_count
                 
                 if member_count == 2:
                     emoji = "👥"
@@ -963,7 +1322,7 @@ async def handle_button_callback(update: Update, context: ContextTypes.DEFAULT_T
             )
             
         finally:
-            session.close()
+            await session.close()
 
     else:
         await query.message.reply_text(
@@ -3,7 +3,7 @@ from telegram.ext import (
     CallbackQueryHandler, filters, ConversationHandler
 )
 from bot.handlers import (
-    start, balance, my_groups,
+    start, balance, group_balance, history, history_page, export, import_expenses, my_groups,
     create_group_start, receive_group_name, add_group_member,
     add_expense_start, receive_group_selection, handle_expense_details,
     handle_button_callback,
@@ -14,23 +14,78 @@ from bot.handlers import (
     WAITING_FOR_GROUP_NAME, WAITING_FOR_MEMBER_SELECTION, WAITING_FOR_GROUP_SELECTION
 )
 import os
-from db.connection import db_get
+from bot.config import bot_mode, webhook_options, update_processor_options, metrics_options
+from bot.concurrency import OrderedUpdateProcessor
+from bot.persistence import DatabasePersistence
+from bot.metrics_server import MetricsServer
+from db.connection import db_get, async_db_disconnect
 from db.schema import metadata
-from db.migrations import ensure_users_custom_id_column
+from db.migrations import run_migrations
+from services.expense_writer import expense_writer
+from utils import metrics
+
+# Set by main() when METRICS_PORT is configured.
+metrics_server = None
+
+
+async def start_background_tasks(app):
+    """Start group-committing expense writes and, if configured, the metrics endpoint."""
+    expense_writer.start()
+    if metrics_server:
+        await metrics_server.start()
+
+
+async def close_database(app):
+    """Stop the metrics endpoint, flush queued expense writes and release pooled async connections."""
+    if metrics_server:
+        await metrics_server.stop()
+    await expense_writer.stop()
+    await async_db_disconnect()
+
 
 def main():
+    global metrics_server
+
     # Get token from environment or use hardcoded (not recommended for production!)
     token = os.getenv("TELEGRAM_BOT_TOKEN", "8529720422:AAEOTNA8dwYf0Z98qyvxUmtYKY3NESvaTSo")
+
+    # Fail on bad serving config before touching the database.
+    mode = bot_mode()
+    webhook = webhook_options() if mode == "webhook" else None
+    update_processor = OrderedUpdateProcessor(**update_processor_options())
+    metrics_config = metrics_options()
     
     engine = db_get()
     metadata.create_all(engine)
-    ensure_users_custom_id_column(engine)
+    run_migrations(engine)
+
+    app = (
+        Application.builder()
+        .token(token)
+        # Different users run in parallel, each user's updates in order;
+        # expense writes from parallel updates share one commit.
+        .concurrent_updates(update_processor)
+        # Conversation state survives restarts; written in batches.
+        .persistence(DatabasePersistence())
+        .post_init(start_background_tasks)
+        .post_shutdown(close_database)
+        .build()
+    )
 
-    app = Application.builder().token(token).build()
+    if metrics_config:
+        metrics.enable()
+        metrics_server = MetricsServer(**metrics_config)
     
     # Simple command handlers
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("balance", balance))
+    app.add_handler(CommandHandler("groupbalance", group_balance))
+    app.add_handler(CommandHandler("history", history))
+    app.add_handler(CommandHandler("export", export))
+    app.add_handler(CommandHandler("import", import_expenses))
+    app.add_handler(MessageHandler(
+        filters.Document.ALL & filters.CaptionRegex(r"^/import(@\w+)?(\s|$)"), import_expenses
+    ))
     app.add_handler(CommandHandler("mygroups", my_groups))
     app.add_handler(CommandHandler("setid", setid))
     app.add_handler(CommandHandler("addmember", addmember))
@@ -38,6 +93,8 @@ def main():
     
     # Conversation handler for creating groups
     create_group_conv = ConversationHandler(
+        name="create_group",
+        persistent=True,
         allow_reentry=True,
         entry_points=[
             CommandHandler("creategroup", create_group_start),
@@ -60,6 +117,8 @@ def main():
     
     # Conversation handler for adding expenses
     add_expense_conv = ConversationHandler(
+        name="add_expense",
+        persistent=True,
         allow_reentry=True,
         entry_points=[
             CommandHandler("addexpense", add_expense_start),
@@ -79,6 +138,7 @@ def main():
     # Keep this scoped so conversation entry-point callbacks are handled by
     # their corresponding ConversationHandler.
     app.add_handler(CallbackQueryHandler(handle_button_callback, pattern="^(check_balance|view_groups)$"))
+    app.add_handler(CallbackQueryHandler(history_page, pattern=r"^history:\d+:(older|newer):\d+$"))
     
     # Handler for expense details (when user has selected a group)
     app.add_handler(MessageHandler(
@@ -94,11 +154,20 @@ def main():
     print("  /addexpense - Add an expense")
     print("  /addepense <group> <amount> [description] - Add an expense directly")
     print("  /balance - Check your balance")
+    print("  /groupbalance <group> - Balances and settle-up for a group")
+    print("  /history <group> - Browse a group's expenses")
+    print("  /export <group> [csv|json] - Download a group's ledger")
+    print("  /import <group> - Import past expenses from a CSV file")
     print("  /mygroups - View your groups")
     print("  /setid - Set your shareable custom ID")
     print("  /addmember - Add members to your group by name")
     print("\n💡 Tip: Type /start anytime to see available commands.")
-    app.run_polling()
+
+    if webhook:
+        print(f"\n🌐 Serving webhook on {webhook['listen']}:{webhook['port']}/{webhook['url_path']}")
+        app.run_webhook(**webhook)
+    else:
+        app.run_polling()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,59 @@
+"""
+Minimal HTTP endpoint serving ``GET /metrics`` in the Prometheus text format.
+
+Runs on the bot's event loop with asyncio streams; a scrape renders the
+registry in one go, which takes well under a millisecond, so there is no
+need for a thread or a web framework.
+"""
+import asyncio
+
+from utils import get_logger, metrics
+
+logger = get_logger("bot.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    def __init__(self, listen="127.0.0.1", port=9100, registry=None):
+        self.listen = listen
+        self.port = port
+        self.registry = registry or metrics.registry
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.listen, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("serving metrics on http://%s:%s/metrics", self.listen, self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Drain the headers; the request has no body we care about.
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+
+            method, path, *_ = request_line.decode("latin-1").split() + ["", ""]
+            if method != "GET":
+                status, body = "405 Method Not Allowed", "method not allowed\n"
+            elif path.split("?")[0] != "/metrics":
+                status, body = "404 Not Found", "not found\n"
+            else:
+                status, body = "200 OK", self.registry.render()
+
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
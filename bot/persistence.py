@@ -0,0 +1,207 @@
+"""
+Conversation state persisted in the bot's own database.
+
+The conversation flows keep their progress in ``context.user_data``
+(``current_group_id``, ``expense_group_id``, ...) and in the
+ConversationHandler state. Without persistence a restart or deploy drops
+every conversation in flight. ``DatabasePersistence`` keeps both in the
+``user_state`` and ``conversation_state`` tables:
+
+- Writes are batched. PTB hands over changed data every
+  ``update_interval`` seconds (BOT_PERSISTENCE_INTERVAL, default 30) and
+  once more on shutdown; everything handed over in one run is written in
+  a single transaction. A user's data is only written when it differs
+  from what was last stored.
+- user_data is loaded lazily, the first time an update of that user is
+  handled after a start, with one primary-key lookup. Startup only reads
+  the conversation states, and only conversations in flight have a row.
+
+Values are pickled, like PTB's PicklePersistence, so user_data keeps
+int dictionary keys.
+"""
+import asyncio
+import json
+import os
+import pickle
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from db.connection import get_async_session
+from repositories.aio import get_user_state, get_conversation_states, save_bot_state
+from utils import get_logger
+
+logger = get_logger("bot.persistence")
+
+EMPTY = pickle.dumps({})
+
+
+def encode_key(key):
+    return json.dumps(list(key))
+
+
+def decode_key(key):
+    return tuple(json.loads(key))
+
+
+class DatabasePersistence(BasePersistence):
+    def __init__(self, update_interval=None):
+        if update_interval is None:
+            update_interval = float(os.getenv("BOT_PERSISTENCE_INTERVAL", "30"))
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        # user_id -> pickled user_data as last loaded or stored; doubles as
+        # the set of users whose state has been loaded.
+        self._stored = {}
+        # Changes handed over by PTB and not written yet.
+        self._pending_users = {}
+        self._pending_drops = set()
+        self._pending_conversations = {}
+        self._write_task = None
+        self.batches = 0
+        self.user_writes = 0
+        self.user_loads = 0
+
+    # -----------------------
+    # Loading
+    # -----------------------
+
+    async def get_user_data(self):
+        # Loaded per user in refresh_user_data instead of all at startup.
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        """Load the user's stored data the first time they are seen."""
+        if user_id in self._stored:
+            return
+
+        session = get_async_session()
+        try:
+            data = await get_user_state(session, user_id)
+        finally:
+            await session.close()
+
+        if user_id in self._stored:
+            return
+        self._stored[user_id] = data or EMPTY
+        self.user_loads += 1
+        if data:
+            for key, value in pickle.loads(data).items():
+                user_data.setdefault(key, value)
+
+    async def get_conversations(self, name):
+        session = get_async_session()
+        try:
+            rows = await get_conversation_states(session, name)
+        finally:
+            await session.close()
+        return {decode_key(key): pickle.loads(state) for key, state in rows}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # -----------------------
+    # Batched writes
+    # -----------------------
+
+    async def update_user_data(self, user_id, data):
+        pickled = pickle.dumps(data)
+        if pickled == self._stored.get(user_id, EMPTY):
+            return
+        self._pending_drops.discard(user_id)
+        self._pending_users[user_id] = pickled
+        await self._write_soon()
+
+    async def drop_user_data(self, user_id):
+        self._pending_users.pop(user_id, None)
+        self._pending_drops.add(user_id)
+        await self._write_soon()
+
+    async def update_conversation(self, name, key, new_state):
+        self._pending_conversations[(name, encode_key(key))] = (
+            None if new_state is None else pickle.dumps(new_state)
+        )
+        await self._write_soon()
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def flush(self):
+        """Write whatever is still pending; called by PTB on shutdown."""
+        if self._write_task is not None:
+            await asyncio.gather(self._write_task, return_exceptions=True)
+        await self._write()
+
+    async def _write_soon(self):
+        """Join the write of the current batch, starting it if needed.
+
+        PTB runs all update_* calls of one persistence run as concurrent
+        tasks; the first one schedules the write, which runs after the
+        others have staged their changes, so the run is one transaction.
+        Only that first call waits for it, so a failure is reported once.
+        """
+        if self._write_task is not None:
+            return
+        self._write_task = asyncio.get_running_loop().create_task(self._write())
+        try:
+            await self._write_task
+        finally:
+            self._write_task = None
+
+    async def _write(self):
+        users, self._pending_users = self._pending_users, {}
+        drops, self._pending_drops = self._pending_drops, set()
+        conversations, self._pending_conversations = self._pending_conversations, {}
+        if not (users or drops or conversations):
+            return
+
+        session = get_async_session()
+        try:
+            await save_bot_state(session, users=users, dropped_users=drops, conversations=conversations)
+        except Exception:
+            # Put the batch back under any keys not changed since, for the next run.
+            for user_id, data in users.items():
+                if user_id not in self._pending_drops:
+                    self._pending_users.setdefault(user_id, data)
+            self._pending_drops |= drops - set(self._pending_users)
+            for key, state in conversations.items():
+                self._pending_conversations.setdefault(key, state)
+            raise
+        finally:
+            await session.close()
+
+        self.batches += 1
+        self.user_writes += len(users)
+        self._stored.update(users)
+        for user_id in drops:
+            self._stored[user_id] = EMPTY
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "user_writes": self.user_writes,
+            "user_loads": self.user_loads,
+            "loaded_users": len(self._stored),
+        }
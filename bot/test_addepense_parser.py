@@ -23,6 +23,24 @@ class TestAddEpenseParser(unittest.TestCase):
         group, amount, description, error = _parse_addepense_payload("30 dinner")
         self.assertEqual(error, "Missing group name before amount.")
 
+    def test_rejects_amounts_that_round_to_zero_cents(self):
+        for payload in ("Trip 0 x", "Trip 0.004 x", "Trip -5 x"):
+            with self.subTest(payload):
+                _, _, _, error = _parse_addepense_payload(payload)
+                self.assertEqual(error, "Expense amount must be greater than zero.")
+
+    def test_rejects_amounts_that_are_not_numbers(self):
+        _, _, _, error = _parse_addepense_payload("Trip NaN x")
+        self.assertEqual(error, "Expense amount is not a valid number.")
+
+    def test_rejects_amounts_too_large_to_store(self):
+        for payload in ("Trip 1000000000.01 x", "Trip 1e20 x", "Trip 1e999999 x"):
+            with self.subTest(payload):
+                _, _, _, error = _parse_addepense_payload(payload)
+                self.assertEqual(error, "Expense amount must be at most 1000000000.00.")
+        _, amount, _, error = _parse_addepense_payload("Trip 1000000000 x")
+        self.assertIsNone(error)
+
 
 if __name__ == '__main__':
     unittest.main()
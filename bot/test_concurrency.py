@@ -0,0 +1,123 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from bot.concurrency import OrderedUpdateProcessor, update_key
+
+
+def fake_update(user_id, chat_id=None):
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id), effective_chat=SimpleNamespace(id=chat_id or user_id)
+    )
+
+
+class Recorder:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.log = []
+
+    async def handle(self, user_id, seq, delay):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        self.log.append(("start", user_id, seq))
+        await asyncio.sleep(delay)
+        self.log.append(("end", user_id, seq))
+        self.running -= 1
+
+
+def dispatch(processor, recorder, updates):
+    """Feed updates like Application does: one task per update, in order."""
+    async def scenario():
+        async with processor:
+            await asyncio.gather(*(
+                asyncio.create_task(
+                    processor.process_update(fake_update(user_id), recorder.handle(user_id, seq, delay))
+                )
+                for user_id, seq, delay in updates
+            ))
+    asyncio.run(scenario())
+
+
+class TestUpdateKey(unittest.TestCase):
+    def test_keys_by_user_or_chat(self):
+        update = fake_update(7, chat_id=-100)
+        self.assertEqual(update_key(update), ("user", 7))
+        self.assertEqual(update_key(update, "chat"), ("chat", -100))
+
+    def test_updates_without_sender_are_not_serialized(self):
+        self.assertIsNone(update_key(SimpleNamespace(effective_user=None, effective_chat=None)))
+
+
+class TestOrderedUpdateProcessor(unittest.TestCase):
+    def test_same_user_runs_in_arrival_order_without_overlap(self):
+        recorder = Recorder()
+        # The first update is the slowest, so unordered processing would finish it last.
+        dispatch(OrderedUpdateProcessor(8), recorder, [(1, 0, 0.03), (1, 1, 0.01), (1, 2, 0)])
+
+        self.assertEqual(recorder.log, [
+            ("start", 1, 0), ("end", 1, 0), ("start", 1, 1), ("end", 1, 1), ("start", 1, 2), ("end", 1, 2)
+        ])
+
+    def test_different_users_run_in_parallel_up_to_the_cap(self):
+        recorder = Recorder()
+        processor = OrderedUpdateProcessor(3)
+        dispatch(processor, recorder, [(user_id, 0, 0.01) for user_id in range(10)])
+
+        self.assertEqual(recorder.peak, 3)
+        self.assertEqual(processor.stats()["processed"], 10)
+        self.assertEqual(processor.stats()["active_keys"], 0)
+
+    def test_a_busy_user_does_not_hold_running_slots(self):
+        recorder = Recorder()
+        updates = [(1, seq, 0.01) for seq in range(5)] + [(2, 0, 0)]
+        dispatch(OrderedUpdateProcessor(2), recorder, updates)
+
+        # User 2 finishes while user 1 is still working through its backlog.
+        self.assertLess(recorder.log.index(("end", 2, 0)), recorder.log.index(("start", 1, 1)))
+
+    def test_admitted_updates_are_bounded_by_max_pending(self):
+        processor = OrderedUpdateProcessor(2, max_pending_updates=5)
+        self.assertEqual(processor.max_running_updates, 2)
+        self.assertEqual(processor.max_pending_updates, 5)
+        self.assertEqual(processor.max_concurrent_updates, 5)
+        self.assertEqual(
+            (processor.stats()["max_running_updates"], processor.stats()["max_pending_updates"]), (2, 5)
+        )
+
+        admitted = []
+        release = None
+
+        async def handle(seq):
+            admitted.append(seq)
+            await release.wait()
+
+        async def scenario():
+            nonlocal release
+            release = asyncio.Event()
+            async with processor:
+                # Every update is the same user's, so all but one wait on its lock.
+                tasks = [
+                    asyncio.create_task(processor.process_update(fake_update(1), handle(seq)))
+                    for seq in range(8)
+                ]
+                await asyncio.sleep(0.01)
+                waiting = processor._locks[("user", 1)][1]
+                release.set()
+                await asyncio.gather(*tasks)
+                return waiting
+
+        self.assertEqual(asyncio.run(scenario()), 5)
+        self.assertEqual(admitted, list(range(8)))
+
+    def test_rejects_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            OrderedUpdateProcessor(0)
+        with self.assertRaises(ValueError):
+            OrderedUpdateProcessor(4, max_pending_updates=2)
+        with self.assertRaises(ValueError):
+            OrderedUpdateProcessor(4, ordering="thread")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+from tests.helpers import temporary_database
+from bot.persistence import DatabasePersistence
+from db.connection import async_db_disconnect
+from db.migrations import run_migrations
+
+
+def run(coroutine_fn):
+    async def scenario():
+        try:
+            return await coroutine_fn()
+        finally:
+            await async_db_disconnect()
+    return asyncio.run(scenario())
+
+
+class TestDatabasePersistence(unittest.TestCase):
+    def setUp(self):
+        self._database = temporary_database()
+        run_migrations(self._database.__enter__())
+
+    def tearDown(self):
+        self._database.__exit__(None, None, None)
+
+    def test_state_survives_a_restart(self):
+        async def before_restart():
+            persistence = DatabasePersistence(update_interval=60)
+            await persistence.refresh_user_data(1, {})
+            # One persistence run, the way Application.update_persistence issues it.
+            await asyncio.gather(
+                persistence.update_user_data(1, {"expense_selectable_groups": {5: "Trip"}}),
+                persistence.update_user_data(2, {}),
+                persistence.update_conversation("add_expense", (1, 1), 2),
+            )
+            return persistence.stats()
+
+        stats = run(before_restart)
+        self.assertEqual(stats["batches"], 1)
+        self.assertEqual(stats["user_writes"], 1)
+
+        async def after_restart():
+            persistence = DatabasePersistence(update_interval=60)
+            conversations = await persistence.get_conversations("add_expense")
+            user_data = {}
+            await persistence.refresh_user_data(1, user_data)
+            return conversations, user_data, await persistence.get_user_data()
+
+        conversations, user_data, eager = run(after_restart)
+        self.assertEqual(conversations, {(1, 1): 2})
+        self.assertEqual(user_data, {"expense_selectable_groups": {5: "Trip"}})
+        self.assertEqual(eager, {})
+
+    def test_unchanged_data_is_not_rewritten_and_ended_conversations_are_deleted(self):
+        async def scenario():
+            persistence = DatabasePersistence(update_interval=60)
+            user_data = {}
+            await persistence.refresh_user_data(1, user_data)
+            user_data["current_group_id"] = 3
+            await asyncio.gather(
+                persistence.update_user_data(1, dict(user_data)),
+                persistence.update_conversation("create_group", (1, 1), 1),
+            )
+            await persistence.update_user_data(1, dict(user_data))
+            await persistence.update_conversation("create_group", (1, 1), None)
+            await persistence.drop_user_data(1)
+            await persistence.flush()
+
+            restarted = DatabasePersistence(update_interval=60)
+            reloaded = {}
+            await restarted.refresh_user_data(1, reloaded)
+            return persistence.stats(), await restarted.get_conversations("create_group"), reloaded
+
+        stats, conversations, reloaded = run(scenario)
+        self.assertEqual(stats["user_writes"], 1)
+        self.assertEqual(stats["batches"], 3)
+        self.assertEqual(conversations, {})
+        self.assertEqual(reloaded, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
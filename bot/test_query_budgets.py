@@ -0,0 +1,134 @@
+"""
+Query budgets: the most statements each handler and service path may run.
+
+Budgets are measured with cold caches on a dataset where the user has
+several groups and dozens of counterparties, so a per-group or per-user
+query (an N+1) blows well past them. Raise a budget only together with
+the change that needs it.
+"""
+import asyncio
+import unittest
+
+from tests.dataset import generate_dataset, group_name, HEAVY_USER_ID
+from tests.helpers import temporary_database, fake_update, fake_context
+from bot import handlers
+from db.connection import get_session, async_db_disconnect
+from db.migrations import run_migrations
+from services import group_service
+from services.balance_service import get_user_balance, get_balance_with_names, get_group_balance_with_names
+from services.expense_service import create_expense_with_split
+from services.user_service import display_names
+from utils.query_profiler import profile_queries, QueryBudgetExceeded
+
+SERVICE_BUDGETS = {
+    "get_user_balance": 2,
+    "get_balance_with_names": 3,
+    "get_group_balance_with_names": 3,
+    "create_expense_with_split": 3,
+}
+
+HANDLER_BUDGETS = {
+    "/start": 1,
+    "/balance": 4,
+    "/mygroups": 2,
+    "/groupbalance": 5,
+    "/history": 4,
+    "/export": 3,
+    "/addepense": 6,
+}
+
+
+def clear_caches():
+    group_service.clear_caches()
+    display_names.clear()
+
+
+class TestQueryBudgets(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._database = temporary_database()
+        run_migrations(cls._database.__enter__())
+        session = get_session()
+        try:
+            dataset = generate_dataset(session, users=60, groups=6, group_size=6, expenses_per_group=20)
+        finally:
+            session.close()
+        cls.group_id, cls.members = next(iter(dataset["groups"].items()))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._database.__exit__(None, None, None)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_service_functions_stay_within_budget(self):
+        session = get_session()
+        calls = {
+            "get_user_balance": lambda: get_user_balance(session, HEAVY_USER_ID),
+            "get_balance_with_names": lambda: get_balance_with_names(session, HEAVY_USER_ID),
+            "get_group_balance_with_names": lambda: get_group_balance_with_names(session, self.group_id),
+            "create_expense_with_split": lambda: create_expense_with_split(
+                session, desc="Budget", amount_cents=1000, paid_by=HEAVY_USER_ID,
+                group_id=self.group_id, IDs=self.members
+            ),
+        }
+        try:
+            for name, call in calls.items():
+                with self.subTest(name):
+                    clear_caches()
+                    with profile_queries(name, budget=SERVICE_BUDGETS[name]):
+                        call()
+        finally:
+            session.close()
+
+    def test_handlers_stay_within_budget(self):
+        name = group_name(0)
+        calls = {
+            "/start": (handlers.start, "/start"),
+            "/balance": (handlers.balance, "/balance"),
+            "/mygroups": (handlers.my_groups, "/mygroups"),
+            "/groupbalance": (handlers.group_balance, f"/groupbalance {name}"),
+            "/history": (handlers.history, f"/history {name}"),
+            "/export": (handlers.export, f"/export {name} csv"),
+            "/addepense": (handlers.addepense, f"/addepense {name} 12.34 budget"),
+        }
+
+        async def scenario():
+            try:
+                for command, (handler, text) in calls.items():
+                    with self.subTest(command):
+                        clear_caches()
+                        update = fake_update(HEAVY_USER_ID, text)
+                        with profile_queries(command, budget=HANDLER_BUDGETS[command]):
+                            await handler(update, fake_context(text.split()[1:]))
+            finally:
+                await async_db_disconnect()
+
+        asyncio.run(scenario())
+
+    def test_an_n_plus_one_fails_its_budget(self):
+        session = get_session()
+        try:
+            with self.assertRaises(QueryBudgetExceeded) as raised:
+                with profile_queries("per-member lookups", budget=2):
+                    for user_id in self.members:
+                        get_user_balance(session, user_id)
+        finally:
+            session.close()
+        self.assertIn("per-member lookups", str(raised.exception))
+
+    def test_profiles_nest(self):
+        session = get_session()
+        try:
+            with profile_queries("outer") as outer:
+                with profile_queries("inner") as inner:
+                    get_user_balance(session, HEAVY_USER_ID)
+                get_user_balance(session, HEAVY_USER_ID)
+        finally:
+            session.close()
+        self.assertEqual((inner.count, outer.count), (2, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import socket
+import unittest
+from unittest import mock
+
+from bot.config import webhook_options
+from bot.webhook_client import load_updates, post_update
+
+try:
+    import tornado  # noqa: F401  (python-telegram-bot[webhooks])
+except ImportError:
+    tornado = None
+
+SAMPLE_UPDATES = os.path.join(os.path.dirname(__file__), "sample_updates.ndjson")
+SECRET = "test-secret_123"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestWebhookOptions(unittest.TestCase):
+    def test_reads_url_path_secret_and_connection_cap(self):
+        env = {"WEBHOOK_URL": "https://bot.example.com/paylash/hook", "WEBHOOK_SECRET_TOKEN": SECRET,
+               "WEBHOOK_MAX_CONNECTIONS": "80"}
+        with mock.patch.dict(os.environ, env, clear=True):
+            options = webhook_options()
+        self.assertEqual(options["url_path"], "paylash/hook")
+        self.assertEqual(options["secret_token"], SECRET)
+        self.assertEqual(options["max_connections"], 80)
+        self.assertEqual((options["listen"], options["port"]), ("127.0.0.1", 8080))
+
+    def test_rejects_missing_or_invalid_secret(self):
+        for secret in ("", "has spaces", "x" * 257):
+            env = {"WEBHOOK_URL": "https://bot.example.com/hook", "WEBHOOK_SECRET_TOKEN": secret}
+            with mock.patch.dict(os.environ, env, clear=True), self.assertRaises(ValueError):
+                webhook_options()
+
+
+@unittest.skipIf(tornado is None, "python-telegram-bot[webhooks] is not installed")
+class TestWebhookServer(unittest.TestCase):
+    def test_stand_in_client_delivers_only_with_the_secret(self):
+        from telegram import Bot
+        from telegram.ext import Updater
+
+        updates = load_updates(SAMPLE_UPDATES)
+        port = free_port()
+        env = {"WEBHOOK_URL": "https://bot.example.com/hook", "WEBHOOK_SECRET_TOKEN": SECRET,
+               "WEBHOOK_PORT": str(port)}
+        with mock.patch.dict(os.environ, env, clear=True):
+            options = webhook_options()
+
+        async def scenario():
+            url = f"http://127.0.0.1:{port}/hook"
+            queue = asyncio.Queue()
+            updater = Updater(Bot("1:fake"), queue)
+            # The server is real; only the calls to the Bot API are stubbed.
+            with mock.patch.object(Bot, "get_me", mock.AsyncMock()), \
+                    mock.patch.object(Bot, "set_webhook", mock.AsyncMock(return_value=True)) as set_webhook:
+                async with updater:
+                    await updater.start_webhook(**options)
+                    try:
+                        accepted = [await asyncio.to_thread(post_update, url, update, SECRET) for update in updates]
+                        rejected = await asyncio.to_thread(post_update, url, updates[0], "wrong")
+                        missing = await asyncio.to_thread(post_update, url, updates[0])
+                    finally:
+                        await updater.stop()
+            received = [queue.get_nowait() for _ in range(queue.qsize())]
+            return accepted, rejected, missing, received, set_webhook.call_args.kwargs
+
+        accepted, rejected, missing, received, registered = asyncio.run(scenario())
+
+        self.assertEqual([status for status, _ in accepted], [200] * len(updates))
+        self.assertEqual(rejected[0], 403)
+        self.assertEqual(missing[0], 403)
+        self.assertEqual([update.message.text for update in received], [u["message"]["text"] for u in updates])
+        self.assertEqual((registered["url"], registered["secret_token"]), ("https://bot.example.com/hook", SECRET))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Telegram's webhook delivery.
+
+POSTs recorded Update payloads to a running webhook server with the
+secret token header Telegram would send, and reports the status and
+round-trip time of each request. Useful for exercising BOT_MODE=webhook
+without a public URL, and for tests.
+
+Usage:
+    python -m bot.webhook_client http://127.0.0.1:8080/telegram bot/sample_updates.ndjson \\
+        [--secret-token TOKEN] [--repeat N]
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import urllib.error
+import urllib.request
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def load_updates(path):
+    """Read updates from a JSON array or from one JSON object per line."""
+    with open(path) as fh:
+        content = fh.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def post_update(url, update, secret_token=None, timeout=10):
+    """POST one update; return (HTTP status, seconds taken)."""
+    headers = {"Content-Type": "application/json"}
+    if secret_token:
+        headers[SECRET_TOKEN_HEADER] = secret_token
+    request = urllib.request.Request(url, data=json.dumps(update).encode(), headers=headers, method="POST")
+
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("url")
+    parser.add_argument("updates", help="JSON or NDJSON file of recorded updates")
+    parser.add_argument("--secret-token", default=os.getenv("WEBHOOK_SECRET_TOKEN"))
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    updates = load_updates(args.updates)
+    timings = []
+    for round_number in range(args.repeat):
+        for n, update in enumerate(updates):
+            # Telegram never redelivers an update_id, so give each copy its own.
+            update = dict(update, update_id=update.get("update_id", 0) + round_number * len(updates))
+            status, seconds = post_update(args.url, update, args.secret_token)
+            timings.append(seconds)
+            print(f"update {update['update_id']:>6}: HTTP {status} in {seconds * 1000:.1f}ms")
+
+    print(f"\n{len(timings)} updates, median {statistics.median(timings) * 1000:.1f}ms, "
+          f"max {max(timings) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,47 @@
-from sqlalchemy import create_engine, Engine
+from sqlalchemy import create_engine, Engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from utils import get_logger
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+import logging
 import os
 
 logger = get_logger("db.connection")
 
 db = None
+async_db = None
+SessionLocal = None
+AsyncSessionLocal = None
+
+# Async drivers used when DB_URL names a sync driver.
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+# Pool settings read from the environment: (variable, create_engine kwarg, type).
+POOL_SETTINGS = (
+    ("DB_POOL_SIZE", "pool_size", int),
+    ("DB_MAX_OVERFLOW", "max_overflow", int),
+    ("DB_POOL_RECYCLE", "pool_recycle", int),
+    ("DB_POOL_TIMEOUT", "pool_timeout", float),
+)
+
+# Opt-in SQLite tuning (DB_SQLITE_PROFILE=performance), applied to every new
+# connection: WAL lets readers run alongside a writer, synchronous=NORMAL
+# skips the fsync on each commit (still safe in WAL mode), and the rest
+# size the page cache and memory map and enforce foreign keys.
+SQLITE_PROFILES = {
+    "performance": (
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("busy_timeout", "5000"),
+        ("cache_size", "-65536"),
+        ("mmap_size", "268435456"),
+        ("foreign_keys", "ON"),
+    ),
+}
 
 def db_get():
     global db
@@ -22,24 +57,147 @@ def db_connect():
 
     if db is None:
         db_url = db_get_url()
-        db = create_engine(db_url, echo=True)
+        configure_sql_echo()
+        db = create_engine(db_url, **pool_options())
+        apply_sqlite_profile(db)
         logger.info("database created: %s", db_url)
 
     return db
 
 
 def db_disconnect():
-    global db
+    global db, SessionLocal
 
     if db is not None:
         db.dispose()
         db = None
+        SessionLocal = None
 
 def db_get_url():
     return os.getenv('DB_URL', 'sqlite:///./paylash.db')
 
 
+def pool_options():
+    """Connection pool arguments for create_engine, from DB_POOL_* variables.
+
+    Only variables that are set are passed, so SQLite in-memory databases
+    (which use a pool without size limits) keep working with no config.
+    """
+    options = {}
+    for variable, option, cast in POOL_SETTINGS:
+        value = os.getenv(variable)
+        if value:
+            options[option] = cast(value)
+    return options
+
+
+def sqlite_profile_pragmas():
+    """Return the (pragma, value) pairs selected by DB_SQLITE_PROFILE, if any."""
+    profile = os.getenv("DB_SQLITE_PROFILE", "").strip().lower()
+    if not profile or profile in ("0", "off", "none"):
+        return ()
+
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown DB_SQLITE_PROFILE {profile!r}; expected one of {sorted(SQLITE_PROFILES)}")
+    return SQLITE_PROFILES[profile]
+
+
+def apply_sqlite_profile(engine):
+    """Run the configured PRAGMAs on each new SQLite connection of ``engine``."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    pragmas = sqlite_profile_pragmas()
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in pragmas:
+                cursor.execute(f"PRAGMA {pragma}={value}")
+        finally:
+            cursor.close()
+
+    logger.info("sqlite profile: %s", ", ".join(f"{p}={v}" for p, v in pragmas))
+
+
+def set_sql_echo(enabled=True, module="sqlalchemy.engine"):
+    """Turn SQL logging on or off for one SQLAlchemy logger.
+
+    ``module`` is a logger name such as ``sqlalchemy.engine`` (statements)
+    or ``sqlalchemy.pool`` (checkouts), so noisy parts can be enabled alone.
+    """
+    logging.getLogger(module).setLevel(logging.INFO if enabled else logging.WARNING)
+
+
+def configure_sql_echo():
+    """Apply DB_ECHO: unset/0 is off, 1 logs statements, or a comma list of loggers."""
+    setting = os.getenv("DB_ECHO", "").strip()
+    if setting.lower() in ("", "0", "false", "no"):
+        return
+
+    if setting.lower() in ("1", "true", "yes"):
+        setting = "sqlalchemy.engine"
+
+    for module in setting.split(","):
+        set_sql_echo(True, module.strip())
+
+
 def get_session():
-    engine = db_get()
-    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    global SessionLocal
+
+    if SessionLocal is None:
+        SessionLocal = sessionmaker(bind=db_get(), autoflush=False, autocommit=False, future=True)
     return SessionLocal()
+
+
+# -----------------------
+# Async engine
+# -----------------------
+
+def async_db_get_url():
+    """Return the async driver URL, derived from DB_URL unless ASYNC_DB_URL is set."""
+    async_url = os.getenv('ASYNC_DB_URL')
+    if async_url:
+        return async_url
+
+    db_url = db_get_url()
+    scheme, sep, rest = db_url.partition("://")
+    if "+" not in scheme and scheme in ASYNC_DRIVERS:
+        return f"{ASYNC_DRIVERS[scheme]}{sep}{rest}"
+
+    return db_url
+
+
+def async_db_get():
+    global async_db
+
+    if async_db is None:
+        db_url = async_db_get_url()
+        configure_sql_echo()
+        # aiosqlite defaults to NullPool, which opens a connection (and a
+        # thread) per session; keep connections pooled like the sync engine.
+        async_db = create_async_engine(db_url, poolclass=AsyncAdaptedQueuePool, **pool_options())
+        apply_sqlite_profile(async_db.sync_engine)
+        logger.info("async database created: %s", db_url)
+
+    return async_db
+
+
+async def async_db_disconnect():
+    global async_db, AsyncSessionLocal
+
+    if async_db is not None:
+        await async_db.dispose()
+        async_db = None
+        AsyncSessionLocal = None
+
+
+def get_async_session():
+    global AsyncSessionLocal
+
+    if AsyncSessionLocal is None:
+        AsyncSessionLocal = async_sessionmaker(bind=async_db_get(), autoflush=False, expire_on_commit=False)
+    return AsyncSessionLocal()
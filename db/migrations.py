@@ -1,18 +1,228 @@
-from sqlalchemy import inspect, text
+"""
+Versioned schema migrations.
 
+Each migration is a numbered step applied inside its own transaction,
+together with the bump of schema_version. On boot run_migrations() reads
+the stored version once and only runs the steps that are newer, so an
+up-to-date database costs a single SELECT.
 
-def ensure_users_custom_id_column(engine):
+Steps must be idempotent: a fresh database gets its tables from
+metadata.create_all() and then replays every step to reach the latest
+version.
+"""
+from sqlalchemy import inspect, text, select, insert, update, bindparam
+from sqlalchemy.orm import Session
+
+from db.schema import (
+    metadata, balances, expenses, expense_participants, groups, group_members, schema_version,
+    user_state, conversation_state, expense_imports
+)
+from repositories.balances import rebuild_balances
+from repositories.groups import normalize_group_name
+from utils import get_logger
+
+logger = get_logger("db.migrations")
+
+
+def add_users_custom_id(conn):
     """Add users.custom_id for existing SQLite databases."""
-    inspector = inspect(engine)
-    columns = {column["name"] for column in inspector.get_columns("users")}
+    columns = {column["name"] for column in inspect(conn).get_columns("users")}
 
-    with engine.begin() as conn:
-        if "custom_id" not in columns:
-            conn.execute(text("ALTER TABLE users ADD COLUMN custom_id VARCHAR(64)"))
+    if "custom_id" not in columns:
+        conn.execute(text("ALTER TABLE users ADD COLUMN custom_id VARCHAR(64)"))
+
+    conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_users_custom_id "
+            "ON users(custom_id) WHERE custom_id IS NOT NULL"
+        )
+    )
+
+
+def column_names(conn, table):
+    return {column["name"] for column in inspect(conn).get_columns(table.name)}
+
+
+def create_indexes(conn, table):
+    """Create the table's indexes, skipping ones whose columns do not exist yet."""
+    existing = column_names(conn, table)
+    for index in table.indexes:
+        if {column.name for column in index.columns} <= existing:
+            index.create(conn, checkfirst=True)
+
+
+def backfill_balances_ledger(conn):
+    """Fill the balances ledger for databases that predate it.
+
+    create_all() adds the empty table; if there is expense history but no
+    ledger rows yet, rebuild the ledger from that history once. Databases
+    still storing decimal amounts are rebuilt by convert_amounts_to_cents.
+    """
+    if "amount_owed_cents" not in column_names(conn, expense_participants):
+        return
+
+    has_ledger = conn.execute(select(balances.c.debtor).limit(1)).first() is not None
+    has_history = conn.execute(select(expense_participants.c.id).limit(1)).first() is not None
 
+    if has_history and not has_ledger:
+        with Session(bind=conn) as session:
+            rebuild_balances(session, commit=False)
+
+
+def add_hot_path_indexes(conn):
+    """Index the columns balance, ledger and group lookups filter on."""
+    for table in (expenses, expense_participants, group_members):
+        create_indexes(conn, table)
+
+
+def add_groups_name_normalized(conn):
+    """Add and backfill groups.name_normalized, and index it.
+
+    Normalization (casefold, collapsed whitespace) is done in Python, since
+    SQLite's lower() only folds ASCII.
+    """
+    if "name_normalized" not in column_names(conn, groups):
+        conn.execute(text("ALTER TABLE groups ADD COLUMN name_normalized VARCHAR(255)"))
+
+    rows = conn.execute(select(groups.c.id, groups.c.name).where(groups.c.name_normalized.is_(None))).fetchall()
+    if rows:
         conn.execute(
-            text(
-                "CREATE UNIQUE INDEX IF NOT EXISTS ux_users_custom_id "
-                "ON users(custom_id) WHERE custom_id IS NOT NULL"
-            )
+            update(groups).where(groups.c.id == bindparam("group_id")).values(name_normalized=bindparam("normalized")),
+            [{"group_id": row.id, "normalized": normalize_group_name(row.name)} for row in rows]
         )
+
+    create_indexes(conn, groups)
+
+
+# old column -> new integer cents column, per table
+CENTS_COLUMNS = {
+    "expenses": {"amount": "amount_cents"},
+    "expense_participants": {"amount_owed": "amount_owed_cents", "share_value": "share_value_cents"},
+}
+
+
+def convert_amounts_to_cents(conn):
+    """Move decimal money columns to integer cents.
+
+    Each old column gets an INTEGER *_cents twin filled with
+    ROUND(amount * 100), then is dropped (after the indexes that cover it).
+    The ledger is derived data, so it is recreated and rebuilt from the
+    converted shares.
+    """
+    converted = False
+    for table_name, renames in CENTS_COLUMNS.items():
+        table = metadata.tables[table_name]
+        columns = column_names(conn, table)
+        old_columns = [old for old in renames if old in columns]
+        if not old_columns:
+            continue
+
+        for index in table.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+        for old in old_columns:
+            new = renames[old]
+            if new not in columns:
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {new} INTEGER"))
+            conn.execute(text(
+                f"UPDATE {table_name} SET {new} = CAST(ROUND({old} * 100) AS INTEGER) "
+                f"WHERE {old} IS NOT NULL"
+            ))
+            conn.execute(text(f"ALTER TABLE {table_name} DROP COLUMN {old}"))
+
+        create_indexes(conn, table)
+        converted = True
+
+    if "amount" in column_names(conn, balances):
+        balances.drop(conn)
+        balances.create(conn)
+        converted = True
+
+    if converted:
+        with Session(bind=conn) as session:
+            rebuild_balances(session, commit=False)
+
+
+def add_bot_state_tables(conn):
+    """Create the tables bot/persistence.py keeps conversation state in."""
+    for table in (user_state, conversation_state):
+        table.create(conn, checkfirst=True)
+
+
+def add_expense_history_index(conn):
+    """Replace ix_expenses_group_id with the (group_id, id) index /history pages on."""
+    conn.execute(text("DROP INDEX IF EXISTS ix_expenses_group_id"))
+    create_indexes(conn, expenses)
+
+
+def add_expense_imports_table(conn):
+    """Create the table bulk imports record their progress in."""
+    expense_imports.create(conn, checkfirst=True)
+
+
+# (version, description, step). Append only; never renumber.
+MIGRATIONS = [
+    (1, "users.custom_id column", add_users_custom_id),
+    (2, "balances ledger backfill", backfill_balances_ledger),
+    (3, "hot-path indexes", add_hot_path_indexes),
+    (4, "groups.name_normalized column", add_groups_name_normalized),
+    (5, "money columns as integer cents", convert_amounts_to_cents),
+    (6, "bot conversation state tables", add_bot_state_tables),
+    (7, "expenses (group_id, id) history index", add_expense_history_index),
+    (8, "expense imports table", add_expense_imports_table),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Return the stored schema version, 0 for an unversioned database."""
+    version = conn.execute(select(schema_version.c.version)).scalar()
+    return version or 0
+
+
+def set_schema_version(conn, version):
+    result = conn.execute(update(schema_version).values(version=version))
+    if result.rowcount == 0:
+        conn.execute(insert(schema_version).values(version=version))
+
+
+def run_migrations(engine):
+    """Apply every migration newer than the stored version.
+
+    Returns the list of versions applied (empty when already current).
+    """
+    schema_version.create(engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+
+        with engine.begin() as conn:
+            step(conn)
+            set_schema_version(conn, version)
+
+        logger.info("applied migration %s: %s", version, description)
+        applied.append(version)
+
+    return applied
+
+
+# -----------------------
+# Single-step helpers
+# -----------------------
+
+def ensure_users_custom_id_column(engine):
+    """Add users.custom_id for existing SQLite databases."""
+    with engine.begin() as conn:
+        add_users_custom_id(conn)
+
+
+def ensure_balances_ledger(engine):
+    """Rebuild the balances ledger if expense history exists without it."""
+    with engine.begin() as conn:
+        backfill_balances_ledger(conn)
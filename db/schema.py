@@ -1,7 +1,7 @@
 from sqlalchemy import (
     Table, Column, MetaData,
-    Integer, String, Text, Numeric, Date, DateTime,
-    ForeignKey, CheckConstraint, PrimaryKeyConstraint,
+    Integer, String, Text, Date, DateTime, LargeBinary,
+    ForeignKey, CheckConstraint, PrimaryKeyConstraint, Index,
     func
 )
 
@@ -23,7 +23,10 @@ groups = Table(
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("name", String(255), nullable=False),
     Column("created_by", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
-    Column("created_at", DateTime(timezone=True), server_default=func.now())
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    # normalize_group_name(name); what name lookups compare against.
+    Column("name_normalized", String(255), nullable=True),
+    Index("ix_groups_name_normalized", "name_normalized", "id")
 )
 
 group_members = Table(
@@ -32,20 +35,26 @@ group_members = Table(
     Column("group_id", Integer, ForeignKey("groups.id", ondelete="CASCADE"), nullable=False),
     Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
     Column("joined_at", DateTime(timezone=True), server_default=func.now()),
-    PrimaryKeyConstraint("group_id", "user_id")  # composite primary key
+    PrimaryKeyConstraint("group_id", "user_id"),  # composite primary key
+    Index("ix_group_members_user", "user_id", "group_id")
 )
 
+# Money columns hold integer cents (see utils/money.py).
 expenses = Table(
     "expenses",
     metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("description", Text, nullable=False),
-    Column("amount", Numeric(10, 2), nullable=False),
+    Column("amount_cents", Integer, nullable=False),
     Column("currency", String(3), server_default="USD"),
     Column("paid_by", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
     Column("group_id", Integer, ForeignKey("groups.id", ondelete="SET NULL"), nullable=True),
     Column("date", Date, server_default=func.current_date()),
-    Column("created_at", DateTime(timezone=True), server_default=func.now())
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    # Serves group lookups and /history's keyset pages: WHERE group_id = ?
+    # AND id < ? ORDER BY id DESC reads exactly one page of this index.
+    Index("ix_expenses_group_history", "group_id", "id"),
+    Index("ix_expenses_paid_by", "paid_by", "group_id")
 )
 
 expense_participants = Table(
@@ -55,6 +64,73 @@ expense_participants = Table(
     Column("expense_id", Integer, ForeignKey("expenses.id", ondelete="CASCADE"), nullable=False),
     Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
     Column("share_type", String(20), CheckConstraint("share_type IN ('equal', 'custom')"), nullable=False),
-    Column("amount_owed", Numeric(10, 2), nullable=False),
-    Column("share_value", Numeric(10, 2), nullable=True)
+    Column("amount_owed_cents", Integer, nullable=False),
+    Column("share_value_cents", Integer, nullable=True),
+    # Covering indexes: balance and ledger queries read only these columns.
+    Index("ix_expense_participants_user", "user_id", "expense_id", "amount_owed_cents"),
+    Index("ix_expense_participants_expense", "expense_id", "user_id", "amount_owed_cents")
+)
+
+# Running pairwise totals: how much `debtor` owes `creditor` within a group,
+# maintained alongside expense writes so balances never rescan history.
+# group_id 0 holds expenses that are not in any group.
+balances = Table(
+    "balances",
+    metadata,
+    Column("group_id", Integer, nullable=False, server_default="0"),
+    Column("debtor", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("creditor", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("amount_cents", Integer, nullable=False, server_default="0"),
+    PrimaryKeyConstraint("group_id", "debtor", "creditor"),
+    Index("ix_balances_debtor", "debtor", "group_id"),
+    Index("ix_balances_creditor", "creditor", "group_id")
+)
+
+# Bulk imports of past expenses (services/import_service.py), one row per
+# file imported into a group. rows_done advances in the same transaction as
+# the chunk it covers, so an interrupted import resumes after the last
+# committed chunk and a finished one is never applied twice.
+expense_imports = Table(
+    "expense_imports",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("group_id", Integer, ForeignKey("groups.id", ondelete="CASCADE"), nullable=False),
+    # sha256 of the file's bytes
+    Column("fingerprint", String(64), nullable=False),
+    Column("rows_total", Integer, nullable=False),
+    Column("rows_done", Integer, nullable=False, server_default="0"),
+    Column("imported_by", Integer, nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now(), onupdate=func.now()),
+    Index("ux_expense_imports_file", "group_id", "fingerprint", unique=True)
+)
+
+# Conversation state kept by bot/persistence.py across restarts. Values are
+# pickled, like PTB's own PicklePersistence; rows are only ever read back
+# by the bot. No foreign key on user_id: state can exist before /start.
+user_state = Table(
+    "user_state",
+    metadata,
+    Column("user_id", Integer, primary_key=True, autoincrement=False),
+    Column("data", LargeBinary, nullable=False),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+)
+
+# One row per in-flight conversation; ended conversations are deleted.
+# `key` is the JSON list of the ConversationHandler key (chat id, user id).
+conversation_state = Table(
+    "conversation_state",
+    metadata,
+    Column("name", String(64), nullable=False),
+    Column("key", String(255), nullable=False),
+    Column("state", LargeBinary, nullable=False),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now(), onupdate=func.now()),
+    PrimaryKeyConstraint("name", "key")
+)
+
+# Single row holding the number of the last migration in db/migrations.py.
+schema_version = Table(
+    "schema_version",
+    metadata,
+    Column("version", Integer, nullable=False)
 )
@@ -0,0 +1,99 @@
+from sqlalchemy import create_engine, inspect, text
+
+from db.schema import metadata, expense_participants
+from db.migrations import run_migrations, get_schema_version, LATEST_VERSION
+
+
+def make_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+
+def test_fresh_database_is_stamped_and_rerun_is_a_no_op(tmp_path):
+    engine = make_engine(tmp_path)
+    metadata.create_all(engine)
+
+    assert run_migrations(engine) == list(range(1, LATEST_VERSION + 1))
+    assert run_migrations(engine) == []
+
+    with engine.connect() as conn:
+        assert get_schema_version(conn) == LATEST_VERSION
+
+
+def test_legacy_database_gets_column_and_indexes(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.begin() as conn:
+        # The original schema: no custom_id, no secondary indexes.
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(255), "
+                          "first_name VARCHAR(255), created_at DATETIME)"))
+        conn.execute(text("CREATE TABLE expense_participants (id INTEGER PRIMARY KEY, expense_id INTEGER, "
+                          "user_id INTEGER, share_type VARCHAR(20), amount_owed NUMERIC(10, 2), "
+                          "share_value NUMERIC(10, 2))"))
+    metadata.create_all(engine)
+
+    run_migrations(engine)
+
+    inspector = inspect(engine)
+    assert "custom_id" in {c["name"] for c in inspector.get_columns("users")}
+    assert {i["name"] for i in inspector.get_indexes("expense_participants")} >= {
+        "ix_expense_participants_user", "ix_expense_participants_expense"
+    }
+
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT expense_id, amount_owed_cents FROM expense_participants WHERE user_id = 1"
+        ).fetchall()
+    assert "COVERING INDEX ix_expense_participants_user" in plan[0][-1]
+
+
+def test_group_names_are_backfilled_normalized_and_indexed(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE groups (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, "
+                          "created_by INTEGER NOT NULL, created_at DATETIME)"))
+        conn.execute(text("INSERT INTO groups (name, created_by) VALUES ('  Trip  to RÖME ', 1), ('Flat', 1)"))
+    metadata.create_all(engine)
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        names = conn.execute(text("SELECT name_normalized FROM groups ORDER BY id")).scalars().all()
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT id FROM groups WHERE name_normalized = 'flat'"
+        ).fetchall()
+    assert names == ["trip to röme", "flat"]
+    assert "ix_groups_name_normalized" in plan[0][-1]
+
+
+def test_decimal_amounts_become_integer_cents_and_ledger_is_rebuilt(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.begin() as conn:
+        # Money columns as they were before integer cents.
+        conn.execute(text("CREATE TABLE expenses (id INTEGER PRIMARY KEY, description TEXT NOT NULL, "
+                          "amount NUMERIC(10, 2) NOT NULL, currency VARCHAR(3), paid_by INTEGER NOT NULL, "
+                          "group_id INTEGER, date DATE, created_at DATETIME)"))
+        conn.execute(text("CREATE TABLE expense_participants (id INTEGER PRIMARY KEY, expense_id INTEGER NOT NULL, "
+                          "user_id INTEGER NOT NULL, share_type VARCHAR(20) NOT NULL, "
+                          "amount_owed NUMERIC(10, 2) NOT NULL, share_value NUMERIC(10, 2))"))
+        conn.execute(text("CREATE INDEX ix_expense_participants_user "
+                          "ON expense_participants (user_id, expense_id, amount_owed)"))
+        conn.execute(text("CREATE TABLE balances (group_id INTEGER NOT NULL DEFAULT 0, debtor INTEGER NOT NULL, "
+                          "creditor INTEGER NOT NULL, amount NUMERIC(12, 2) NOT NULL DEFAULT 0, "
+                          "PRIMARY KEY (group_id, debtor, creditor))"))
+        conn.execute(text("INSERT INTO expenses (id, description, amount, paid_by, group_id) "
+                          "VALUES (1, 'Cab', 100.0, 1, 7)"))
+        for user_id in (1, 2, 3):
+            conn.execute(text("INSERT INTO expense_participants (expense_id, user_id, share_type, amount_owed) "
+                              f"VALUES (1, {user_id}, 'equal', {100 / 3})"))
+    metadata.create_all(engine)
+
+    run_migrations(engine)
+
+    inspector = inspect(engine)
+    assert "amount" not in {c["name"] for c in inspector.get_columns("expenses")}
+    assert "amount_owed" not in {c["name"] for c in inspector.get_columns("expense_participants")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT amount_cents FROM expenses")).scalar() == 10000
+        assert conn.execute(text("SELECT amount_owed_cents FROM expense_participants")).scalars().all() == [3333] * 3
+        assert conn.execute(text("SELECT debtor, creditor, amount_cents FROM balances ORDER BY debtor")).fetchall() == [
+            (2, 1, 3333), (3, 1, 3333)
+        ]
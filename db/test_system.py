@@ -2,14 +2,55 @@
 """
 Test script to verify the PayLash system works correctly
 """
+import contextlib
+
+import pytest
+
 from db.schema import metadata
 from db.connection import db_get, get_session
-from db.migrations import ensure_users_custom_id_column
+from db.migrations import run_migrations
 from repositories.users import create_user, get_user_by_id
 from repositories.groups import create_group, add_member_to_group, get_groups_for_user, get_members_of_group, get_member_count
 from repositories.expenses import create_expense, add_participant, get_participants_for_expense
 from services.expense_service import create_expense_with_split
 from services.balance_service import get_user_balance, get_balance_with_names
+from services import group_service
+from services.user_service import display_names
+from tests.helpers import temporary_database
+from utils import format_cents
+
+
+@pytest.fixture(autouse=True)
+def isolated_database():
+    """Run every test here on its own temporary SQLite file, never paylash.db."""
+    with temporary_database():
+        yield
+
+
+@contextlib.contextmanager
+def fresh_group(users=2, members=None, name="Group", first_name="User"):
+    """A migrated session holding one group, on the test's temporary database.
+
+    Creates users 1..``users`` (named "<first_name> <id>"), a group
+    created by user 1, and adds the first ``members`` of them (all by
+    default) to it. Yields (session, user_ids, group). Every test's
+    database reuses these IDs, so the in-process caches are cleared first.
+    """
+    run_migrations(db_get())
+    group_service.clear_caches()
+    display_names.clear()
+    session = get_session()
+    try:
+        user_ids = list(range(1, users + 1))
+        for user_id in user_ids:
+            create_user(session, user_id=user_id, first_name=f"{first_name} {user_id}")
+        group = create_group(session, name=name, created_by=user_ids[0])
+        for user_id in user_ids[:members]:
+            add_member_to_group(session, group_id=group.id, user_id=user_id)
+        yield session, user_ids, group
+    finally:
+        session.close()
+
 
 def test_basic_workflow():
     """Test the basic workflow: create users, group, add expense, check balance"""
@@ -20,6 +61,7 @@ def test_basic_workflow():
     print("1️⃣ Creating database...")
     engine = db_get()
     metadata.create_all(engine)
+    run_migrations(engine)
     print("   ✅ Database created\n")
     
     session = get_session()
@@ -52,7 +94,7 @@ def test_basic_workflow():
         expense_id = create_expense_with_split(
             session=session,
             desc="Dominos Pizza",
-            amount=60.00,
+            amount_cents=6000,
             paid_by=111111,  # Alice paid
             group_id=group_id,
             IDs=[111111, 222222, 333333],  # All 3 people
@@ -66,29 +108,29 @@ def test_basic_workflow():
         # Alice's balance (she paid)
         alice_balance = get_balance_with_names(session, 111111)
         print("   Alice's balance:")
-        for name, amount in alice_balance:
-            if amount > 0:
-                print(f"     ✅ {name} owes Alice €{amount:.2f}")
+        for name, cents in alice_balance:
+            if cents > 0:
+                print(f"     ✅ {name} owes Alice €{format_cents(cents)}")
             else:
-                print(f"     ❌ Alice owes {name} €{abs(amount):.2f}")
+                print(f"     ❌ Alice owes {name} €{format_cents(-cents)}")
         
         # Bob's balance (he owes)
         bob_balance = get_balance_with_names(session, 222222)
         print("\n   Bob's balance:")
-        for name, amount in bob_balance:
-            if amount > 0:
-                print(f"     ✅ {name} owes Bob €{amount:.2f}")
+        for name, cents in bob_balance:
+            if cents > 0:
+                print(f"     ✅ {name} owes Bob €{format_cents(cents)}")
             else:
-                print(f"     ❌ Bob owes {name} €{abs(amount):.2f}")
+                print(f"     ❌ Bob owes {name} €{format_cents(-cents)}")
         
         # Charlie's balance (he owes)
         charlie_balance = get_balance_with_names(session, 333333)
         print("\n   Charlie's balance:")
-        for name, amount in charlie_balance:
-            if amount > 0:
-                print(f"     ✅ {name} owes Charlie €{amount:.2f}")
+        for name, cents in charlie_balance:
+            if cents > 0:
+                print(f"     ✅ {name} owes Charlie €{format_cents(cents)}")
             else:
-                print(f"     ❌ Charlie owes {name} €{abs(amount):.2f}")
+                print(f"     ❌ Charlie owes {name} €{format_cents(-cents)}")
         
         print("\n" + "="*50)
         print("🎉 All tests passed! System is working correctly!")
@@ -127,7 +169,7 @@ def test_group_visibility_for_added_member():
     """Added members should see groups in /mygroups source query, while creator remains owner."""
     engine = db_get()
     metadata.create_all(engine)
-    ensure_users_custom_id_column(engine)
+    run_migrations(engine)
     session = get_session()
 
     try:
@@ -155,3 +197,474 @@ def test_group_visibility_for_added_member():
         assert group[2] != member_id
     finally:
         session.close()
+
+
+def test_async_session_path_matches_sync():
+    """Handlers go through the async wrappers; they must see the same rows."""
+    import asyncio
+    import time
+    from db.connection import get_async_session, async_db_disconnect
+    from repositories import aio as repo_aio
+    from services import aio as service_aio
+
+    engine = db_get()
+    metadata.create_all(engine)
+    run_migrations(engine)
+
+    base = int(time.time() * 1000) + 10
+    payer_id = base + 1
+    member_id = base + 2
+
+    async def scenario():
+        session = get_async_session()
+        try:
+            await repo_aio.create_user(session, user_id=payer_id, username="payer", first_name="Payer")
+            await repo_aio.create_user(session, user_id=member_id, username="member", first_name="Member")
+            group = await repo_aio.create_group(session, name="Async Trip", created_by=payer_id)
+            await repo_aio.add_member_to_group(session, group_id=group[0], user_id=payer_id)
+            await repo_aio.add_member_to_group(session, group_id=group[0], user_id=member_id)
+
+            await service_aio.create_expense_with_split(
+                session=session, desc="Taxi", amount_cents=4000, paid_by=payer_id,
+                group_id=group[0], IDs=[payer_id, member_id]
+            )
+            return await service_aio.get_user_balance(session, payer_id, group[0])
+        finally:
+            await session.close()
+            await async_db_disconnect()
+
+    async_balance = asyncio.run(scenario())
+
+    session = get_session()
+    try:
+        assert async_balance == get_user_balance(session, payer_id)
+        assert async_balance == {member_id: 2000}
+    finally:
+        session.close()
+
+
+def test_expense_split_is_atomic():
+    """A failing participant insert must not leave a half-written expense."""
+    from sqlalchemy import select, func
+    from sqlalchemy.exc import IntegrityError
+    from db.schema import expenses
+
+    with fresh_group(users=1, name="Atomic") as (session, (payer_id,), group):
+        count_stmt = select(func.count()).select_from(expenses).where(expenses.c.group_id == group[0])
+
+        try:
+            # None violates expense_participants.user_id NOT NULL.
+            create_expense_with_split(
+                session=session, desc="Broken", amount_cents=1000, paid_by=payer_id,
+                group_id=group[0], IDs=[payer_id, None]
+            )
+        except IntegrityError:
+            pass
+        else:
+            raise AssertionError("expected the participant insert to fail")
+
+        assert session.execute(count_stmt).scalar() == 0
+
+        expense_id = create_expense_with_split(
+            session=session, desc="Fine", amount_cents=1000, paid_by=payer_id,
+            group_id=group[0], IDs=[payer_id]
+        )
+        assert session.execute(count_stmt).scalar() == 1
+        assert len(get_participants_for_expense(session, expense_id)) == 1
+
+
+def test_equal_split_shares_add_up_to_the_total():
+    """Shares are whole cents; the payer takes leftover cents first."""
+    from sqlalchemy import select, func
+    from db.schema import expense_participants
+
+    with fresh_group(users=8, name="Eighths") as (session, ids, first):
+        second = create_group(session, name="Thirds", created_by=ids[0])
+
+        # 1.00 / 8: four shares of 0.13 and four of 0.12.
+        gum = create_expense_with_split(session=session, desc="Gum", amount_cents=100, paid_by=ids[0],
+                                        group_id=first[0], IDs=ids)
+        create_expense_with_split(session=session, desc="Gum", amount_cents=100, paid_by=ids[0],
+                                  group_id=first[0], IDs=ids)
+        cab = create_expense_with_split(session=session, desc="Cab", amount_cents=10000, paid_by=ids[1],
+                                        group_id=second[0], IDs=ids[:3])
+
+        for expense_id, total in ((gum, 100), (cab, 10000)):
+            shares = select(func.sum(expense_participants.c.amount_owed_cents)).where(
+                expense_participants.c.expense_id == expense_id
+            )
+            assert session.execute(shares).scalar() == total
+
+        assert get_user_balance(session, ids[0], first[0]) == {
+            **{user_id: 26 for user_id in ids[1:4]},
+            **{user_id: 24 for user_id in ids[4:]},
+        }
+        assert get_user_balance(session, ids[0])[ids[1]] == 26 - 3333
+        assert get_user_balance(session, ids[2], second[0]) == {ids[1]: -3333}
+
+
+def test_balances_ledger_tracks_writes_and_rebuilds():
+    """The incremental ledger must agree with a rebuild, including deletes."""
+    from repositories.balances import rebuild_balances
+    from services.expense_service import delete_expense_with_split
+
+    with fresh_group(users=3, name="Ledger") as (session, (alice, bob, carol), group):
+        create_expense_with_split(session=session, desc="Hotel", amount_cents=9000, paid_by=alice,
+                                  group_id=group[0], IDs=[alice, bob, carol])
+        taxi = create_expense_with_split(session=session, desc="Taxi", amount_cents=3000, paid_by=bob,
+                                         group_id=group[0], IDs=[alice, bob, carol])
+
+        assert get_user_balance(session, alice) == {bob: 2000, carol: 3000}
+
+        assert delete_expense_with_split(session, taxi)
+        assert not delete_expense_with_split(session, taxi)
+        incremental = {user_id: get_user_balance(session, user_id) for user_id in (alice, bob, carol)}
+        assert incremental[alice] == {bob: 3000, carol: 3000}
+
+        rebuild_balances(session)
+        rebuilt = {user_id: get_user_balance(session, user_id) for user_id in (alice, bob, carol)}
+        assert rebuilt == incremental
+
+
+def test_balance_names_use_constant_queries_and_follow_renames():
+    """Names come from one batched lookup (or the cache) and track renames."""
+    from sqlalchemy import event
+    from services.user_service import ensure_user_exists
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with fresh_group(users=12, name="Names", first_name="Name") as (session, ids, group):
+        engine = session.get_bind()
+        create_expense_with_split(session=session, desc="Party", amount_cents=12000, paid_by=ids[0],
+                                  group_id=group[0], IDs=ids)
+
+        display_names.clear()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            names = dict(get_balance_with_names(session, ids[0]))
+            cold = len(statements)
+            statements.clear()
+            get_balance_with_names(session, ids[0])
+            warm = len(statements)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        assert names[f"Name {ids[1]}"] == 1000
+        assert cold <= 3
+        assert warm <= 2
+
+        ensure_user_exists(session, ids[1], f"u{ids[1]}", "Renamed")
+        assert dict(get_balance_with_names(session, ids[0]))["Renamed"] == 1000
+
+
+def test_group_listing_counts_members_in_one_query():
+    from sqlalchemy import event
+    from repositories.groups import get_groups_with_member_counts
+
+    with fresh_group(users=4, name="Big") as (session, ids, big):
+        engine = session.get_bind()
+        small = create_group(session, name="Small", created_by=ids[0])
+        for user_id in ids[:2]:
+            add_member_to_group(session, group_id=small[0], user_id=user_id)
+        create_expense_with_split(session=session, desc="Rent", amount_cents=4000, paid_by=ids[1],
+                                  group_id=small[0], IDs=ids[:2])
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            rows = get_groups_with_member_counts(session, ids[0], with_balance=True)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert len(statements) == 1
+        assert [(row.name, row.member_count, row.balance_cents) for row in rows] == [
+            ("Big", 4, 0), ("Small", 2, -2000),
+        ]
+
+
+def test_settle_up_plan_clears_the_group_ledger():
+    from services.settlement_service import get_net_positions, get_settle_up_plan, pairwise_transfers
+
+    with fresh_group(users=4, name="Trip") as (session, ids, group):
+        create_expense_with_split(session=session, desc="Hotel", amount_cents=10000, paid_by=ids[0],
+                                  group_id=group[0], IDs=ids)
+        create_expense_with_split(session=session, desc="Fuel", amount_cents=4000, paid_by=ids[1],
+                                  group_id=group[0], IDs=ids)
+        create_expense_with_split(session=session, desc="Food", amount_cents=1000, paid_by=ids[2],
+                                  group_id=group[0], IDs=ids[2:])
+
+        positions = get_net_positions(session, group[0])
+        assert positions == {
+            ids[0]: 6500, ids[1]: 500,
+            ids[2]: -3000, ids[3]: -4000,
+        }
+        assert sum(positions.values()) == 0
+
+        plan = get_settle_up_plan(session, group[0])
+        assert len(plan) < len(pairwise_transfers(session, group[0]))
+        for debtor, creditor, amount in plan:
+            positions[debtor] += amount
+            positions[creditor] -= amount
+        assert not any(positions.values())
+
+
+def test_group_balance_lists_every_member_with_constant_queries():
+    from sqlalchemy import event
+    from services.balance_service import get_group_balance_with_names
+
+    with fresh_group(users=6, name="Flat", first_name="Member") as (session, ids, group):
+        engine = session.get_bind()
+        create_expense_with_split(session=session, desc="Rent", amount_cents=9000, paid_by=ids[0],
+                                  group_id=group[0], IDs=ids[:3])
+
+        display_names.clear()
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            positions, transfers = get_group_balance_with_names(session, group[0])
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert len(statements) <= 3
+        assert positions[0] == (f"Member {ids[0]}", 6000)
+        assert [amount for _, amount in positions[1:4]] == [0, 0, 0]
+        assert positions[4:] == [(f"Member {ids[1]}", -3000), (f"Member {ids[2]}", -3000)]
+        assert sorted(transfers) == [
+            (f"Member {ids[1]}", f"Member {ids[0]}", 3000),
+            (f"Member {ids[2]}", f"Member {ids[0]}", 3000),
+        ]
+
+
+def test_expense_writer_group_commits_and_isolates_failures():
+    import asyncio
+    from db.connection import async_db_disconnect
+    from services.expense_writer import ExpenseWriter
+
+    with fresh_group(name="Burst", first_name="Writer") as (session, ids, group):
+        async def scenario():
+            writer = ExpenseWriter(max_batch=8, max_latency=0.05)
+            writer.start()
+            try:
+                good = [
+                    writer.submit(desc=f"Round {n}", amount_cents=1000, paid_by=ids[0], group_id=group[0], IDs=ids)
+                    for n in range(20)
+                ]
+                bad = writer.submit(desc="Nobody", amount_cents=1000, paid_by=ids[0], group_id=group[0], IDs=[])
+                results = await asyncio.gather(*good, bad, return_exceptions=True)
+            finally:
+                await writer.stop()
+                await async_db_disconnect()
+            return results, writer.stats()
+
+        results, stats = asyncio.run(scenario())
+
+        expense_ids = results[:-1]
+        assert all(isinstance(expense_id, int) for expense_id in expense_ids)
+        assert len(set(expense_ids)) == 20
+        assert isinstance(results[-1], ZeroDivisionError)
+        assert stats["writes"] == 21
+        assert stats["batches"] < stats["writes"]
+        assert get_user_balance(session, ids[0], group[0]) == {ids[1]: 10000}
+
+
+def test_group_cache_serves_repeats_and_drops_changed_entries():
+    from sqlalchemy import event
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+
+    with fresh_group(users=3, members=0, name="Unused", first_name="Cached") as (session, ids, _):
+        engine = session.get_bind()
+        owner, guest, other = ids
+        group = group_service.create_group(session, name="Cached", created_by=owner)
+        group_service.add_member_to_group(session, group_id=group.id, user_id=owner)
+        assert group_service.get_groups_for_user(session, other) == []
+
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            for _ in range(3):
+                assert group_service.is_group_creator(session, group.id, owner)
+                assert group_service.get_member_count(session, group.id) == 1
+                assert [g.id for g in group_service.get_groups_for_user(session, owner)] == [group.id]
+            assert len(statements) == 2  # members and owner's groups, once each
+
+            statements.clear()
+            group_service.add_member_to_group(session, group_id=group.id, user_id=guest)
+            assert group_service.get_member_count(session, group.id) == 2
+            assert [g.id for g in group_service.get_groups_for_user(session, guest)] == [group.id]
+            assert group_service.get_groups_for_user(session, owner)  # untouched entry
+            assert group_service.get_groups_for_user(session, other) == []  # untouched entry
+            assert len(statements) == 3  # insert, members, guest's groups
+
+            group_service.remove_member_from_group(session, group_id=group.id, user_id=guest)
+            assert group_service.get_groups_for_user(session, guest) == []
+            assert group_service.get_member_count(session, group.id) == 1
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        group_service.delete_group(session, group.id)
+        assert group_service.get_group_by_id(session, group.id) is None
+        assert group_service.get_groups_for_user(session, owner) == []
+
+        stats = group_service.cache_stats()
+        assert stats["user_groups"]["hits"] > 0 and stats["user_groups"]["misses"] > 0
+        assert all(entry["size"] <= entry["maxsize"] for entry in stats.values())
+
+
+def test_group_names_resolve_case_insensitively_within_membership():
+    from repositories.groups import find_group_by_name, find_groups_by_names, suggest_groups_by_prefix
+
+    with fresh_group(users=3, members=2, name="Trip to Rome", first_name="Named") as (session, ids, rome):
+        owner, member, outsider = ids
+        oslo = create_group(session, name="Trip to  Oslo", created_by=member)
+        for user_id in (owner, member):
+            add_member_to_group(session, group_id=oslo.id, user_id=user_id)
+
+        assert find_group_by_name(session, member, "  TRIP to rome ").id == rome.id
+        assert find_group_by_name(session, outsider, "Trip to Rome") is None
+        assert find_group_by_name(session, member, "Trip to Rome", owned_only=True) is None
+        assert [g.id for g in find_groups_by_names(session, owner, ["trip", "trip to oslo"])] == [oslo.id]
+
+        assert [g.name for g in suggest_groups_by_prefix(session, owner, "trip")] == ["Trip to  Oslo", "Trip to Rome"]
+        assert [g.name for g in suggest_groups_by_prefix(session, owner, "Trip", owned_only=True)] == ["Trip to Rome"]
+        assert suggest_groups_by_prefix(session, outsider, "trip") == []
+
+
+def test_expense_history_pages_by_keyset():
+    from sqlalchemy import text
+    from repositories.expenses import get_expense_page
+    from services.expense_service import get_history_page
+
+    with fresh_group(name="Ledger", first_name="Historian") as (session, (payer, other), group):
+        expense_ids = [
+            create_expense_with_split(session=session, desc=f"Item {n}", amount_cents=100 + n, paid_by=payer,
+                                      group_id=group.id, IDs=[payer, other])
+            for n in range(25)
+        ]
+        newest_first = expense_ids[::-1]
+
+        rows, has_older, has_newer = get_expense_page(session, group.id, limit=10)
+        assert [row.id for row in rows] == newest_first[:10] and has_older and not has_newer
+
+        rows, has_older, has_newer = get_expense_page(session, group.id, before_id=rows[-1].id, limit=10)
+        assert [row.id for row in rows] == newest_first[10:20] and has_older and has_newer
+
+        last, has_older, has_newer = get_expense_page(session, group.id, before_id=rows[-1].id, limit=10)
+        assert [row.id for row in last] == newest_first[20:] and not has_older and has_newer
+
+        rows, has_older, has_newer = get_expense_page(session, group.id, after_id=last[0].id, limit=10)
+        assert [row.id for row in rows] == newest_first[10:20] and has_older and has_newer
+
+        entries, _, _ = get_history_page(session, group.id, limit=2)
+        assert [(entry[2], entry[3], entry[4]) for entry in entries] == [
+            ("Item 24", 124, f"Historian {payer}"), ("Item 23", 123, f"Historian {payer}"),
+        ]
+
+        plan = session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM expenses WHERE group_id = :g AND id < :c ORDER BY id DESC LIMIT 11"
+        ), {"g": group.id, "c": expense_ids[-1]}).fetchall()
+        details = " ".join(row[-1] for row in plan)
+        assert "ix_expenses_group_history" in details and "TEMP B-TREE" not in details
+
+
+def test_group_ledger_exports_stream_as_csv_and_ndjson():
+    import csv
+    import io
+    import json
+    from repositories.users import update_user_names
+    from services.export_service import export_group_ledger, CSV_COLUMNS
+
+    with fresh_group(name="Export") as (session, (payer, other), group):
+        update_user_names(session, payer, first_name="Exporter")
+        update_user_names(session, other, username="other")
+        expense_ids = [
+            create_expense_with_split(session=session, desc=f"Item, {n}", amount_cents=1001 + n, paid_by=payer,
+                                      group_id=group.id, IDs=[payer, other])
+            for n in range(3)
+        ]
+
+        # Chunks of two rows split expenses across chunk boundaries.
+        out = io.StringIO()
+        assert export_group_ledger(session, group.id, out, "csv", chunk_size=2) == 3
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        assert tuple(rows[0]) == CSV_COLUMNS and len(rows) == 6
+        assert [int(row["expense_id"]) for row in rows] == [eid for eid in expense_ids for _ in range(2)]
+        assert rows[0]["description"] == "Item, 0" and rows[0]["amount"] == "10.01"
+        assert [row["amount_owed"] for row in rows[:2]] == ["5.01", "5.00"]
+        assert [row["participant_name"] for row in rows[:2]] == ["Exporter", "other"]
+
+        out = io.StringIO()
+        assert export_group_ledger(session, group.id, out, "ndjson", chunk_size=2) == 3
+        objects = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [obj["expense_id"] for obj in objects] == expense_ids
+        assert objects[2]["paid_by"] == {"id": payer, "name": "Exporter"}
+        assert [p["amount_owed"] for p in objects[2]["participants"]] == ["5.02", "5.01"]
+
+        out = io.StringIO()
+        assert export_group_ledger(session, -1, out, "ndjson") == 0 and out.getvalue() == ""
+
+
+def test_bulk_import_validates_first_writes_in_chunks_and_resumes():
+    import io
+    from repositories.balances import get_group_ledger, rebuild_balances
+    from repositories.expenses import get_expenses_for_group
+    from repositories.users import set_custom_id
+    from services.import_service import import_expenses, InvalidImport
+    from utils.query_profiler import profile_queries
+
+    with fresh_group(users=3, name="Imported", first_name="Importer") as (session, ids, group):
+        owner, friend, other = ids
+        stranger = other + 1
+        set_custom_id(session, friend, "friend")
+
+        rejected = io.BytesIO(
+            f"description,amount,paid_by\nOk,5,{owner}\nNegative,-1,{owner}\nStranger,5,{stranger}\n"
+            f"Huge,1e30,{owner}\n".encode()
+        )
+        try:
+            import_expenses(session, group.id, rejected)
+            assert False, "an invalid file was imported"
+        except InvalidImport as e:
+            assert [line for line, _ in e.errors] == [3, 4, 5]
+        assert get_expenses_for_group(session, group.id) == []
+
+        lines = ["date,description,amount,paid_by,participants,shares"]
+        lines.append(f"2024-01-01,Dinner,90.00,friend,{owner};friend,60;30")
+        lines += [f"2024-01-02,Item {n},10.01,{ids[n % 3]},," for n in range(249)]
+        document = io.BytesIO("\n".join(lines).encode())
+
+        # Interrupted after the second chunk of 100 rows...
+        def interrupt(job):
+            if job.rows_done == 200:
+                raise KeyboardInterrupt
+        try:
+            import_expenses(session, group.id, document, chunk_size=100, progress=interrupt)
+            assert False, "the import was not interrupted"
+        except KeyboardInterrupt:
+            pass
+        assert len(get_expenses_for_group(session, group.id)) == 200
+
+        # ...the same file picks up after it, in a few statements per chunk.
+        with profile_queries("resume") as profile:
+            job = import_expenses(session, group.id, document, chunk_size=100)
+        assert (job.resumed_from, job.rows_done, job.rows_total) == (200, 250, 250)
+        assert profile.count <= 3 + 4
+        expenses = get_expenses_for_group(session, group.id)
+        assert len(expenses) == 250 and expenses[0].description == "Dinner"
+
+        # Importing it again writes nothing.
+        assert import_expenses(session, group.id, document).rows_done == 250
+        assert len(get_expenses_for_group(session, group.id)) == 250
+
+        dinner = get_participants_for_expense(session, expenses[0].id)
+        assert sorted((p.user_id, p.share_type, p.amount_owed_cents) for p in dinner) == [
+            (owner, "custom", 6000), (friend, "custom", 3000)
+        ]
+        ledger = sorted(get_group_ledger(session, group.id))
+        rebuild_balances(session)
+        assert sorted(get_group_ledger(session, group.id)) == ledger
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Import past expenses into a group from a CSV file
+
+Usage: python import_expenses.py <group id> <file.csv> [--chunk-size N] [--check]
+
+See services/import_service.py for the file format. Running the same
+file into the same group again resumes an interrupted import.
+"""
+import argparse
+import sys
+import time
+
+from db.schema import metadata
+from db.connection import db_get, get_session
+from db.migrations import run_migrations
+from repositories.groups import get_group_by_id
+from services.import_service import import_expenses, check_import, InvalidImport, ImportConflict
+
+def main():
+    parser = argparse.ArgumentParser(description="Import past expenses into a group from a CSV file")
+    parser.add_argument("group_id", type=int)
+    parser.add_argument("path")
+    parser.add_argument("--chunk-size", type=int, default=None, help="rows per transaction")
+    parser.add_argument("--check", action="store_true", help="only check the file, write nothing")
+    args = parser.parse_args()
+
+    engine = db_get()
+    metadata.create_all(engine)
+    run_migrations(engine)
+
+    session = get_session()
+    try:
+        group = get_group_by_id(session, args.group_id)
+        if group is None:
+            sys.exit(f"❌ No group with ID {args.group_id}")
+
+        started = time.perf_counter()
+
+        def progress(job):
+            rate = (job.rows_done - job.resumed_from) / max(time.perf_counter() - started, 1e-9)
+            print(f"   {job.rows_done}/{job.rows_total} expenses ({rate:.0f}/s)")
+
+        with open(args.path, "rb") as document:
+            if args.check:
+                rows = check_import(session, group.id, document)
+                print(f"✅ {rows} expenses ready to import into {group.name}")
+                return
+
+            print(f"📥 Importing {args.path} into {group.name}...")
+            job = import_expenses(session, group.id, document, chunk_size=args.chunk_size, progress=progress)
+    except InvalidImport as e:
+        sys.exit(f"❌ Nothing was imported:\n{e}")
+    except ImportConflict as e:
+        sys.exit(f"❌ {e}")
+    finally:
+        session.close()
+
+    if job.rows_done == job.resumed_from:
+        print(f"ℹ️ Already imported: {job.rows_total} expenses")
+    elif job.resumed_from:
+        print(f"✅ Imported {job.rows_total - job.resumed_from} expenses (resumed after {job.resumed_from})")
+    else:
+        print(f"✅ Imported {job.rows_total} expenses")
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,25 @@
 from db.schema import metadata
 from db.connection import db_get, get_session
-from repositories import (
-    create_user, get_all_users,
-    create_group, get_all_groups,
-    add_member_to_group, get_members_of_group,
-    create_expense, add_participant, get_participants_for_expense
-)
+from db.migrations import run_migrations
+from repositories.users import create_user, get_all_users
+from repositories.groups import create_group, get_all_groups, add_member_to_group, get_members_of_group
+from repositories.expenses import get_expense_by_id, get_participants_for_expense
+from repositories.balances import get_group_ledger
+from services.expense_service import create_expense_with_split
 
 def main():
     # 1. Create engine and tables
     engine = db_get()
     metadata.create_all(engine)
+    run_migrations(engine)
     print("Tables created successfully!")
 
     # 2. Create a session manually
     session = get_session()
     try:
         # ---- Users ----
-        user1 = create_user(session, username="amir", first_name="Amir")
-        user2 = create_user(session, username="ali", first_name="Ali")
+        user1 = create_user(session, user_id=1, username="amir", first_name="Amir")
+        user2 = create_user(session, user_id=2, username="ali", first_name="Ali")
         print("Users created:")
         print(get_all_users(session))
 
@@ -34,20 +35,21 @@ def main():
         print(get_members_of_group(session, group_id=group[0]))
 
         # ---- Expenses ----
-        expense = create_expense(
+        # The expense, its participants and the balances ledger in one transaction.
+        expense_id = create_expense_with_split(
             session,
-            description="Hotel",
-            amount=200.00,
+            desc="Hotel",
+            amount_cents=20000,
             paid_by=user1[0],
-            group_id=group[0]
+            group_id=group[0],
+            IDs=[user1[0], user2[0]],
+            split_type="equal"
         )
-        print(f"Expense created: {expense}")
-
-        # ---- Expense Participants ----
-        add_participant(session, expense_id=expense[0], user_id=user1[0], share_type="equal", amount_owed=100.00)
-        add_participant(session, expense_id=expense[0], user_id=user2[0], share_type="equal", amount_owed=100.00)
+        print(f"Expense created: {get_expense_by_id(session, expense_id)}")
         print("Participants for expense:")
-        print(get_participants_for_expense(session, expense_id=expense[0]))
+        print(get_participants_for_expense(session, expense_id=expense_id))
+        print("Group ledger:")
+        print(get_group_ledger(session, group[0]))
 
     finally:
         # 3. Close session
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Regenerate the balances ledger from the raw expense history
+"""
+from db.schema import metadata
+from db.connection import db_get, get_session
+from db.migrations import run_migrations
+from repositories.balances import rebuild_balances
+
+def main():
+    print("🔧 Rebuilding PayLash balances ledger...")
+
+    engine = db_get()
+    metadata.create_all(engine)
+    run_migrations(engine)
+
+    session = get_session()
+    try:
+        rows = rebuild_balances(session)
+    finally:
+        session.close()
+
+    print(f"✅ Ledger rebuilt: {rows} debtor/creditor pairs")
+
+if __name__ == "__main__":
+    main()
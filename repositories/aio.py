@@ -0,0 +1,88 @@
+"""Async counterparts of the repository functions.
+
+Each wrapper takes an ``AsyncSession`` and runs the sync implementation on
+that session's connection, so handlers await database I/O instead of
+blocking the event loop. Building statements and rows still runs on the
+loop thread; on SQLite this costs throughput (see
+benchmarks/bench_async_handlers.py for the numbers and why it is kept).
+"""
+import functools
+
+from repositories import users, groups, expenses, balances, bot_state
+
+
+def awaitable(fn):
+    """Turn a ``fn(session, ...)`` repository function into an async one."""
+    @functools.wraps(fn)
+    async def wrapper(session, *args, **kwargs):
+        return await session.run_sync(fn, *args, **kwargs)
+
+    return wrapper
+
+
+# -----------------------
+# Users
+# -----------------------
+
+create_user = awaitable(users.create_user)
+get_user_by_id = awaitable(users.get_user_by_id)
+get_users_by_ids = awaitable(users.get_users_by_ids)
+update_user_names = awaitable(users.update_user_names)
+get_user_by_custom_id = awaitable(users.get_user_by_custom_id)
+get_user_by_identifier = awaitable(users.get_user_by_identifier)
+set_custom_id = awaitable(users.set_custom_id)
+get_all_users = awaitable(users.get_all_users)
+delete_user = awaitable(users.delete_user)
+
+# -----------------------
+# Groups
+# -----------------------
+
+create_group = awaitable(groups.create_group)
+get_group_by_id = awaitable(groups.get_group_by_id)
+get_all_groups = awaitable(groups.get_all_groups)
+get_groups_for_user = awaitable(groups.get_groups_for_user)
+get_groups_with_member_counts = awaitable(groups.get_groups_with_member_counts)
+find_groups_by_names = awaitable(groups.find_groups_by_names)
+find_group_by_name = awaitable(groups.find_group_by_name)
+suggest_groups_by_prefix = awaitable(groups.suggest_groups_by_prefix)
+delete_group = awaitable(groups.delete_group)
+add_member_to_group = awaitable(groups.add_member_to_group)
+remove_member_from_group = awaitable(groups.remove_member_from_group)
+get_members_of_group = awaitable(groups.get_members_of_group)
+get_member_count = awaitable(groups.get_member_count)
+
+# -----------------------
+# Expenses
+# -----------------------
+
+insert_expense = awaitable(expenses.insert_expense)
+create_expense = awaitable(expenses.create_expense)
+get_expense_by_id = awaitable(expenses.get_expense_by_id)
+get_expenses_for_group = awaitable(expenses.get_expenses_for_group)
+get_expense_page = awaitable(expenses.get_expense_page)
+delete_expense = awaitable(expenses.delete_expense)
+add_participant = awaitable(expenses.add_participant)
+add_participants = awaitable(expenses.add_participants)
+get_participants_for_expense = awaitable(expenses.get_participants_for_expense)
+delete_participants_for_expense = awaitable(expenses.delete_participants_for_expense)
+delete_participant = awaitable(expenses.delete_participant)
+
+# -----------------------
+# Balances ledger
+# -----------------------
+
+apply_balance_deltas = awaitable(balances.apply_balance_deltas)
+get_debts_of_user = awaitable(balances.get_debts_of_user)
+get_credits_of_user = awaitable(balances.get_credits_of_user)
+rebuild_balances = awaitable(balances.rebuild_balances)
+get_group_net_positions = awaitable(balances.get_group_net_positions)
+get_group_ledger = awaitable(balances.get_group_ledger)
+
+# -----------------------
+# Bot conversation state
+# -----------------------
+
+get_user_state = awaitable(bot_state.get_user_state)
+get_conversation_states = awaitable(bot_state.get_conversation_states)
+save_bot_state = awaitable(bot_state.save_bot_state)
@@ -0,0 +1,177 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, delete, func, and_
+from sqlalchemy.dialects import postgresql, sqlite
+from db.schema import balances, expenses, expense_participants
+
+# balances.group_id for expenses that do not belong to a group.
+NO_GROUP = 0
+
+UPSERT_DIALECTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def ledger_group_id(group_id):
+    return NO_GROUP if group_id is None else group_id
+
+
+def expense_deltas(group_id, paid_by, participants, sign=1):
+    """Ledger changes for one expense: each non-payer participant owes the payer.
+
+    ``participants`` is an iterable of (user_id, amount_owed_cents) pairs.
+    Returns {(group_id, debtor, creditor): cents}.
+    """
+    deltas = {}
+    for user_id, amount_owed_cents in participants:
+        if user_id == paid_by:
+            continue
+        key = (ledger_group_id(group_id), user_id, paid_by)
+        deltas[key] = deltas.get(key, 0) + sign * amount_owed_cents
+    return deltas
+
+
+def apply_balance_deltas(session: Session, deltas, commit: bool = True):
+    """Add amounts to ledger rows, creating them as needed, in one statement.
+
+    ``deltas`` maps (group_id, debtor, creditor) to the cents to add.
+    """
+    rows = [
+        {"group_id": group_id, "debtor": debtor, "creditor": creditor, "amount_cents": cents}
+        for (group_id, debtor, creditor), cents in deltas.items()
+        if cents != 0
+    ]
+    if not rows:
+        return
+
+    dialect_insert = UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(balances)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["group_id", "debtor", "creditor"],
+            set_={"amount_cents": balances.c.amount_cents + stmt.excluded.amount_cents}
+        )
+        session.execute(stmt, rows)
+    else:
+        for row in rows:
+            result = session.execute(
+                update(balances).where(
+                    and_(
+                        balances.c.group_id == row["group_id"],
+                        balances.c.debtor == row["debtor"],
+                        balances.c.creditor == row["creditor"]
+                    )
+                ).values(amount_cents=balances.c.amount_cents + row["amount_cents"])
+            )
+            if result.rowcount == 0:
+                session.execute(insert(balances).values(**row))
+
+    if commit:
+        session.commit()
+
+
+def get_debts_of_user(session: Session, user_id: int, group_id: int = None):
+    """What user_id owes each creditor: [(creditor, cents), ...]"""
+    stmt = select(
+        balances.c.creditor,
+        func.sum(balances.c.amount_cents).label("amount_cents")
+    ).where(
+        balances.c.debtor == user_id
+    ).group_by(
+        balances.c.creditor
+    )
+    if group_id is not None:
+        stmt = stmt.where(balances.c.group_id == group_id)
+    return session.execute(stmt).fetchall()
+
+
+def get_credits_of_user(session: Session, user_id: int, group_id: int = None):
+    """What each debtor owes user_id: [(debtor, cents), ...]"""
+    stmt = select(
+        balances.c.debtor,
+        func.sum(balances.c.amount_cents).label("amount_cents")
+    ).where(
+        balances.c.creditor == user_id
+    ).group_by(
+        balances.c.debtor
+    )
+    if group_id is not None:
+        stmt = stmt.where(balances.c.group_id == group_id)
+    return session.execute(stmt).fetchall()
+
+
+def rebuild_balances(session: Session, commit: bool = True):
+    """Regenerate the whole ledger from expenses and expense_participants.
+
+    Shares are integer cents, so one SUM per (group, debtor, creditor) is
+    exactly what incremental updates would have produced.
+    Returns the number of ledger rows written.
+    """
+    stmt = select(
+        expenses.c.group_id,
+        expense_participants.c.user_id,
+        expenses.c.paid_by,
+        func.sum(expense_participants.c.amount_owed_cents).label("amount_cents")
+    ).select_from(
+        expense_participants
+    ).join(
+        expenses, expense_participants.c.expense_id == expenses.c.id
+    ).where(
+        expense_participants.c.user_id != expenses.c.paid_by
+    ).group_by(
+        expenses.c.group_id,
+        expense_participants.c.user_id,
+        expenses.c.paid_by
+    )
+
+    deltas = {}
+    for row in session.execute(stmt):
+        key = (ledger_group_id(row.group_id), row.user_id, row.paid_by)
+        deltas[key] = deltas.get(key, 0) + row.amount_cents
+
+    session.execute(delete(balances))
+    apply_balance_deltas(session, deltas, commit=False)
+    if commit:
+        session.commit()
+    return len(deltas)
+
+
+def get_group_net_positions(session: Session, group_id: int):
+    """Every member's net ledger position in a group: [(user_id, net_cents), ...]
+
+    Positive net = the group owes them, negative = they owe the group.
+    One aggregation over the group's ledger rows.
+    """
+    legs = select(
+        balances.c.creditor.label("user_id"),
+        balances.c.amount_cents.label("amount_cents")
+    ).where(
+        balances.c.group_id == group_id
+    ).union_all(
+        select(
+            balances.c.debtor.label("user_id"),
+            (-balances.c.amount_cents).label("amount_cents")
+        ).where(
+            balances.c.group_id == group_id
+        )
+    ).subquery()
+
+    stmt = select(
+        legs.c.user_id,
+        func.sum(legs.c.amount_cents).label("net_cents")
+    ).group_by(
+        legs.c.user_id
+    )
+    return session.execute(stmt).fetchall()
+
+
+def get_group_ledger(session: Session, group_id: int):
+    """Raw ledger rows of a group: [(debtor, creditor, cents), ...]"""
+    stmt = select(
+        balances.c.debtor,
+        balances.c.creditor,
+        balances.c.amount_cents
+    ).where(
+        balances.c.group_id == group_id
+    )
+    return session.execute(stmt).fetchall()
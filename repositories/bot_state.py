@@ -0,0 +1,52 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, delete, and_
+from db.schema import user_state, conversation_state
+
+
+def get_user_state(session: Session, user_id: int):
+    """Pickled user_data of one user, or None."""
+    stmt = select(user_state.c.data).where(user_state.c.user_id == user_id)
+    return session.execute(stmt).scalar()
+
+
+def get_conversation_states(session: Session, name: str):
+    """Every stored conversation of one handler: [(key, state), ...]"""
+    stmt = select(conversation_state.c.key, conversation_state.c.state).where(conversation_state.c.name == name)
+    return session.execute(stmt).fetchall()
+
+
+def save_bot_state(session: Session, users=None, dropped_users=(), conversations=None, commit: bool = True):
+    """Write a batch of state changes in one transaction.
+
+    ``users`` maps user_id to pickled user_data; ``dropped_users`` are
+    deleted. ``conversations`` maps (name, key) to a pickled state, or to
+    None for a conversation that ended. Each changed row is deleted and
+    re-inserted, so the batch costs a few statements whatever its size.
+    """
+    users = users or {}
+    conversations = conversations or {}
+
+    stale_users = set(users) | set(dropped_users)
+    if stale_users:
+        session.execute(delete(user_state).where(user_state.c.user_id.in_(stale_users)))
+    if users:
+        session.execute(insert(user_state), [{"user_id": user_id, "data": data} for user_id, data in users.items()])
+
+    keys_by_name = {}
+    for name, key in conversations:
+        keys_by_name.setdefault(name, []).append(key)
+    for name, keys in keys_by_name.items():
+        session.execute(delete(conversation_state).where(
+            and_(conversation_state.c.name == name, conversation_state.c.key.in_(keys))
+        ))
+
+    rows = [
+        {"name": name, "key": key, "state": state}
+        for (name, key), state in conversations.items()
+        if state is not None
+    ]
+    if rows:
+        session.execute(insert(conversation_state), rows)
+
+    if commit:
+        session.commit()
@@ -1,19 +1,43 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import select, insert, update, delete
+from sqlalchemy.sql import alias
 from db.schema import users, groups, group_members, expenses, expense_participants
 
-def create_expense(session: Session, description: str, amount: float, paid_by: int,
+def insert_expense(session: Session, description: str, amount_cents: int, paid_by: int,
                    group_id: int = None, currency: str = "USD"):
+    """Insert an expense in the caller's transaction and return its id."""
     stmt = insert(expenses).values(
         description=description,
-        amount=amount,
+        amount_cents=amount_cents,
         paid_by=paid_by,
         group_id=group_id,
         currency=currency
     )
     result = session.execute(stmt)
-    session.commit()
-    expense_id = result.inserted_primary_key[0]
+    return result.inserted_primary_key[0]
+
+
+def insert_expenses(session: Session, rows):
+    """Insert many expenses in the caller's transaction; return their ids in row order.
+
+    ``rows`` are dicts with description, amount_cents, paid_by, group_id,
+    currency and date. They go in as multi-row INSERT ... RETURNING
+    statements, one per thousand rows or so. RETURNING gives no order,
+    but ids are allocated in row order, so sorted they line up with
+    ``rows``. (sort_by_parameter_order would make SQLite run one INSERT
+    per row instead.)
+    """
+    if not rows:
+        return []
+
+    return sorted(session.execute(insert(expenses).returning(expenses.c.id), rows).scalars())
+
+
+def create_expense(session: Session, description: str, amount_cents: int, paid_by: int,
+                   group_id: int = None, currency: str = "USD", commit: bool = True):
+    expense_id = insert_expense(session, description, amount_cents, paid_by, group_id, currency)
+    if commit:
+        session.commit()
     return get_expense_by_id(session, expense_id)
 
 
@@ -27,10 +51,79 @@ def get_expenses_for_group(session: Session, group_id: int):
     return session.execute(stmt).fetchall()
 
 
-def delete_expense(session: Session, expense_id: int):
+def get_expense_page(session: Session, group_id: int, before_id: int = None, after_id: int = None,
+                     limit: int = 10):
+    """One page of a group's expenses, newest first, by keyset on (group_id, id).
+
+    With ``before_id`` the page holds the expenses just older than it, with
+    ``after_id`` the ones just newer; with neither, the newest. Each page
+    is a range read of ix_expenses_group_history, so its cost does not
+    depend on how much history the group has.
+
+    Returns (rows, has_older, has_newer).
+    """
+    stmt = select(
+        expenses.c.id, expenses.c.description, expenses.c.amount_cents,
+        expenses.c.paid_by, expenses.c.date
+    ).where(expenses.c.group_id == group_id)
+
+    if after_id is not None:
+        stmt = stmt.where(expenses.c.id > after_id).order_by(expenses.c.id.asc())
+    else:
+        if before_id is not None:
+            stmt = stmt.where(expenses.c.id < before_id)
+        stmt = stmt.order_by(expenses.c.id.desc())
+
+    # One extra row tells whether there is a page beyond this one.
+    rows = session.execute(stmt.limit(limit + 1)).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    if after_id is not None:
+        return list(reversed(rows)), True, more
+    return rows, more, before_id is not None
+
+
+def iter_group_ledger(session: Session, group_id: int, chunk_size: int = 1000):
+    """Yield a group's ledger in chunks of at most ``chunk_size`` rows.
+
+    One row per participant of each expense, ordered by expense, with the
+    payer's and participant's names joined in, so the export needs no
+    further lookups. Rows are fetched a chunk at a time (``yield_per``)
+    rather than all at once, so memory stays flat however long the
+    history is.
+    """
+    payer = alias(users, "payer")
+    participant = alias(users, "participant")
+    stmt = select(
+        expenses.c.id.label("expense_id"), expenses.c.date, expenses.c.description,
+        expenses.c.amount_cents, expenses.c.currency, expenses.c.paid_by,
+        payer.c.username.label("payer_username"), payer.c.first_name.label("payer_first_name"),
+        expense_participants.c.user_id, participant.c.username, participant.c.first_name,
+        expense_participants.c.share_type, expense_participants.c.amount_owed_cents,
+    ).select_from(
+        expenses
+        .join(expense_participants, expense_participants.c.expense_id == expenses.c.id)
+        .outerjoin(payer, payer.c.id == expenses.c.paid_by)
+        .outerjoin(participant, participant.c.id == expense_participants.c.user_id)
+    ).where(
+        expenses.c.group_id == group_id
+    ).order_by(
+        expenses.c.id, expense_participants.c.user_id
+    ).execution_options(yield_per=chunk_size)
+
+    result = session.execute(stmt)
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def delete_expense(session: Session, expense_id: int, commit: bool = True):
     stmt = delete(expenses).where(expenses.c.id == expense_id)
     session.execute(stmt)
-    session.commit()
+    if commit:
+        session.commit()
 
 
 # -----------------------
@@ -38,16 +131,49 @@ def delete_expense(session: Session, expense_id: int):
 # -----------------------
 
 def add_participant(session: Session, expense_id: int, user_id: int, share_type: str,
-                    amount_owed: float, share_value: float = None):
+                    amount_owed_cents: int, share_value_cents: int = None, commit: bool = True):
     stmt = insert(expense_participants).values(
         expense_id=expense_id,
         user_id=user_id,
         share_type=share_type,
-        amount_owed=amount_owed,
-        share_value=share_value
+        amount_owed_cents=amount_owed_cents,
+        share_value_cents=share_value_cents
     )
     session.execute(stmt)
-    session.commit()
+    if commit:
+        session.commit()
+
+
+def add_participants(session: Session, expense_id: int, participants, commit: bool = True):
+    """Insert many participant rows with a single executemany.
+
+    ``participants`` is a list of dicts with user_id, share_type,
+    amount_owed_cents and optionally share_value_cents.
+    """
+    insert_participants(session, [{"expense_id": expense_id, **participant} for participant in participants])
+    if commit:
+        session.commit()
+
+
+def insert_participants(session: Session, participants):
+    """Insert participant rows of any number of expenses with a single executemany.
+
+    Like add_participants, but each dict also carries its expense_id.
+    """
+    if not participants:
+        return
+
+    rows = [
+        {
+            "expense_id": participant["expense_id"],
+            "user_id": participant["user_id"],
+            "share_type": participant["share_type"],
+            "amount_owed_cents": participant["amount_owed_cents"],
+            "share_value_cents": participant.get("share_value_cents"),
+        }
+        for participant in participants
+    ]
+    session.execute(insert(expense_participants), rows)
 
 
 def get_participants_for_expense(session: Session, expense_id: int):
@@ -55,52 +181,15 @@ def get_participants_for_expense(session: Session, expense_id: int):
     return session.execute(stmt).fetchall()
 
 
-def delete_participant(session: Session, participant_id: int):
-    stmt = delete(expense_participants).where(expense_participants.c.id == participant_id)
+def delete_participants_for_expense(session: Session, expense_id: int, commit: bool = True):
+    stmt = delete(expense_participants).where(expense_participants.c.expense_id == expense_id)
     session.execute(stmt)
-    session.commit()
+    if commit:
+        session.commit()
 
-# ================================================ #
-    
-def calculate_equal_split(amount, num):
-    return amount / num
 
-def validate_expense_data(amount, IDs, split_type, custom_amounts):
-    pass
-
-def create_expense_with_split(session, desc, amount, paid_by, group_id, IDs, split_type="equal", custom_amounts=None):
-    expense = create_expense(
-        session=session,
-        description=desc,
-        amount=float(amount),
-        paid_by=paid_by,
-        group_id=group_id
-    )
-
-    expense_id = expense[0]
-
-    if split_type == "equal":
-        split_amount = calculate_equal_split(amount, len(IDs))
-
-        for ID in IDs:
-            add_participant(
-                session,
-                expense_id=expense_id,
-                user_id=ID,
-                share_type="equal",
-                amount_owed=float(split_amount)
-            )
-
-    elif split_type == "custom":
-        for ID in IDs:
-            custom_amount = custom_amounts[ID]
-            add_participant(
-               session,
-               expense_id=expense_id,
-               user_id=ID,
-               share_type="custom",
-               amount_owed=float(custom_amount),
-               share_value=float(custom_amount)
-            )
-
-    return expense_id
+def delete_participant(session: Session, participant_id: int, commit: bool = True):
+    stmt = delete(expense_participants).where(expense_participants.c.id == participant_id)
+    session.execute(stmt)
+    if commit:
+        session.commit()
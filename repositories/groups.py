@@ -1,9 +1,16 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import select, insert, update, delete
-from db.schema import users, groups, group_members, expenses, expense_participants
+from sqlalchemy import select, insert, update, delete, func
+from db.schema import users, groups, group_members, expenses, expense_participants, balances
+
+# Upper bound for prefix range scans; sorts after any character in a name.
+PREFIX_END = "\U0010ffff"
+
+def normalize_group_name(name: str) -> str:
+    """Normalize group names so lookups ignore case and extra whitespace."""
+    return " ".join(name.split()).casefold()
 
 def create_group(session: Session, name: str, created_by: int):
-    stmt = insert(groups).values(name=name, created_by=created_by)
+    stmt = insert(groups).values(name=name, created_by=created_by, name_normalized=normalize_group_name(name))
     result = session.execute(stmt)
     session.commit()
     group_id = result.inserted_primary_key[0]
@@ -17,8 +24,7 @@ def get_all_groups(session: Session):
     stmt = select(groups)
     return session.execute(stmt).fetchall()
 
-def get_groups_for_user(session: Session, user_id: int):
-    """Get all groups that a user is a member of"""
+def _groups_of_member(user_id: int, owned_only: bool):
     stmt = select(
         groups
     ).select_from(
@@ -28,6 +34,93 @@ def get_groups_for_user(session: Session, user_id: int):
     ).where(
         group_members.c.user_id == user_id
     )
+    if owned_only:
+        stmt = stmt.where(groups.c.created_by == user_id)
+    return stmt
+
+def get_groups_for_user(session: Session, user_id: int):
+    """Get all groups that a user is a member of"""
+    return session.execute(_groups_of_member(user_id, owned_only=False)).fetchall()
+
+def find_groups_by_names(session: Session, user_id: int, names, owned_only: bool = False):
+    """Get the user's groups whose name matches any of ``names``, ignoring case.
+
+    One indexed query on groups.name_normalized, scoped to the groups the
+    user is a member of (and created, with ``owned_only``). Rows are ordered
+    by id, so the oldest group wins when names collide.
+    """
+    normalized = {normalize_group_name(name) for name in names}
+    if not normalized:
+        return []
+    stmt = _groups_of_member(user_id, owned_only).where(
+        groups.c.name_normalized.in_(normalized)
+    ).order_by(
+        groups.c.id
+    )
+    return session.execute(stmt).fetchall()
+
+def find_group_by_name(session: Session, user_id: int, name: str, owned_only: bool = False):
+    """Get the user's group called ``name`` (case-insensitive), or None."""
+    matches = find_groups_by_names(session, user_id, [name], owned_only)
+    return matches[0] if matches else None
+
+def suggest_groups_by_prefix(session: Session, user_id: int, prefix: str, limit: int = 5, owned_only: bool = False):
+    """Get up to ``limit`` of the user's groups whose name starts with ``prefix``.
+
+    The prefix is matched as a range on the normalized name, so the lookup
+    is an index range scan rather than a LIKE over every group.
+    """
+    prefix = normalize_group_name(prefix)
+    if not prefix:
+        return []
+    stmt = _groups_of_member(user_id, owned_only).where(
+        groups.c.name_normalized >= prefix,
+        groups.c.name_normalized < prefix + PREFIX_END
+    ).order_by(
+        groups.c.name_normalized
+    ).limit(limit)
+    return session.execute(stmt).fetchall()
+
+def get_groups_with_member_counts(session: Session, user_id: int, with_balance: bool = False):
+    """Get the user's groups with their member counts in one grouped query.
+
+    Rows are the groups columns plus ``member_count`` and, with
+    ``with_balance``, a trailing ``balance_cents``: the user's net position
+    in the group from the balances ledger (positive = others owe them).
+    """
+    mine = group_members.alias("mine")
+    everyone = group_members.alias("everyone")
+
+    columns = [groups, func.count(everyone.c.user_id).label("member_count")]
+
+    if with_balance:
+        owed_to_user = select(
+            func.coalesce(func.sum(balances.c.amount_cents), 0)
+        ).where(
+            (balances.c.group_id == groups.c.id) & (balances.c.creditor == user_id)
+        ).scalar_subquery()
+        owed_by_user = select(
+            func.coalesce(func.sum(balances.c.amount_cents), 0)
+        ).where(
+            (balances.c.group_id == groups.c.id) & (balances.c.debtor == user_id)
+        ).scalar_subquery()
+        columns.append((owed_to_user - owed_by_user).label("balance_cents"))
+
+    stmt = select(
+        *columns
+    ).select_from(
+        mine
+    ).join(
+        groups, mine.c.group_id == groups.c.id
+    ).join(
+        everyone, everyone.c.group_id == groups.c.id
+    ).where(
+        mine.c.user_id == user_id
+    ).group_by(
+        groups.c.id
+    ).order_by(
+        groups.c.id
+    )
     return session.execute(stmt).fetchall()
 
 def delete_group(session: Session, group_id: int):
@@ -54,5 +147,12 @@ def get_members_of_group(session: Session, group_id: int):
 
 def get_member_count(session: Session, group_id: int):
     """Get the number of members in a group"""
-    members = get_members_of_group(session, group_id)
-    return len(members)
+    stmt = select(func.count()).select_from(group_members).where(group_members.c.group_id == group_id)
+    return session.execute(stmt).scalar()
+
+def get_member_identifiers(session: Session, group_id: int):
+    """Every member of a group with their custom ID: [(user_id, custom_id), ...]"""
+    stmt = select(users.c.id, users.c.custom_id).select_from(
+        group_members.join(users, users.c.id == group_members.c.user_id)
+    ).where(group_members.c.group_id == group_id)
+    return session.execute(stmt).fetchall()
@@ -0,0 +1,36 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, and_
+from db.schema import expense_imports
+
+
+def get_import(session: Session, group_id: int, fingerprint: str):
+    stmt = select(expense_imports).where(
+        and_(expense_imports.c.group_id == group_id, expense_imports.c.fingerprint == fingerprint)
+    )
+    return session.execute(stmt).first()
+
+
+def create_import(session: Session, group_id: int, fingerprint: str, rows_total: int,
+                  imported_by: int = None, commit: bool = True):
+    stmt = insert(expense_imports).values(
+        group_id=group_id,
+        fingerprint=fingerprint,
+        rows_total=rows_total,
+        imported_by=imported_by
+    )
+    import_id = session.execute(stmt).inserted_primary_key[0]
+    if commit:
+        session.commit()
+    return import_id
+
+
+def advance_import(session: Session, import_id: int, rows_done: int, new_rows_done: int):
+    """Move an import from ``rows_done`` to ``new_rows_done`` in the caller's transaction.
+
+    Returns False if the import is no longer at ``rows_done``, i.e. another
+    run has committed chunks of it since: the caller must roll back.
+    """
+    stmt = update(expense_imports).where(
+        and_(expense_imports.c.id == import_id, expense_imports.c.rows_done == rows_done)
+    ).values(rows_done=new_rows_done)
+    return session.execute(stmt).rowcount == 1
@@ -20,6 +20,23 @@ def get_user_by_id(session: Session, user_id: int):
     return result
 
 
+def get_users_by_ids(session: Session, user_ids):
+    """Fetch many users with one IN (...) query."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+    stmt = select(users).where(users.c.id.in_(user_ids))
+    return session.execute(stmt).fetchall()
+
+
+def update_user_names(session: Session, user_id: int, username: str = None, first_name: str = None,
+                      commit: bool = True):
+    stmt = update(users).where(users.c.id == user_id).values(username=username, first_name=first_name)
+    session.execute(stmt)
+    if commit:
+        session.commit()
+
+
 def get_user_by_custom_id(session: Session, custom_id: str):
     normalized_custom_id = normalize_custom_id(custom_id)
     stmt = select(users).where(users.c.custom_id == normalized_custom_id)
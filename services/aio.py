@@ -0,0 +1,36 @@
+"""Async counterparts of the service functions, for use from bot handlers."""
+from repositories.aio import awaitable
+from services import (
+    balance_service, expense_service, export_service, group_service, import_service, settlement_service, user_service
+)
+
+create_expense_with_split = awaitable(expense_service.create_expense_with_split)
+delete_expense_with_split = awaitable(expense_service.delete_expense_with_split)
+get_history_page = awaitable(expense_service.get_history_page)
+
+export_group_ledger = awaitable(export_service.export_group_ledger)
+
+get_import_members = awaitable(import_service.get_import_members)
+find_import = awaitable(import_service.find_import)
+start_import = awaitable(import_service.start_import)
+import_chunk = awaitable(import_service.import_chunk)
+
+get_user_balance = awaitable(balance_service.get_user_balance)
+get_balance_with_names = awaitable(balance_service.get_balance_with_names)
+get_group_balance_with_names = awaitable(balance_service.get_group_balance_with_names)
+
+get_net_positions = awaitable(settlement_service.get_net_positions)
+get_settle_up_plan = awaitable(settlement_service.get_settle_up_plan)
+
+ensure_user_exists = awaitable(user_service.ensure_user_exists)
+get_display_names = awaitable(user_service.get_display_names)
+
+get_group_by_id = awaitable(group_service.get_group_by_id)
+get_groups_for_user = awaitable(group_service.get_groups_for_user)
+get_members_of_group = awaitable(group_service.get_members_of_group)
+get_member_count = awaitable(group_service.get_member_count)
+is_group_creator = awaitable(group_service.is_group_creator)
+create_group = awaitable(group_service.create_group)
+add_member_to_group = awaitable(group_service.add_member_to_group)
+remove_member_from_group = awaitable(group_service.remove_member_from_group)
+delete_group = awaitable(group_service.delete_group)
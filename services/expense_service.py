@@ -1,44 +1,155 @@
-from repositories.expenses import create_expense, add_participant
+import os
 
-def calculate_equal_split(amount, num):
-    return amount / num
+from repositories.expenses import (
+    insert_expense, add_participants, get_expense_by_id, get_participants_for_expense,
+    delete_expense, delete_participants_for_expense, get_expense_page
+)
+from repositories.balances import expense_deltas, apply_balance_deltas
+from services.user_service import get_display_names
+from utils import split_cents
 
-def validate_expense_data(amount, IDs, split_type, custom_amounts):
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10"))
+
+def calculate_equal_split(amount_cents, num):
+    return split_cents(amount_cents, num)
+
+def validate_expense_data(amount_cents, IDs, split_type, custom_amounts):
     pass
 
-def create_expense_with_split(session, desc, amount, paid_by, group_id, IDs, split_type="equal", custom_amounts=None):
-    expense = create_expense(
-        session=session,
+def build_participants(amount_cents, IDs, split_type="equal", custom_amounts=None, paid_by=None):
+    """Return the participant rows for a split, without touching the database.
+
+    Amounts are integer cents; equal shares always add up to amount_cents.
+    Leftover cents are taken by the payer first, so nobody else is charged
+    more than the even share.
+    """
+    if split_type == "equal":
+        shares = calculate_equal_split(amount_cents, len(IDs))
+        ordered = sorted(IDs, key=lambda ID: ID != paid_by)
+        return [
+            {"user_id": ID, "share_type": "equal", "amount_owed_cents": share}
+            for ID, share in zip(ordered, shares)
+        ]
+
+    if split_type == "custom":
+        return [
+            {
+                "user_id": ID,
+                "share_type": "custom",
+                "amount_owed_cents": custom_amounts[ID],
+                "share_value_cents": custom_amounts[ID],
+            }
+            for ID in IDs
+        ]
+
+    return []
+
+def write_expense(session, desc, amount_cents, paid_by, group_id, IDs, split_type="equal", custom_amounts=None):
+    """Insert an expense, its participants and its ledger changes without committing."""
+    participants = build_participants(amount_cents, IDs, split_type, custom_amounts, paid_by)
+
+    expense_id = insert_expense(
+        session,
         description=desc,
-        amount=float(amount),
+        amount_cents=amount_cents,
         paid_by=paid_by,
         group_id=group_id
     )
+    add_participants(session, expense_id, participants, commit=False)
+    apply_balance_deltas(
+        session,
+        expense_deltas(group_id, paid_by, [(p["user_id"], p["amount_owed_cents"]) for p in participants]),
+        commit=False
+    )
+    return expense_id
 
-    expense_id = expense[0]
+def create_expense_with_split(session, desc, amount_cents, paid_by, group_id, IDs, split_type="equal", custom_amounts=None):
+    """Insert an expense and all its participants as one unit of work.
 
-    if split_type == "equal":
-        split_amount = calculate_equal_split(amount, len(IDs))
-
-        for ID in IDs:
-            add_participant(
-                session,
-                expense_id=expense_id,
-                user_id=ID,
-                share_type="equal",
-                amount_owed=float(split_amount)
-            )
-
-    elif split_type == "custom":
-        for ID in IDs:
-            custom_amount = custom_amounts[ID]
-            add_participant(
-               session,
-               expense_id=expense_id,
-               user_id=ID,
-               share_type="custom",
-               amount_owed=float(custom_amount),
-               share_value=float(custom_amount)
-            )
+    ``amount_cents`` (and ``custom_amounts`` values) are integer cents.
+    Everything is written in a single transaction (one executemany for the
+    participants, one for the balances ledger); on failure nothing is left
+    behind.
+    """
+    try:
+        expense_id = write_expense(session, desc, amount_cents, paid_by, group_id, IDs, split_type, custom_amounts)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
 
     return expense_id
+
+def create_expenses_with_split(session, requests):
+    """Write several expenses with a single commit (group commit).
+
+    ``requests`` is a list of create_expense_with_split keyword dicts.
+    Returns one result per request: the new expense id, or the exception
+    that request raised. If the batch fails as a whole it is rolled back
+    and every request is retried in its own transaction, so one bad
+    request never takes the others down with it.
+    """
+    try:
+        results = [write_expense(session, **request) for request in requests]
+        session.commit()
+        return results
+    except Exception:
+        session.rollback()
+        if len(requests) == 1:
+            raise
+
+    results = []
+    for request in requests:
+        try:
+            results.append(create_expense_with_split(session, **request))
+        except Exception as e:
+            results.append(e)
+    return results
+
+def delete_expense_with_split(session, expense_id):
+    """Delete an expense and its participants and take it out of the ledger.
+
+    Returns False if the expense does not exist.
+    """
+    expense = get_expense_by_id(session, expense_id)
+    if expense is None:
+        return False
+
+    participants = get_participants_for_expense(session, expense_id)
+
+    try:
+        apply_balance_deltas(
+            session,
+            expense_deltas(
+                expense.group_id, expense.paid_by,
+                [(p.user_id, p.amount_owed_cents) for p in participants],
+                sign=-1
+            ),
+            commit=False
+        )
+        delete_participants_for_expense(session, expense_id, commit=False)
+        delete_expense(session, expense_id, commit=False)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return True
+
+
+def get_history_page(session, group_id, before_id=None, after_id=None, limit=None):
+    """
+    One page of a group's expense history, newest first.
+    Returns: ([(expense_id, date, description, amount_cents, payer_name), ...], has_older, has_newer)
+
+    One keyset read of the page plus one batched name lookup for its payers.
+    """
+    rows, has_older, has_newer = get_expense_page(
+        session, group_id, before_id=before_id, after_id=after_id, limit=limit or HISTORY_PAGE_SIZE
+    )
+    names = get_display_names(session, list({row.paid_by for row in rows}))
+    entries = [
+        (row.id, row.date, row.description, row.amount_cents, names[row.paid_by])
+        for row in rows
+    ]
+    return entries, has_older, has_newer
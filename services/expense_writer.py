@@ -0,0 +1,154 @@
+"""
+Write-behind queue that group-commits expense writes.
+
+Handlers submit expense requests and await a future; one background task
+takes them off the queue, writes up to ``max_batch`` of them in a single
+transaction and resolves each future with the new expense id once the
+commit has succeeded. A batch is flushed as soon as it is full or
+``max_latency`` seconds after its first request arrived, whichever comes
+first, so a lone write is delayed by at most that bound. Once stop() is
+called no new request is accepted; if the task dies or is cancelled,
+every request it had not written fails instead of waiting forever.
+
+On SQLite every commit takes the database write lock and syncs the file;
+under bursts this turns N commits into N / max_batch.
+"""
+import asyncio
+import os
+
+from db.connection import get_async_session
+from services import aio
+from services.expense_service import create_expenses_with_split
+from utils import get_logger
+
+logger = get_logger("services.expense_writer")
+
+
+class ExpenseWriter:
+    def __init__(self, max_batch=None, max_latency=None):
+        self.max_batch = max_batch or int(os.getenv("EXPENSE_WRITE_BATCH", "32"))
+        if max_latency is None:
+            max_latency = float(os.getenv("EXPENSE_WRITE_LATENCY_MS", "5")) / 1000
+        self.max_latency = max_latency
+
+        self._queue = None
+        self._task = None
+        # Set by stop(): requests are no longer accepted, the queue drains.
+        self._stopping = False
+        self.batches = 0
+        self.writes = 0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done() and not self._stopping
+
+    def start(self):
+        """Start the writer task on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Flush everything already submitted, then stop the writer task."""
+        if not self.running:
+            return
+        self._stopping = True
+        self._queue.put_nowait(None)
+        try:
+            await self._task
+        finally:
+            self._task = None
+            self._queue = None
+
+    async def submit(self, **request):
+        """Queue one create_expense_with_split request; return its expense id.
+
+        Raises whatever the write raised for this request.
+        """
+        if not self.running:
+            raise RuntimeError("expense writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((request, future))
+        return await future
+
+    def stats(self):
+        return {"batches": self.batches, "writes": self.writes}
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        batch = []
+
+        try:
+            while not stopping:
+                item = await self._queue.get()
+                if item is None:
+                    break
+
+                batch = [item]
+                deadline = loop.time() + self.max_latency
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    try:
+                        if timeout <= 0:
+                            item = self._queue.get_nowait()
+                        else:
+                            item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                await self._write(batch)
+                batch = []
+        finally:
+            # Cancelled or crashed: no request may be left awaiting forever.
+            self._fail_pending(batch)
+
+    def _fail_pending(self, batch):
+        pending = list(batch)
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                pending.append(item)
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("expense writer stopped before writing this expense"))
+
+    async def _write(self, batch):
+        session = None
+        try:
+            session = get_async_session()
+            results = await session.run_sync(create_expenses_with_split, [request for request, _ in batch])
+        except Exception as e:
+            logger.exception("expense batch of %s failed", len(batch))
+            results = [e] * len(batch)
+        finally:
+            if session is not None:
+                await session.close()
+
+        self.batches += 1
+        self.writes += len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+# Shared by the bot's handlers; started and stopped by bot.main.
+expense_writer = ExpenseWriter()
+
+
+async def create_expense_with_split(session, **request):
+    """Queue the expense on the running writer, or write it on ``session``."""
+    if expense_writer.running:
+        return await expense_writer.submit(**request)
+    return await aio.create_expense_with_split(session, **request)
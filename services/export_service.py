@@ -0,0 +1,101 @@
+"""
+Streaming export of a group's ledger as CSV or NDJSON.
+
+Rows come from repositories.expenses.iter_group_ledger a chunk at a time
+and are written to the output file as they arrive, so neither the query
+result nor the rendered file is ever held in memory.
+"""
+import csv
+import json
+import os
+
+from repositories.expenses import iter_group_ledger
+from services.user_service import display_name
+from utils import format_cents
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+EXPORT_FORMATS = ("csv", "ndjson")
+
+CSV_COLUMNS = (
+    "expense_id", "date", "description", "amount", "currency", "paid_by", "paid_by_name",
+    "participant_id", "participant_name", "share_type", "amount_owed",
+)
+
+
+# Rows are unpacked by position (in iter_group_ledger's column order):
+# named access on a Row costs more than formatting the whole line.
+
+def csv_line(row):
+    (expense_id, date, description, amount_cents, currency, paid_by, payer_username, payer_first_name,
+     user_id, username, first_name, share_type, amount_owed_cents) = row
+    return (
+        expense_id, date, description, format_cents(amount_cents), currency,
+        paid_by, display_name(paid_by, payer_username, payer_first_name),
+        user_id, display_name(user_id, username, first_name),
+        share_type, format_cents(amount_owed_cents),
+    )
+
+
+def expense_object(row):
+    expense_id, date, description, amount_cents, currency, paid_by, payer_username, payer_first_name = row[:8]
+    return {
+        "expense_id": expense_id,
+        "date": date.isoformat() if date else None,
+        "description": description,
+        "amount": format_cents(amount_cents),
+        "currency": currency,
+        "paid_by": {"id": paid_by, "name": display_name(paid_by, payer_username, payer_first_name)},
+        "participants": [],
+    }
+
+
+def participant_object(row):
+    user_id, username, first_name, share_type, amount_owed_cents = row[8:]
+    return {
+        "id": user_id,
+        "name": display_name(user_id, username, first_name),
+        "share_type": share_type,
+        "amount_owed": format_cents(amount_owed_cents),
+    }
+
+
+def export_group_ledger(session, group_id, out, fmt="csv", chunk_size=None):
+    """Write a group's ledger to the text file ``out``; return the number of expenses.
+
+    csv has one line per participant of each expense; ndjson has one
+    object per expense with its participants nested. Both are written
+    as the rows stream in.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {list(EXPORT_FORMATS)}")
+
+    chunks = iter_group_ledger(session, group_id, chunk_size=chunk_size or EXPORT_CHUNK_SIZE)
+    expenses = 0
+
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(CSV_COLUMNS)
+        last_id = None
+        for chunk in chunks:
+            writer.writerows(csv_line(row) for row in chunk)
+            for row in chunk:
+                if row[0] != last_id:
+                    expenses += 1
+                    last_id = row[0]
+        return expenses
+
+    # ndjson: rows arrive ordered by expense, so an expense is complete
+    # as soon as the next one starts.
+    current = None
+    for chunk in chunks:
+        for row in chunk:
+            if current is None or current["expense_id"] != row[0]:
+                if current is not None:
+                    out.write(json.dumps(current) + "\n")
+                current = expense_object(row)
+                expenses += 1
+            current["participants"].append(participant_object(row))
+    if current is not None:
+        out.write(json.dumps(current) + "\n")
+    return expenses
@@ -0,0 +1,112 @@
+import os
+
+from repositories import groups as repo
+from utils import LRUCache, metrics
+
+# In-process caches for group metadata and memberships. Every membership
+# write goes through this module, which drops exactly the entries it
+# changes; the TTL bounds staleness if another process writes too.
+GROUP_CACHE_SIZE = int(os.getenv("GROUP_CACHE_SIZE", "2048"))
+GROUP_CACHE_TTL = float(os.getenv("GROUP_CACHE_TTL", "600"))
+
+# group_id -> group row (id, name, created_by, created_at)
+group_info = LRUCache(maxsize=GROUP_CACHE_SIZE, ttl=GROUP_CACHE_TTL)
+# group_id -> tuple of group_members rows
+group_memberships = LRUCache(maxsize=GROUP_CACHE_SIZE, ttl=GROUP_CACHE_TTL)
+# user_id -> tuple of the group rows they belong to
+user_groups = LRUCache(maxsize=GROUP_CACHE_SIZE, ttl=GROUP_CACHE_TTL)
+
+CACHES = {"group_info": group_info, "group_memberships": group_memberships, "user_groups": user_groups}
+metrics.register_caches(**CACHES)
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+
+def clear_caches():
+    for cache in CACHES.values():
+        cache.clear()
+
+
+# -----------------------
+# Reads
+# -----------------------
+
+# Each read-through passes the cache generation from before its query, so
+# a result read before a concurrent write, and invalidated by it, is not
+# cached after the fact.
+
+def get_group_by_id(session, group_id):
+    group = group_info.get(group_id)
+    if group is None:
+        generation = group_info.generation
+        group = repo.get_group_by_id(session, group_id)
+        if group is not None:
+            group_info.set(group_id, group, generation)
+    return group
+
+
+def get_groups_for_user(session, user_id):
+    groups = user_groups.get(user_id)
+    if groups is None:
+        generation = user_groups.generation
+        groups = tuple(repo.get_groups_for_user(session, user_id))
+        user_groups.set(user_id, groups, generation)
+    return list(groups)
+
+
+def get_members_of_group(session, group_id):
+    members = group_memberships.get(group_id)
+    if members is None:
+        generation = group_memberships.generation
+        members = tuple(repo.get_members_of_group(session, group_id))
+        group_memberships.set(group_id, members, generation)
+    return list(members)
+
+
+def get_member_count(session, group_id):
+    return len(get_members_of_group(session, group_id))
+
+
+def is_group_creator(session, group_id, user_id):
+    """Check whether the user created the group."""
+    group = get_group_by_id(session, group_id)
+    return bool(group and group.created_by == user_id)
+
+
+# -----------------------
+# Writes
+# -----------------------
+
+def create_group(session, name, created_by):
+    group = repo.create_group(session, name=name, created_by=created_by)
+    group_info.set(group.id, group)
+    return group
+
+
+def add_member_to_group(session, group_id, user_id):
+    try:
+        repo.add_member_to_group(session, group_id=group_id, user_id=user_id)
+    finally:
+        group_memberships.invalidate(group_id)
+        user_groups.invalidate(user_id)
+
+
+def remove_member_from_group(session, group_id, user_id):
+    try:
+        repo.remove_member_from_group(session, group_id=group_id, user_id=user_id)
+    finally:
+        group_memberships.invalidate(group_id)
+        user_groups.invalidate(user_id)
+
+
+def delete_group(session, group_id):
+    members = get_members_of_group(session, group_id)
+    try:
+        repo.delete_group(session, group_id)
+    finally:
+        group_info.invalidate(group_id)
+        group_memberships.invalidate(group_id)
+        for member in members:
+            user_groups.invalidate(member.user_id)
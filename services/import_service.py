@@ -0,0 +1,349 @@
+"""
+Chunked, resumable bulk import of past expenses from CSV.
+
+One row per expense; only description, amount and paid_by are required
+and unknown columns are ignored:
+
+    date,description,amount,paid_by,participants,shares,currency
+    2024-03-01,Hotel,300.00,alice,alice;bob;42,,EUR
+    2024-03-02,Dinner,90.00,42,alice;42,60.00;30.00,
+
+Members are named by Telegram ID or custom ID, as in /addmember.
+Without participants the expense is split between the whole group; with
+``shares`` (amounts in participant order, adding up to the amount) it
+is a custom split.
+
+The file is read twice, streaming both times. The first pass checks
+every row against the group's members, fetched once for the whole
+import, and rejects the file before anything is written. The second
+writes it in chunks of IMPORT_CHUNK_SIZE rows, one transaction each:
+the chunk's expenses, its participants, its combined ledger deltas and
+the import's progress, a few executemany statements whatever the chunk
+size. Importing the same file into the same group again resumes after
+the last committed chunk, or does nothing if it had finished.
+"""
+import csv
+import datetime
+import hashlib
+import io
+import itertools
+import os
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy.exc import IntegrityError
+
+from repositories.balances import expense_deltas, apply_balance_deltas
+from repositories.expenses import insert_expenses, insert_participants
+from repositories.groups import get_member_identifiers
+from repositories.imports import get_import, create_import, advance_import
+from repositories.users import normalize_custom_id
+from services.expense_service import build_participants
+from utils import to_cents, format_cents, exceeds_max_amount, MAX_AMOUNT_CENTS
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+
+REQUIRED_COLUMNS = ("description", "amount", "paid_by")
+
+DEFAULT_CURRENCY = "USD"
+
+# Rejected rows listed by InvalidImport; the rest are only counted.
+MAX_REPORTED_ERRORS = 10
+
+
+class InvalidImport(ValueError):
+    """The file cannot be imported as it is; nothing was written."""
+
+    def __init__(self, errors, error_count=None):
+        # [(line, message), ...], at most MAX_REPORTED_ERRORS of them
+        self.errors = errors
+        self.error_count = error_count or len(errors)
+        lines = [f"line {line}: {message}" for line, message in errors]
+        if self.error_count > len(errors):
+            lines.append(f"... and {self.error_count - len(errors)} more")
+        super().__init__("\n".join(lines))
+
+
+class ImportConflict(RuntimeError):
+    """Another run is importing the same file into the same group."""
+
+
+class ExpenseImport:
+    """Progress of one file's import into one group, as returned by prepare_import()."""
+
+    def __init__(self, import_id, group_id, rows_total, rows_done, members):
+        self.import_id = import_id
+        self.group_id = group_id
+        self.rows_total = rows_total
+        self.rows_done = rows_done
+        # rows already imported by earlier runs
+        self.resumed_from = rows_done
+        self.members = members
+
+    @property
+    def finished(self):
+        return self.rows_done >= self.rows_total
+
+
+# -----------------------
+# Parsing
+# -----------------------
+
+def file_fingerprint(document):
+    digest = hashlib.sha256()
+    document.seek(0)
+    for block in iter(lambda: document.read(1 << 20), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def read_records(document):
+    """Yield (line, record) for each data row of a binary CSV file, from the start."""
+    document.seek(0)
+    text = io.TextIOWrapper(document, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    try:
+        try:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or ()]
+            missing = [column for column in REQUIRED_COLUMNS if column not in reader.fieldnames]
+            if missing:
+                raise InvalidImport([(1, f"missing column(s): {', '.join(missing)}")])
+            for record in reader:
+                yield reader.line_num, record
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise InvalidImport([(reader.line_num + 1, f"not a readable UTF-8 CSV file ({e})")])
+    finally:
+        text.detach()
+
+
+def member_lookup(identifiers):
+    """Map every way of naming a member (user ID, custom ID) to their user ID."""
+    members = {}
+    for user_id, custom_id in identifiers:
+        members[user_id] = user_id
+        if custom_id:
+            members[custom_id] = user_id
+    return members
+
+
+def member_id(name, members):
+    name = name.strip()
+    key = int(name) if name.isdigit() else normalize_custom_id(name)
+    if key not in members:
+        raise ValueError(f"{name} is not a member of the group")
+    return members[key]
+
+
+def parse_amount(text, field="amount"):
+    text = (text or "").strip()
+    try:
+        amount = Decimal(text.replace(",", "."))
+        if not amount.is_finite():
+            raise InvalidOperation
+        if exceeds_max_amount(amount):
+            raise ValueError(f"{field} {text!r} is larger than {format_cents(MAX_AMOUNT_CENTS)}")
+        return to_cents(amount)
+    except InvalidOperation:
+        raise ValueError(f"{field} {text!r} is not a number like 12.50")
+
+
+def split_list(text):
+    return [item for item in (text or "").replace(";", " ").split() if item]
+
+
+def parse_row(record, members):
+    """Turn one CSV record into the fields of an expense; ValueError says what is wrong."""
+    description = (record.get("description") or "").strip()
+    if not description:
+        raise ValueError("description is empty")
+
+    amount_cents = parse_amount(record.get("amount"))
+    if amount_cents <= 0:
+        raise ValueError("amount must be greater than zero")
+
+    if not (record.get("paid_by") or "").strip():
+        raise ValueError("paid_by is empty")
+    paid_by = member_id(record["paid_by"], members)
+
+    names = split_list(record.get("participants"))
+    participant_ids = [member_id(name, members) for name in names] if names else sorted(set(members.values()))
+    if len(set(participant_ids)) != len(participant_ids):
+        raise ValueError("a participant is listed twice")
+
+    shares = split_list(record.get("shares"))
+    custom_amounts = None
+    if shares:
+        if len(shares) != len(participant_ids):
+            raise ValueError(f"{len(shares)} shares for {len(participant_ids)} participants")
+        share_cents = [parse_amount(share, field="share") for share in shares]
+        if min(share_cents) < 0:
+            raise ValueError("shares must not be negative")
+        if sum(share_cents) != amount_cents:
+            raise ValueError(
+                f"shares add up to {format_cents(sum(share_cents))}, not {format_cents(amount_cents)}"
+            )
+        custom_amounts = dict(zip(participant_ids, share_cents))
+
+    date = (record.get("date") or "").strip()
+    try:
+        date = datetime.date.fromisoformat(date) if date else datetime.date.today()
+    except ValueError:
+        raise ValueError(f"date {date!r} is not a date like 2024-03-01")
+
+    currency = (record.get("currency") or "").strip().upper() or DEFAULT_CURRENCY
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValueError(f"currency {currency!r} is not a three-letter code")
+
+    return {
+        "date": date,
+        "description": description,
+        "amount_cents": amount_cents,
+        "currency": currency,
+        "paid_by": paid_by,
+        "IDs": participant_ids,
+        "split_type": "custom" if custom_amounts else "equal",
+        "custom_amounts": custom_amounts,
+    }
+
+
+def check_rows(document, members):
+    """Parse every row of the file; return how many there are or raise InvalidImport."""
+    errors, error_count, rows = [], 0, 0
+    for line, record in read_records(document):
+        rows += 1
+        try:
+            parse_row(record, members)
+        except ValueError as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append((line, str(e)))
+
+    if error_count:
+        raise InvalidImport(errors, error_count)
+    if not rows:
+        raise InvalidImport([(2, "the file has no expenses")])
+    return rows
+
+
+def pending_chunks(job, document, chunk_size=None):
+    """Yield the parsed rows the import has not written yet, ``chunk_size`` at a time."""
+    if job.finished:
+        return
+    records = itertools.islice(read_records(document), job.rows_done, None)
+    while True:
+        chunk = []
+        for line, record in itertools.islice(records, chunk_size or IMPORT_CHUNK_SIZE):
+            try:
+                chunk.append(parse_row(record, job.members))
+            except ValueError as e:
+                # Only if the file or the group changed since prepare_import().
+                raise InvalidImport([(line, str(e))])
+        if not chunk:
+            return
+        yield chunk
+
+
+# -----------------------
+# Writing
+# -----------------------
+
+def get_import_members(session, group_id):
+    """Every way a file may name the group's members, from one query; see member_lookup()."""
+    return member_lookup(get_member_identifiers(session, group_id))
+
+
+def check_import(session, group_id, document):
+    """Check a CSV file for import into a group, writing nothing; return its row count."""
+    return check_rows(document, get_import_members(session, group_id))
+
+
+def find_import(session, group_id, fingerprint, members):
+    """The ExpenseImport of this file into the group, finished or not; None if it never started."""
+    existing = get_import(session, group_id, fingerprint)
+    if existing is None:
+        return None
+    return ExpenseImport(existing.id, group_id, existing.rows_total, existing.rows_done, members)
+
+
+def start_import(session, group_id, fingerprint, rows_total, members, imported_by=None):
+    """Record a new import of a checked file; return its ExpenseImport."""
+    try:
+        import_id = create_import(session, group_id, fingerprint, rows_total, imported_by)
+    except IntegrityError:
+        session.rollback()
+        raise ImportConflict("this file is already being imported into the group")
+    return ExpenseImport(import_id, group_id, rows_total, 0, members)
+
+
+def prepare_import(session, group_id, document, imported_by=None):
+    """Check a CSV file for import into a group and start (or pick up) its import.
+
+    ``document`` is a seekable binary file. Raises InvalidImport, having
+    written nothing, if any row is wrong. The returned ExpenseImport is
+    finished already if this file was imported into the group before.
+
+    file_fingerprint() and check_rows() read the whole file without the
+    session; the bot runs them in a worker thread and only the other
+    steps on the session (see bot.handlers.import_expenses).
+    """
+    members = get_import_members(session, group_id)
+    fingerprint = file_fingerprint(document)
+    job = find_import(session, group_id, fingerprint, members)
+    if job is not None and job.finished:
+        return job
+
+    rows_total = check_rows(document, members)
+    if job is None:
+        job = start_import(session, group_id, fingerprint, rows_total, members, imported_by)
+    return job
+
+
+def import_chunk(session, job, rows):
+    """Write one chunk of parsed rows, with its ledger changes and progress, as one transaction."""
+    try:
+        if not advance_import(session, job.import_id, job.rows_done, job.rows_done + len(rows)):
+            raise ImportConflict("another run has imported part of this file meanwhile")
+
+        expense_ids = insert_expenses(session, [
+            {
+                "date": row["date"],
+                "description": row["description"],
+                "amount_cents": row["amount_cents"],
+                "currency": row["currency"],
+                "paid_by": row["paid_by"],
+                "group_id": job.group_id,
+            }
+            for row in rows
+        ])
+
+        participants, deltas = [], {}
+        for expense_id, row in zip(expense_ids, rows):
+            shares = build_participants(
+                row["amount_cents"], row["IDs"], row["split_type"], row["custom_amounts"], row["paid_by"]
+            )
+            participants.extend({"expense_id": expense_id, **share} for share in shares)
+            owed = [(share["user_id"], share["amount_owed_cents"]) for share in shares]
+            for key, cents in expense_deltas(job.group_id, row["paid_by"], owed).items():
+                deltas[key] = deltas.get(key, 0) + cents
+
+        insert_participants(session, participants)
+        apply_balance_deltas(session, deltas, commit=False)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    job.rows_done += len(rows)
+    return job.rows_done
+
+
+def import_expenses(session, group_id, document, imported_by=None, chunk_size=None, progress=None):
+    """Import a CSV file of expenses into a group; return its ExpenseImport.
+
+    ``progress(job)``, if given, is called after each committed chunk.
+    """
+    job = prepare_import(session, group_id, document, imported_by)
+    for rows in pending_chunks(job, document, chunk_size):
+        import_chunk(session, job, rows)
+        if progress is not None:
+            progress(job)
+    return job
@@ -0,0 +1,69 @@
+import heapq
+
+from repositories.balances import get_group_net_positions, get_group_ledger
+
+
+def get_net_positions(session, group_id):
+    """
+    Net position of every member of a group, from the balances ledger.
+    Returns dict: {user_id: cents}
+        - Positive = the group owes them
+        - Negative = they owe the group
+    """
+    return {user_id: net for user_id, net in get_group_net_positions(session, group_id) if net != 0}
+
+
+def plan_transfers(positions):
+    """
+    Turn net positions into a short list of transfers that settles them all.
+    Returns: [(from_user_id, to_user_id, cents), ...]
+
+    Greedy: the largest debtor pays the largest creditor as much as either
+    side allows, and whoever is left with a remainder goes back on the heap.
+    Every step settles at least one member, so there are at most n - 1
+    transfers for n members with a non-zero position, in O(n log n).
+    """
+    creditors = [(-amount, user_id) for user_id, amount in positions.items() if amount > 0]
+    debtors = [(amount, user_id) for user_id, amount in positions.items() if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+
+    return transfers
+
+
+def pairwise_transfers(session, group_id):
+    """
+    What settling the raw ledger pair by pair takes: one transfer per pair
+    of members with a non-zero balance between them.
+    Returns: [(from_user_id, to_user_id, cents), ...]
+    """
+    pairs = {}
+    for debtor, creditor, amount in get_group_ledger(session, group_id):
+        if debtor > creditor:
+            debtor, creditor, amount = creditor, debtor, -amount
+        pairs[(debtor, creditor)] = pairs.get((debtor, creditor), 0) + amount
+
+    transfers = []
+    for (first, second), amount in pairs.items():
+        if amount > 0:
+            transfers.append((first, second, amount))
+        elif amount < 0:
+            transfers.append((second, first, -amount))
+    return transfers
+
+
+def get_settle_up_plan(session, group_id):
+    """Transfers that settle every debt in a group; see plan_transfers."""
+    return plan_transfers(get_net_positions(session, group_id))
@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from services import expense_writer
+from services.expense_writer import ExpenseWriter
+
+
+class HangingSession:
+    """An async session whose writes never finish."""
+
+    async def run_sync(self, fn, *args):
+        await asyncio.Event().wait()
+
+    async def close(self):
+        pass
+
+
+def request(n):
+    return {"desc": f"Item {n}", "amount_cents": 100, "paid_by": 1, "group_id": 1, "IDs": [1]}
+
+
+class TestExpenseWriterNeverStrandsRequests(unittest.TestCase):
+    def run_for(self, scenario):
+        return asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+    def test_a_failing_session_fails_the_batch_and_the_writer_goes_on(self):
+        async def scenario():
+            writer = ExpenseWriter(max_batch=4, max_latency=0)
+            writer.start()
+            try:
+                with mock.patch.object(expense_writer, "get_async_session", side_effect=OSError("no database")):
+                    results = await asyncio.gather(
+                        *(writer.submit(**request(n)) for n in range(3)), return_exceptions=True
+                    )
+                return results, writer.running
+            finally:
+                await writer.stop()
+
+        results, running = self.run_for(scenario)
+        self.assertTrue(all(isinstance(result, OSError) for result in results))
+        self.assertTrue(running)
+
+    def test_cancelling_the_writer_fails_queued_and_in_flight_requests(self):
+        async def scenario():
+            writer = ExpenseWriter(max_batch=2, max_latency=0)
+            writer.start()
+            with mock.patch.object(expense_writer, "get_async_session", HangingSession):
+                submitted = [asyncio.create_task(writer.submit(**request(n))) for n in range(5)]
+                await asyncio.sleep(0.01)
+                writer._task.cancel()
+                return await asyncio.gather(*submitted, return_exceptions=True)
+
+        results = self.run_for(scenario)
+        self.assertEqual([type(result) for result in results], [RuntimeError] * 5)
+
+    def test_stopping_writer_refuses_new_requests(self):
+        async def scenario():
+            writer = ExpenseWriter()
+            writer.start()
+            stopping = asyncio.create_task(writer.stop())
+            await asyncio.sleep(0)
+            running = writer.running
+            try:
+                await writer.submit(**request(0))
+            except RuntimeError as e:
+                refused = e
+            else:
+                refused = None
+            await stopping
+            return running, refused
+
+        running, refused = self.run_for(scenario)
+        self.assertFalse(running)
+        self.assertIsInstance(refused, RuntimeError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import random
+import unittest
+
+from services.settlement_service import plan_transfers
+
+
+def settle(positions, transfers):
+    remaining = dict(positions)
+    for debtor, creditor, amount in transfers:
+        remaining[debtor] += amount
+        remaining[creditor] -= amount
+    return {user_id: amount for user_id, amount in remaining.items() if amount != 0}
+
+
+class TestPlanTransfers(unittest.TestCase):
+    def test_chain_collapses_to_one_transfer(self):
+        # 1 owes 2 ten, 2 owes 3 ten: 2 is even, so 1 pays 3 directly.
+        positions = {1: -1000, 2: 0, 3: 1000}
+        self.assertEqual(plan_transfers(positions), [(1, 3, 1000)])
+
+    def test_largest_debtor_pays_largest_creditor_first(self):
+        positions = {1: -3000, 2: -550, 3: 2000, 4: 1550}
+        self.assertEqual(plan_transfers(positions), [
+            (1, 3, 2000),
+            (1, 4, 1000),
+            (2, 4, 550),
+        ])
+
+    def test_settles_everyone_in_at_most_n_minus_one_transfers(self):
+        rng = random.Random(7)
+        positions = {user_id: rng.randint(-50000, 50000) for user_id in range(1, 500)}
+        positions[500] = -sum(positions.values())
+
+        transfers = plan_transfers(positions)
+
+        self.assertEqual(settle(positions, transfers), {})
+        self.assertLessEqual(len(transfers), len(positions) - 1)
+        self.assertTrue(all(amount > 0 for _, _, amount in transfers))
+
+    def test_nothing_to_settle(self):
+        self.assertEqual(plan_transfers({}), [])
+        self.assertEqual(plan_transfers({1: 0}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
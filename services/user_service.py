@@ -0,0 +1,52 @@
+import os
+
+from repositories.users import get_user_by_id, get_users_by_ids, create_user, update_user_names
+from utils import LRUCache, metrics
+
+# user_id -> display name, shared by every balance view in the process.
+display_names = LRUCache(
+    maxsize=int(os.getenv("NAME_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("NAME_CACHE_TTL", "3600"))
+)
+metrics.register_caches(display_names=display_names)
+
+
+def display_name(user_id, username=None, first_name=None):
+    return first_name or username or f"User {user_id}"
+
+
+def ensure_user_exists(session, user_id, username, first_name):
+    """Create the user if needed and keep their stored names current.
+
+    A changed username/first_name is written back and refreshes the cached
+    display name.
+    """
+    user = get_user_by_id(session, user_id)
+
+    if user is None:
+        create_user(session, user_id=user_id, username=username, first_name=first_name)
+    elif (user.username, user.first_name) != (username, first_name):
+        update_user_names(session, user_id, username=username, first_name=first_name)
+    else:
+        return
+
+    # Invalidating first bumps the generation, so a get_display_names() that
+    # read the old name before this write does not cache it after this.
+    display_names.invalidate(user_id)
+    display_names.set(user_id, display_name(user_id, username, first_name))
+
+
+def get_display_names(session, user_ids):
+    """Return {user_id: name}, loading cache misses with one IN (...) query."""
+    names = display_names.get_many(user_ids)
+
+    missing = [user_id for user_id in user_ids if user_id not in names]
+    generation = display_names.generation
+    for user in get_users_by_ids(session, missing):
+        names[user.id] = display_name(user.id, user.username, user.first_name)
+        display_names.set(user.id, names[user.id], generation)
+
+    for user_id in missing:
+        names.setdefault(user_id, display_name(user_id))
+
+    return names
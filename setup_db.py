@@ -4,6 +4,7 @@ Initialize the PayLash database
 """
 from db.schema import metadata
 from db.connection import db_get
+from db.migrations import run_migrations
 
 def main():
     print("🔧 Initializing PayLash database...")
@@ -11,6 +12,7 @@ def main():
     # Create engine and tables
     engine = db_get()
     metadata.create_all(engine)
+    run_migrations(engine)
     
     print("✅ Database tables created successfully!")
     print("\nTables created:")
@@ -19,6 +21,8 @@ def main():
     print("  - group_members")
     print("  - expenses")
     print("  - expense_participants")
+    print("  - balances")
+    print("  - schema_version")
     print("\n🚀 You can now run the bot with: python -m bot.main")
 
 if __name__ == "__main__":
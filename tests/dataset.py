@@ -0,0 +1,65 @@
+"""Synthetic dataset generator for the query-budget tests and the benchmarks.
+
+Data goes in through the same repository and service functions the bot
+uses, so generated databases look like real ones (ledger included).
+"""
+import random
+
+from repositories.users import create_user
+from repositories.groups import create_group, add_member_to_group
+from services.expense_service import create_expense_with_split
+
+# The organiser: creates and belongs to every group, so it is the user
+# with the most history and the one the benchmarks time.
+HEAVY_USER_ID = 1
+
+
+def group_name(n):
+    """Spreadsheet-style names (Group A, ..., Group Z, Group AA, ...).
+
+    Digits would be read as the amount by the /addepense parser.
+    """
+    label = ""
+    n += 1
+    while n:
+        n, remainder = divmod(n - 1, 26)
+        label = chr(ord("A") + remainder) + label
+    return f"Group {label}"
+
+
+def generate_dataset(session, users=200, groups=20, group_size=8, expenses_per_group=100, seed=42):
+    """Create users, groups and expenses; return what was created.
+
+    Group sizes vary between 2 and twice ``group_size``. Amounts are random
+    cent values, split equally, so most shares need rounding. The same
+    ``seed`` always produces the same dataset.
+
+    Returns {"user_ids": [...], "groups": {group_id: [member ids]}}.
+    """
+    rng = random.Random(seed)
+    user_ids = list(range(HEAVY_USER_ID, HEAVY_USER_ID + users))
+    for user_id in user_ids:
+        create_user(session, user_id=user_id, username=f"user{user_id}", first_name=f"User {user_id}")
+
+    others = user_ids[1:]
+    memberships = {}
+    for n in range(groups):
+        size = max(2, min(len(user_ids), rng.randint(2, 2 * group_size)))
+        members = [HEAVY_USER_ID] + rng.sample(others, k=size - 1)
+        group = create_group(session, name=group_name(n), created_by=HEAVY_USER_ID)
+        for user_id in members:
+            add_member_to_group(session, group_id=group[0], user_id=user_id)
+        memberships[group[0]] = members
+
+    for group_id, members in memberships.items():
+        for n in range(expenses_per_group):
+            create_expense_with_split(
+                session,
+                desc=f"Expense {n}",
+                amount_cents=rng.randint(100, 50000),
+                paid_by=rng.choice(members),
+                group_id=group_id,
+                IDs=members
+            )
+
+    return {"user_ids": user_ids, "groups": memberships}
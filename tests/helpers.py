@@ -0,0 +1,63 @@
+"""Shared helpers for the tests (and the benchmarks): throwaway databases and fake updates."""
+import contextlib
+import os
+import tempfile
+from types import SimpleNamespace
+
+from db import connection
+from db.schema import metadata
+
+
+def forget_async_engine():
+    """Drop the cached async engine; callers dispose it inside their loop."""
+    connection.async_db = None
+    connection.AsyncSessionLocal = None
+
+
+@contextlib.contextmanager
+def temporary_database():
+    """Point DB_URL at a fresh SQLite file for the duration of the block."""
+    previous_url = os.environ.get("DB_URL")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_URL"] = f"sqlite:///{os.path.join(tmp, 'paylash.db')}"
+        connection.db_disconnect()
+        forget_async_engine()
+        metadata.create_all(connection.db_get())
+        try:
+            yield connection.db_get()
+        finally:
+            connection.db_disconnect()
+            forget_async_engine()
+            if previous_url is None:
+                os.environ.pop("DB_URL", None)
+            else:
+                os.environ["DB_URL"] = previous_url
+
+
+# -----------------------
+# Fake Telegram objects
+# -----------------------
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.forward_from = None
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+    async def reply_document(self, document, **kwargs):
+        self.replies.append(document.read())
+
+
+def fake_update(user_id, text):
+    user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name=f"User {user_id}")
+    return SimpleNamespace(
+        update_id=0, effective_user=user, effective_chat=SimpleNamespace(id=user_id),
+        message=FakeMessage(text), callback_query=None
+    )
+
+
+def fake_context(args=()):
+    return SimpleNamespace(user_data={}, args=list(args))
@@ -1,3 +1,5 @@
-from .logger import get_logger
+from .logger import get_logger, track_update
+from .cache import LRUCache
+from .money import to_cents, format_cents, split_cents, exceeds_max_amount, MAX_AMOUNT_CENTS
 
-__all__ = ["get_logger"]
+__all__ = ["get_logger", "track_update", "LRUCache", "to_cents", "format_cents", "split_cents", "exceeds_max_amount", "MAX_AMOUNT_CENTS"]
@@ -1,11 +1,172 @@
+"""
+Logging setup: records are queued on the calling thread and formatted and
+written by a listener thread, so a log call on the event loop never
+blocks on I/O.
+
+LOG_FORMAT picks the output: json (default), one object per line, or
+text, the old ``name | message`` lines. LOG_LEVEL sets the root level
+(default INFO).
+
+Records carry the context of the update being handled (update_id,
+user_id, handler), set by ``track_update`` through a context variable, so
+every line a handler's call tree logs can be tied to its update.
+"""
+import atexit
+import contextvars
+import functools
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime, timezone
+
+from utils import metrics
+
+# update_id / user_id / handler of the update being handled, if any.
+log_context = contextvars.ContextVar("log_context", default={})
+
+# Updates that take longer than this are logged as warnings.
+SLOW_UPDATE_MS = float(os.getenv("LOG_SLOW_UPDATE_MS", "1000"))
+
+# Attributes every LogRecord has; anything else came from ``extra=``.
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "context"}
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Queue records with their message rendered and the update context attached.
+
+    Runs on the logging thread, so it does the work that needs that
+    thread's state (arguments, context variables, the live traceback)
+    and leaves the formatting to the listener.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        record.context = log_context.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", {}))
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(name)-12s | %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = dict(getattr(record, "context", {}))
+        fields.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if fields:
+            line += " | " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+FORMATTERS = {"json": JsonFormatter, "text": TextFormatter}
+
+listener = None
+
+
+def configure_logging():
+    """Route the root logger through a queue to a listener thread on stderr."""
+    global listener
+
+    fmt = os.getenv("LOG_FORMAT", "json").strip().lower()
+    if fmt not in FORMATTERS:
+        raise ValueError(f"Unknown LOG_FORMAT {fmt!r}; expected one of {sorted(FORMATTERS)}")
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(FORMATTERS[fmt]())
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.handlers = [ContextQueueHandler(records)]
+
+    if listener is not None:
+        listener.stop()
+    listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    listener.start()
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread."""
+    global listener
+
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+
+configure_logging()
+atexit.register(stop_logging)
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(name)-12s | %(message)s",
-    handlers=[
-        logging.StreamHandler()
-    ])
 
 def get_logger(name):
     return logging.getLogger(name)
+
+
+update_logger = get_logger("bot.updates")
+
+
+def track_update(handler):
+    """Log each call of a ``handler(update, context)`` coroutine with its timing.
+
+    Sets the log context for everything logged while the handler runs and,
+    with metrics enabled, records its latency and the SQL it ran.
+    Handlers called from another tracked handler run in the caller's
+    context and are not logged twice.
+    """
+    @functools.wraps(handler)
+    async def wrapper(update, context, *args, **kwargs):
+        if log_context.get():
+            return await handler(update, context, *args, **kwargs)
+
+        user = getattr(update, "effective_user", None)
+        token = log_context.set({
+            "update_id": getattr(update, "update_id", None),
+            "user_id": user.id if user else None,
+            "handler": handler.__name__,
+        })
+        queries = [0, 0.0] if metrics.enabled else None
+        queries_token = metrics.update_queries.set(queries)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await handler(update, context, *args, **kwargs)
+            outcome = "ok"
+        except Exception:
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+            update_logger.exception("update failed", extra={"elapsed_ms": elapsed_ms})
+            raise
+        else:
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+            level = logging.WARNING if elapsed_ms >= SLOW_UPDATE_MS else logging.INFO
+            update_logger.log(level, "update handled", extra={"elapsed_ms": elapsed_ms})
+            return result
+        finally:
+            if queries is not None:
+                metrics.observe_update(handler.__name__, time.perf_counter() - started, outcome, queries)
+            metrics.update_queries.reset(queries_token)
+            log_context.reset(token)
+
+    return wrapper
@@ -0,0 +1,219 @@
+"""
+In-process metrics rendered in the Prometheus text format.
+
+Counters and histograms are kept in plain dicts, each under its own lock. Values
+that already live elsewhere (cache hit counters, queue sizes) are read at
+scrape time through collectors instead of being mirrored on every call.
+
+Instrumentation is off until ``enable()`` is called, so the handlers,
+tests and benchmarks pay nothing for it unless it is wanted. Enabling
+also counts and times queries (through utils/sql_timing.py), both in
+total and per update (see ``track_update`` in utils/logger.py).
+"""
+import bisect
+import contextvars
+import threading
+
+from utils import sql_timing
+
+# Latency buckets in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Buckets for the number of queries one update runs.
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+enabled = False
+
+# [queries, seconds] spent in the database by the update being handled.
+update_queries = contextvars.ContextVar("update_queries", default=None)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, tuple(zip(self.labelnames, labels)), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items()]
+        for labels, (counts, total, count) in items:
+            base = tuple(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", base + (("le", format_value(float(bound))),), cumulative
+            yield f"{self.name}_sum", base, total
+            yield f"{self.name}_count", base, count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        # name -> (kind, help, callable returning [(labels tuple, value), ...])
+        self.collectors = {}
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collector(self, name, kind, help, collect):
+        """Register values read at scrape time: ``collect()`` -> [(labels, value)]."""
+        self.collectors[name] = (kind, help, collect)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        for name, (kind, help, collect) in self.collectors.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in collect():
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_latency = registry.histogram(
+    "paylash_handler_latency_seconds", "Time spent handling an update, by handler.", ["handler"]
+)
+updates_total = registry.counter(
+    "paylash_updates_total", "Updates handled, by handler and outcome (ok or error).", ["handler", "outcome"]
+)
+db_queries_total = registry.counter("paylash_db_queries_total", "SQL statements executed.")
+db_query_seconds = registry.histogram("paylash_db_query_seconds", "Duration of one SQL statement.")
+update_db_queries = registry.histogram(
+    "paylash_update_db_queries", "SQL statements executed while handling one update.", ["handler"],
+    buckets=QUERY_COUNT_BUCKETS
+)
+update_db_seconds = registry.histogram(
+    "paylash_update_db_seconds", "Time spent in SQL while handling one update.", ["handler"]
+)
+
+
+# name -> LRUCache whose counters are exported at scrape time.
+caches = {}
+
+
+def register_caches(**named):
+    """Expose each LRUCache's hit, miss and size counters under ``cache=<name>``."""
+    caches.update(named)
+
+
+def cache_samples(field):
+    return [((("cache", name),), cache.stats()[field]) for name, cache in caches.items()]
+
+
+registry.collector("paylash_cache_hits_total", "counter", "Cache lookups that hit.", lambda: cache_samples("hits"))
+registry.collector("paylash_cache_misses_total", "counter", "Cache lookups that missed.", lambda: cache_samples("misses"))
+registry.collector("paylash_cache_entries", "gauge", "Entries held by a cache.", lambda: cache_samples("size"))
+
+
+def observe_update(handler, seconds, outcome, queries=None):
+    """Record one handled update; called by track_update."""
+    handler_latency.observe(seconds, handler)
+    updates_total.inc(handler, outcome)
+    if queries is not None:
+        update_db_queries.observe(queries[0], handler)
+        update_db_seconds.observe(queries[1], handler)
+
+
+# -----------------------
+# SQL instrumentation
+# -----------------------
+
+def observe_statement(statement, seconds):
+    db_queries_total.inc()
+    db_query_seconds.observe(seconds)
+    queries = update_queries.get()
+    if queries is not None:
+        queries[0] += 1
+        queries[1] += seconds
+
+
+def enable():
+    """Start recording: observe SQL statements of every engine, present and future."""
+    global enabled
+
+    if enabled:
+        return
+    sql_timing.add_observer(observe_statement)
+    enabled = True
+
+
+def disable():
+    global enabled
+
+    if not enabled:
+        return
+    sql_timing.remove_observer(observe_statement)
+    enabled = False
@@ -0,0 +1,42 @@
+"""
+Money as integer minor units (cents).
+
+Amounts are converted to cents once, where they enter the bot, and stay
+integers through the services, the database and every aggregate; they
+are only turned back into text by format_cents() when a reply is built.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+# Largest amount (and share) accepted anywhere money enters: 1,000,000,000.00.
+# Keeps every amount, and the ledger sums of any realistic group, well inside
+# a 64-bit INTEGER column.
+MAX_AMOUNT_CENTS = 100_000_000_000
+
+
+def to_cents(amount) -> int:
+    """Convert a decimal amount (Decimal, str or int) to cents, rounding half up."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def exceeds_max_amount(amount) -> bool:
+    """Whether a decimal amount is larger than MAX_AMOUNT_CENTS allows, ignoring sign.
+
+    Compares without scaling, so even 1e999999 answers rather than overflows.
+    """
+    return abs(Decimal(str(amount))) > Decimal(MAX_AMOUNT_CENTS) / 100
+
+
+def format_cents(cents) -> str:
+    """Render cents as a decimal string: 12345 -> '123.45', -5 -> '-0.05'."""
+    sign = "-" if cents < 0 else ""
+    whole, fraction = divmod(abs(int(cents)), 100)
+    return f"{sign}{whole}.{fraction:02d}"
+
+
+def split_cents(total: int, parts: int):
+    """Split ``total`` cents into ``parts`` shares that add up to it exactly.
+
+    The first ``total % parts`` shares get the leftover cents, one each.
+    """
+    share, leftover = divmod(total, parts)
+    return [share + 1 if n < leftover else share for n in range(parts)]
@@ -0,0 +1,71 @@
+"""
+Count and time the SQL statements a block of code issues.
+
+    with profile_queries("/balance", budget=3) as profile:
+        await balance(update, context)
+
+``profile`` holds every statement run inside the block with its
+duration; with ``budget`` set, exceeding it raises QueryBudgetExceeded
+listing the statements, which is how the budget tests catch N+1
+regressions. Profiles follow the context, not the thread or engine, so
+statements from other tasks are not counted, while both the sync engine
+and the async engine (through run_sync) are. Profiles nest; an inner
+operation's statements count towards the outer one too.
+"""
+import contextlib
+import contextvars
+
+from utils import sql_timing
+
+# Profiles open in the current context, innermost last.
+active_profiles = contextvars.ContextVar("active_profiles", default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryProfile:
+    def __init__(self, name=None):
+        self.name = name
+        # [(statement, seconds), ...] in execution order
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def seconds(self):
+        return sum(seconds for _, seconds in self.statements)
+
+    def report(self):
+        lines = [f"{self.name or 'operation'}: {self.count} statements, {self.seconds * 1000:.2f}ms"]
+        for n, (statement, seconds) in enumerate(self.statements, 1):
+            lines.append(f"  {n:>3}. {seconds * 1000:7.2f}ms  {' '.join(statement.split())}")
+        return "\n".join(lines)
+
+
+def observe_statement(statement, seconds):
+    for profile in active_profiles.get():
+        profile.statements.append((statement, seconds))
+
+
+def install():
+    """Observe statements of every engine; profiles cost next to nothing when none is open."""
+    sql_timing.add_observer(observe_statement)
+
+
+@contextlib.contextmanager
+def profile_queries(name=None, budget=None):
+    """Record the statements issued in the block; enforce ``budget`` if given."""
+    install()
+    profile = QueryProfile(name)
+    token = active_profiles.set(active_profiles.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        active_profiles.reset(token)
+
+    if budget is not None and profile.count > budget:
+        raise QueryBudgetExceeded(f"query budget of {budget} exceeded\n{profile.report()}")
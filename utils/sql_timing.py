@@ -0,0 +1,51 @@
+"""
+Time every SQL statement once and hand it to whoever is listening.
+
+utils/metrics.py and utils/query_profiler.py both observe statements
+through here instead of hooking engines themselves, so a statement costs
+one pair of cursor events however many of them are active. The start
+time is kept on the statement's ExecutionContext, which goes away with
+the statement, so one that raises leaves nothing behind.
+
+The engine hooks are installed with the first observer and removed with
+the last one.
+"""
+import time
+
+from sqlalchemy import event, Engine
+
+# Callables taking (statement, seconds), called after every statement of
+# every engine, present and future.
+observers = []
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    for observer in observers:
+        observer(statement, elapsed)
+
+
+def add_observer(observer):
+    if observer in observers:
+        return
+    if not observers:
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+    observers.append(observer)
+
+
+def remove_observer(observer):
+    if observer not in observers:
+        return
+    observers.remove(observer)
+    if not observers:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", after_cursor_execute)
@@ -0,0 +1,69 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from services import group_service, user_service
+from utils.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_set_is_skipped_after_an_invalidation_it_raced_with(self):
+        cache = LRUCache(maxsize=4)
+        generation = cache.generation
+        cache.invalidate("members")
+        cache.set("members", ("stale",), generation)
+        self.assertIsNone(cache.get("members"))
+
+        cache.set("members", ("fresh",), cache.generation)
+        self.assertEqual(cache.get("members"), ("fresh",))
+
+
+class TestGroupCacheRace(unittest.TestCase):
+    def setUp(self):
+        group_service.clear_caches()
+
+    def tearDown(self):
+        group_service.clear_caches()
+
+    def test_members_read_before_a_concurrent_add_are_not_cached(self):
+        before = (SimpleNamespace(group_id=1, user_id=1),)
+        after = before + (SimpleNamespace(group_id=1, user_id=2),)
+
+        def read_then_concurrent_add(session, group_id):
+            # The read has happened; another update adds a member and commits.
+            group_service.add_member_to_group(session, group_id, 2)
+            return before
+
+        with mock.patch.object(group_service, "repo") as repo:
+            repo.get_members_of_group.side_effect = read_then_concurrent_add
+            self.assertEqual(group_service.get_members_of_group(None, 1), list(before))
+
+            repo.get_members_of_group.side_effect = lambda session, group_id: after
+            self.assertEqual(group_service.get_members_of_group(None, 1), list(after))
+
+
+class TestDisplayNameCacheRace(unittest.TestCase):
+    def setUp(self):
+        user_service.display_names.clear()
+
+    def tearDown(self):
+        user_service.display_names.clear()
+
+    def test_name_read_before_a_concurrent_rename_is_not_cached(self):
+        old = SimpleNamespace(id=7, username="sam", first_name="Sam")
+
+        def read_then_concurrent_rename(session, user_ids):
+            # The read has happened; another update renames the user and commits.
+            user_service.ensure_user_exists(session, 7, "sam", "Samantha")
+            return [old]
+
+        with mock.patch.object(user_service, "get_users_by_ids", side_effect=read_then_concurrent_rename), \
+                mock.patch.object(user_service, "get_user_by_id", return_value=old), \
+                mock.patch.object(user_service, "update_user_names"):
+            self.assertEqual(user_service.get_display_names(None, [7]), {7: "Sam"})
+
+        self.assertEqual(user_service.display_names.get(7), "Samantha")
+
+
+if __name__ == '__main__':
+    unittest.main()
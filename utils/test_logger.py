@@ -0,0 +1,94 @@
+import asyncio
+import json
+import queue
+import unittest
+from types import SimpleNamespace
+
+from utils.logger import ContextQueueHandler, JsonFormatter, TextFormatter, track_update, get_logger
+
+
+class CapturedLogs:
+    """Attach a queue handler to some loggers and hand back the JSON lines."""
+
+    def __init__(self, *names):
+        self.records = queue.SimpleQueue()
+        self.handler = ContextQueueHandler(self.records)
+        self.loggers = [get_logger(name) for name in names]
+
+    def __enter__(self):
+        for logger in self.loggers:
+            logger.addHandler(self.handler)
+            logger.propagate = False
+        return self
+
+    def __exit__(self, *exc):
+        for logger in self.loggers:
+            logger.removeHandler(self.handler)
+            logger.propagate = True
+
+    def lines(self, formatter=JsonFormatter()):
+        out = []
+        while not self.records.empty():
+            out.append(formatter.format(self.records.get()))
+        return out
+
+
+def fake_update(update_id=7, user_id=42):
+    return SimpleNamespace(update_id=update_id, effective_user=SimpleNamespace(id=user_id))
+
+
+class TestTrackUpdate(unittest.TestCase):
+    def test_lines_carry_update_context_and_timing(self):
+        @track_update
+        async def balance(update, context):
+            get_logger("test.handler").info("looked up %s rows", 3, extra={"rows": 3})
+            return "done"
+
+        with CapturedLogs("test.handler", "bot.updates") as logs:
+            self.assertEqual(asyncio.run(balance(fake_update(), None)), "done")
+            inner, handled = [json.loads(line) for line in logs.lines()]
+
+        self.assertEqual(inner["msg"], "looked up 3 rows")
+        self.assertEqual(inner["rows"], 3)
+        for entry in (inner, handled):
+            self.assertEqual((entry["update_id"], entry["user_id"], entry["handler"]), (7, 42, "balance"))
+        self.assertEqual(handled["msg"], "update handled")
+        self.assertGreaterEqual(handled["elapsed_ms"], 0)
+
+    def test_failures_are_logged_with_the_traceback_and_reraised(self):
+        @track_update
+        async def broken(update, context):
+            raise RuntimeError("no database")
+
+        with CapturedLogs("bot.updates") as logs:
+            with self.assertRaises(RuntimeError):
+                asyncio.run(broken(fake_update(), None))
+            (entry,) = [json.loads(line) for line in logs.lines()]
+
+        self.assertEqual(entry["level"], "ERROR")
+        self.assertIn("RuntimeError: no database", entry["exc"])
+
+    def test_nested_handlers_log_once_in_the_outer_context(self):
+        @track_update
+        async def inner(update, context):
+            return None
+
+        @track_update
+        async def outer(update, context):
+            return await inner(update, context)
+
+        with CapturedLogs("bot.updates") as logs:
+            asyncio.run(outer(fake_update(), None))
+            (entry,) = [json.loads(line) for line in logs.lines()]
+
+        self.assertEqual(entry["handler"], "outer")
+
+    def test_text_format_appends_context_fields(self):
+        with CapturedLogs("test.text") as logs:
+            get_logger("test.text").info("hello", extra={"elapsed_ms": 1.5})
+            (line,) = logs.lines(TextFormatter())
+        self.assertTrue(line.endswith("| hello | elapsed_ms=1.5"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import unittest
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, event, text, Engine
+from sqlalchemy.exc import OperationalError
+
+from utils import metrics, sql_timing, track_update, LRUCache
+from utils.metrics import Registry
+from utils.query_profiler import profile_queries
+
+
+class TestRegistry(unittest.TestCase):
+    def test_renders_counters_and_cumulative_histograms(self):
+        registry = Registry()
+        hits = registry.counter("demo_total", "Demo counter.", ["kind"])
+        latency = registry.histogram("demo_seconds", "Demo latency.", buckets=(0.1, 1.0))
+        hits.inc("a")
+        hits.inc("a", amount=2)
+        for value in (0.05, 0.5, 5):
+            latency.observe(value)
+
+        lines = registry.render().splitlines()
+
+        self.assertIn("# TYPE demo_total counter", lines)
+        self.assertIn('demo_total{kind="a"} 3', lines)
+        self.assertIn('demo_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('demo_seconds_bucket{le="1.0"} 2', lines)
+        self.assertIn('demo_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("demo_seconds_count 3", lines)
+
+    def test_cache_collectors_read_stats_at_scrape_time(self):
+        cache = LRUCache(maxsize=4)
+        metrics.register_caches(test_cache=cache)
+        try:
+            cache.set("k", 1)
+            cache.get("k")
+            cache.get("missing")
+            lines = metrics.registry.render().splitlines()
+        finally:
+            del metrics.caches["test_cache"]
+
+        self.assertIn('paylash_cache_hits_total{cache="test_cache"} 1', lines)
+        self.assertIn('paylash_cache_misses_total{cache="test_cache"} 1', lines)
+        self.assertIn('paylash_cache_entries{cache="test_cache"} 1', lines)
+
+
+class TestUpdateInstrumentation(unittest.TestCase):
+    def setUp(self):
+        metrics.enable()
+
+    def tearDown(self):
+        metrics.disable()
+
+    def test_counts_latency_and_queries_per_update(self):
+        engine = create_engine("sqlite://")
+
+        @track_update
+        async def metrics_probe(update, context):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
+
+        update = SimpleNamespace(update_id=1, effective_user=SimpleNamespace(id=5))
+        latency_before = metrics.handler_latency.count("metrics_probe")
+        queries_before = metrics.db_queries_total.value()
+
+        asyncio.run(metrics_probe(update, None))
+
+        self.assertEqual(metrics.handler_latency.count("metrics_probe"), latency_before + 1)
+        self.assertEqual(metrics.updates_total.value("metrics_probe", "ok"), latency_before + 1)
+        self.assertEqual(metrics.db_queries_total.value(), queries_before + 2)
+        series = metrics.update_db_queries._series[("metrics_probe",)]
+        self.assertEqual(series[1], 2 * series[2])
+
+
+class TestSqlTiming(unittest.TestCase):
+    def test_metrics_and_profiles_share_one_hook_and_failures_leave_nothing(self):
+        engine = create_engine("sqlite://")
+        metrics.enable()
+        try:
+            queries_before = metrics.db_queries_total.value()
+            with profile_queries("shared") as profile:
+                with engine.connect() as conn:
+                    with self.assertRaises(OperationalError):
+                        conn.execute(text("SELECT * FROM missing"))
+                    conn.execute(text("SELECT 1"))
+                    info = dict(conn.info)
+
+            self.assertTrue(event.contains(Engine, "before_cursor_execute", sql_timing.before_cursor_execute))
+            self.assertEqual(len(sql_timing.observers), 2)
+        finally:
+            metrics.disable()
+
+        self.assertEqual(profile.count, 1)
+        self.assertEqual(metrics.db_queries_total.value(), queries_before + 1)
+        self.assertEqual(info, {})
+
+
+class TestMetricsServer(unittest.TestCase):
+    def test_serves_metrics_and_404s_elsewhere(self):
+        from bot.metrics_server import MetricsServer
+
+        def fetch(url):
+            try:
+                with urllib.request.urlopen(url, timeout=5) as response:
+                    return response.status, response.read().decode()
+            except urllib.error.HTTPError as e:
+                return e.code, ""
+
+        async def scenario():
+            server = MetricsServer(port=0)
+            await server.start()
+            try:
+                base = f"http://127.0.0.1:{server.port}"
+                return await asyncio.to_thread(fetch, f"{base}/metrics"), await asyncio.to_thread(fetch, f"{base}/")
+            finally:
+                await server.stop()
+
+        (status, body), (missing, _) = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertIn("# TYPE paylash_handler_latency_seconds histogram", body)
+        self.assertEqual(missing, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from decimal import Decimal
+
+from utils.money import to_cents, format_cents, split_cents, exceeds_max_amount
+
+
+class TestMoney(unittest.TestCase):
+    def test_to_cents_rounds_half_up(self):
+        self.assertEqual(to_cents(Decimal("120.50")), 12050)
+        self.assertEqual(to_cents("0.005"), 1)
+        self.assertEqual(to_cents(45), 4500)
+
+    def test_format_cents(self):
+        self.assertEqual(format_cents(12345), "123.45")
+        self.assertEqual(format_cents(5), "0.05")
+        self.assertEqual(format_cents(-5), "-0.05")
+
+    def test_split_cents_adds_up_exactly(self):
+        self.assertEqual(split_cents(10000, 3), [3334, 3333, 3333])
+        self.assertEqual(split_cents(100, 8), [13, 13, 13, 13, 12, 12, 12, 12])
+        self.assertEqual(sum(split_cents(99999, 7)), 99999)
+
+    def test_exceeds_max_amount(self):
+        self.assertFalse(exceeds_max_amount(Decimal("1000000000.00")))
+        self.assertFalse(exceeds_max_amount("-1000000000"))
+        self.assertTrue(exceeds_max_amount(Decimal("1000000000.01")))
+        self.assertTrue(exceeds_max_amount(Decimal("-1e20")))
+        self.assertTrue(exceeds_max_amount(Decimal("1e999999")))
+
+
+if __name__ == '__main__':
+    unittest.main()